@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List, Optional, Dict
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from typing import List, Literal, Optional, Dict
 from pydantic import BaseModel
 from app.core.security import get_current_user
 from app.db.supabase import get_supabase_client
+from app.services.ai.agent_cache import agent_cache
+from app.services.ai.audio_store import audio_store
 
 router = APIRouter()
 
@@ -21,6 +23,7 @@ class AgentCreate(BaseModel):
     years_experience: Optional[int] = 0
     communication_style: Optional[str] = "formal"
     guardrails: Optional[Dict] = {}
+    retrieval_dim: Optional[Literal[256, 512]] = None  # Two-stage retrieval over truncated embeddings (None = full dimension)
 
 class AgentResponse(BaseModel):
     id: str
@@ -32,6 +35,7 @@ class AgentResponse(BaseModel):
     years_experience: Optional[int] = 0
     communication_style: Optional[str] = "formal"
     guardrails: Optional[Dict] = {}
+    retrieval_dim: Optional[int] = None
     status: str
     created_at: str
 
@@ -66,7 +70,7 @@ async def get_agent_options(user: dict = Depends(get_current_user)):
         }
 
 @router.post("/", response_model=AgentResponse)
-async def create_agent(agent: AgentCreate, user: dict = Depends(get_current_user)):
+async def create_agent(agent: AgentCreate, background_tasks: BackgroundTasks, user: dict = Depends(get_current_user)):
     """
     Synthesize a new Agent Core.
     """
@@ -98,6 +102,8 @@ async def create_agent(agent: AgentCreate, user: dict = Depends(get_current_user
         "guardrails": agent.guardrails,
         "status": "creating"
     }
+    if agent.retrieval_dim is not None:
+        agent_data["retrieval_dim"] = agent.retrieval_dim
 
     try:
         response = supabase.table("agents").insert(agent_data).execute()
@@ -113,6 +119,9 @@ async def create_agent(agent: AgentCreate, user: dict = Depends(get_current_user
             message=f"Agent '{agent.name}' has been successfully synthesized.",
             type="success"
         )
+
+        # Pre-render disclosure/refusal audio so the first meeting doesn't wait on TTS
+        background_tasks.add_task(audio_store.prefill, response.data[0]["id"])
             
         return response.data[0]
         
@@ -162,10 +171,11 @@ class AgentUpdate(BaseModel):
     years_experience: Optional[int] = None
     communication_style: Optional[str] = None
     guardrails: Optional[Dict] = None
+    retrieval_dim: Optional[Literal[256, 512]] = None
     status: Optional[str] = None
 
 @router.patch("/{agent_id}", response_model=AgentResponse)
-async def update_agent(agent_id: str, update: AgentUpdate, user: dict = Depends(get_current_user)):
+async def update_agent(agent_id: str, update: AgentUpdate, background_tasks: BackgroundTasks, user: dict = Depends(get_current_user)):
     """
     Update an existing agent.
     """
@@ -187,6 +197,8 @@ async def update_agent(agent_id: str, update: AgentUpdate, user: dict = Depends(
         update_data["communication_style"] = update.communication_style
     if update.guardrails is not None:
         update_data["guardrails"] = update.guardrails
+    if update.retrieval_dim is not None:
+        update_data["retrieval_dim"] = update.retrieval_dim
     if update.status is not None:
         update_data["status"] = update.status
 
@@ -198,6 +210,12 @@ async def update_agent(agent_id: str, update: AgentUpdate, user: dict = Depends(
         
         if not response.data:
             raise HTTPException(status_code=404, detail="Agent not found or update failed")
+
+        # Running/pre-warmed sessions must not keep serving the old identity or voice
+        agent_cache.invalidate_agent(agent_id)
+        if "voice_model_id" in update_data or "name" in update_data:
+            # New voice or new disclosure text: re-render fixed utterances
+            background_tasks.add_task(audio_store.prefill, agent_id)
             
         return response.data[0]
         
@@ -219,6 +237,8 @@ async def delete_agent(agent_id: str, user: dict = Depends(get_current_user)):
         # Supabase-py delete returns the deleted rows in .data
         if not response.data:
             raise HTTPException(status_code=404, detail="Agent not found or permission denied")
+
+        agent_cache.invalidate_agent(agent_id)
             
         return {"message": "Agent deleted successfully", "id": agent_id}
         
@@ -228,8 +248,21 @@ async def delete_agent(agent_id: str, user: dict = Depends(get_current_user)):
 
 from fastapi import UploadFile, File
 from app.services.ai.rag_service import RAGService
+from app.services.ingestion_jobs import ingestion_jobs, QueueFull
+
+def submit_ingestion(agent_id: str, user_id: str, kind: str, source: str, run, size: int = 0) -> dict:
+    """Queue a background ingestion; the caller's endpoint answers 202 with the job id."""
+    try:
+        job = ingestion_jobs.submit(agent_id, user_id, kind, source, run, size=size)
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Ingestion queue is full, retry later")
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/v1/agents/{agent_id}/knowledge/jobs/{job.id}",
+    }
 
-@router.post("/{agent_id}/knowledge")
+@router.post("/{agent_id}/knowledge", status_code=202)
 async def upload_knowledge(
     agent_id: str, 
     file: UploadFile = File(...), 
@@ -251,12 +284,15 @@ async def upload_knowledge(
     # Limit file size/type in production
     content = await file.read()
     
-    # 3. Ingest via RAG Service
+    # 3. Ingest via RAG Service, in the background (poll the returned status_url)
     # We pass the bytes directly to let RAG service handle text/pdf extraction
     rag = RAGService()
-    await rag.ingest_document(agent_id, user["id"], file.filename, content, token=user.get("token"))
-    
-    return {"message": "Document ingested successfully", "filename": file.filename}
+    job = submit_ingestion(
+        agent_id, user["id"], "file", file.filename,
+        lambda progress: rag.ingest_document(agent_id, user["id"], file.filename, content, token=user.get("token"), progress=progress),
+        size=len(content)
+    )
+    return {"message": "Document queued for ingestion", "filename": file.filename, **job}
 
 @router.delete("/{agent_id}/knowledge/{filename}")
 async def delete_knowledge(
@@ -290,7 +326,7 @@ async def list_knowledge(agent_id: str, user: dict = Depends(get_current_user)):
     rag = RAGService()
     return await rag.list_documents(agent_id)
 
-@router.post("/{agent_id}/knowledge/text")
+@router.post("/{agent_id}/knowledge/text", status_code=202)
 async def ingest_text(
     agent_id: str, 
     data: KnowledgeText,
@@ -305,10 +341,14 @@ async def ingest_text(
         raise HTTPException(status_code=404, detail="Agent not found")
     
     rag = RAGService()
-    await rag.ingest_text(agent_id, user["id"], data.title, data.content)
-    return {"message": "Text ingested successfully"}
+    job = submit_ingestion(
+        agent_id, user["id"], "text", data.title,
+        lambda progress: rag.ingest_text(agent_id, user["id"], data.title, data.content, progress=progress),
+        size=len(data.content.encode("utf-8"))
+    )
+    return {"message": "Text queued for ingestion", **job}
 
-@router.post("/{agent_id}/knowledge/url")
+@router.post("/{agent_id}/knowledge/url", status_code=202)
 async def ingest_url(
     agent_id: str, 
     data: KnowledgeURL, 
@@ -323,5 +363,43 @@ async def ingest_url(
         raise HTTPException(status_code=404, detail="Agent not found")
     
     rag = RAGService()
-    await rag.ingest_url(agent_id, user["id"], data.url)
-    return {"message": "URL ingested successfully"}
+    # Same key as the stored chunks' source_url, so re-ingests of one page are serialized
+    job = submit_ingestion(
+        agent_id, user["id"], "url", RAGService.canonical_url(data.url),
+        lambda progress: rag.ingest_url(agent_id, user["id"], data.url, progress=progress)
+    )
+    return {"message": "URL queued for ingestion", **job}
+
+@router.get("/{agent_id}/knowledge/jobs")
+async def list_ingestion_jobs(agent_id: str, user: dict = Depends(get_current_user)):
+    """
+    Recent ingestion jobs of an agent.
+    """
+    supabase = get_supabase_client()
+    agent_check = supabase.table("agents").select("id").eq("id", agent_id).eq("user_id", user["id"]).execute()
+    if not agent_check.data:
+        raise HTTPException(status_code=404, detail="Agent not found")
+
+    return await ingestion_jobs.list_jobs(agent_id)
+
+@router.get("/{agent_id}/knowledge/jobs/{job_id}")
+async def get_ingestion_job(agent_id: str, job_id: str, user: dict = Depends(get_current_user)):
+    """
+    Status and progress (pages parsed, chunks embedded, rows written) of an ingestion job.
+    """
+    job = await ingestion_jobs.get(job_id)
+    if not job or job["agent_id"] != agent_id or job["user_id"] != user["id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.delete("/{agent_id}/knowledge/jobs/{job_id}")
+async def cancel_ingestion_job(agent_id: str, job_id: str, user: dict = Depends(get_current_user)):
+    """
+    Cancel a queued or running ingestion job. Chunks it already stored are removed.
+    """
+    job = await ingestion_jobs.get(job_id)
+    if not job or job["agent_id"] != agent_id or job["user_id"] != user["id"]:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not ingestion_jobs.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job is {job['status']} and cannot be cancelled here")
+    return {"message": "Job cancelled", "job_id": job_id}
@@ -3,6 +3,7 @@ from typing import List, Optional
 from pydantic import BaseModel
 from app.core.security import get_current_user
 from app.db.supabase import get_supabase_client
+from app.services.ai.agent_cache import agent_cache, runtime_pool
 from datetime import datetime
 
 router = APIRouter()
@@ -133,6 +134,10 @@ async def create_meeting(meeting: MeetingCreate, background_tasks: BackgroundTas
         except Exception as cost_err:
             print(f"Warning: Failed to init meeting costs: {cost_err}")
 
+        # Pre-resolve agent/voice and pre-warm a runtime so the session starts without DB round-trips
+        agent_cache.put_meeting(new_meeting)
+        background_tasks.add_task(runtime_pool.prewarm, new_meeting["agent_id"], new_meeting.get("mode") or "interview")
+
         # --- TRIGGER HEADLESS BOT (If External) ---
         if new_meeting["platform"] != 'webrtc':
             # Use the real Headless Bot
@@ -120,12 +120,13 @@ async def webrtc_callback(request: Request):
             orchestrator = AIOrchestrator(
                 meeting_id=state["meeting_id"],
                 agent_id=state["agent_id"],
-                voice_id=None 
+                voice_id=None,
+                input_format="pcm_16000"  # webrtc_handler resamples inbound audio to 16 kHz linear16
             )
             state["orchestrator"] = orchestrator
             
             # 3. Start Orchestrator Pipeline
-            asyncio.create_task(orchestrator.run_pipeline(tts_output_format="pcm_44100"))
+            state["pipeline_task"] = asyncio.create_task(orchestrator.run_pipeline(tts_output_format="pcm_44100"))
             logger.info(f"AI Orchestrator started for bot {bot_id}")
 
             # 4. Create the answer and establish the connection
@@ -140,7 +141,10 @@ async def webrtc_callback(request: Request):
                 if pc.connectionState in ["closed", "failed", "disconnected"]:
                     logger.info(f"Connection for bot {bot_id} {pc.connectionState}")
                     active_connections.pop(bot_id, None)
-                    bot_state.pop(bot_id, None)
+                    ended = bot_state.pop(bot_id, None)
+                    # Ends the session (releases its turn tasks and shared index)
+                    if ended and ended.get("pipeline_task"):
+                        ended["pipeline_task"].cancel()
 
             # Recall.ai expects the SDP answer in a JSON response
             return {"sdp": sdp_answer}
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, UploadFile, File, Form, Depends, HTTPException
+from fastapi import APIRouter, BackgroundTasks, UploadFile, File, Form, Depends, HTTPException
 from typing import List, Optional
 from pydantic import BaseModel
 from app.services.ai.rag_service import RAGService
 from app.db.supabase import get_supabase_client
+from app.services.ai.agent_cache import agent_cache
+from app.services.ai.audio_store import audio_store
 from app.core.security import get_current_user
+from app.api.v1.agents import submit_ingestion
 
 router = APIRouter()
 
@@ -12,7 +15,7 @@ class ModeConfig(BaseModel):
     system_prompt_override: Optional[str] = None
     config: Optional[dict] = {}
 
-@router.post("/{agent_id}/upload_knowledge")
+@router.post("/{agent_id}/upload_knowledge", status_code=202)
 async def upload_knowledge(
     agent_id: str,
     file: UploadFile = File(...),
@@ -29,18 +32,20 @@ async def upload_knowledge(
     content = await file.read()
     rag = RAGService(user_id=user_id)
     
-    try:
-        await rag.ingest_document(
+    # Runs in the background: poll status_url (GET /agents/{agent_id}/knowledge/jobs/{job_id})
+    job = submit_ingestion(
+        agent_id, user_id, "file", file.filename,
+        lambda progress: rag.ingest_document(
             agent_id=agent_id, 
             user_id=user_id, 
             filename=file.filename, 
             content=content,
             source_type=source_type,
-            allowed_modes=modes_list
+            allowed_modes=modes_list,
+            progress=progress
         )
-        return {"status": "success", "filename": file.filename}
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    )
+    return {"filename": file.filename, **job}
 
 @router.post("/{agent_id}/configure_mode")
 async def configure_mode(agent_id: str, config: ModeConfig, user_id: str):
@@ -67,6 +72,7 @@ async def configure_mode(agent_id: str, config: ModeConfig, user_id: str):
 @router.post("/{agent_id}/enroll_voice")
 async def enroll_voice(
     agent_id: str, 
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     user: dict = Depends(get_current_user)
 ):
@@ -169,6 +175,8 @@ async def enroll_voice(
         
         # 4. Link to Agent - Use user_client
         user_client.table("agents").update({"voice_model_id": voice_id}).eq("id", agent_id).execute()
+        agent_cache.invalidate_agent(agent_id)
+        background_tasks.add_task(audio_store.prefill, agent_id)
         
         # Notify
         from app.services.notification_service import NotificationService
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
 from app.services.websocket_manager import manager
 from app.services.ai.orchestrator import AIOrchestrator
+from app.services.ai.agent_cache import agent_cache, DEFAULT_VOICE_ID
 import asyncio
 
 router = APIRouter()
@@ -30,16 +31,19 @@ async def websocket_endpoint(websocket: WebSocket, meeting_id: str):
             except ValueError:
                 pass
 
-            meeting_data = None
-            if is_uuid:
+            # Meetings created through the API are cached (and their runtime pre-warmed) at creation time
+            meeting_data = agent_cache.get_meeting(meeting_id)
+            if not meeting_data and is_uuid:
                 # Use execute() instead of single() to handle missing rows gracefully
                 meeting_res = supabase.table("meetings").select("*").eq("id", meeting_id).execute()
                 if meeting_res.data:
                     meeting_data = meeting_res.data[0]
-            else:
+                    agent_cache.put_meeting(meeting_data)
+            elif not meeting_data:
                 meeting_res = supabase.table("meetings").select("*").filter("external_url", "ilike", f"%{meeting_id}%").execute()
                 if meeting_res.data:
                     meeting_data = meeting_res.data[0]
+                    agent_cache.put_meeting(meeting_data, key=meeting_id)
 
             if not meeting_data:
                 await websocket.close(code=4004, reason=f"Meeting {meeting_id} not found. Please run seed_data.py after updating your Service Key.")
@@ -48,11 +52,9 @@ async def websocket_endpoint(websocket: WebSocket, meeting_id: str):
             agent_id = meeting_data["agent_id"]
             mode = meeting_data.get("mode", "interview")
 
-            # 2. Get Agent
-            agent_res = supabase.table("agents").select("voice_model_id").eq("id", agent_id).execute()
-            voice_id = "21m00Tcm4TlvDq8ikWAM"
-            if agent_res.data:
-                 voice_id = agent_res.data[0].get("voice_model_id") or voice_id
+            # 2. Get Agent (cached)
+            resolved = await agent_cache.resolve_agent(agent_id)
+            voice_id = resolved.voice_model_id or DEFAULT_VOICE_ID
                  
             orchestrator = AIOrchestrator(meeting_id, agent_id, voice_id, mode=mode)
             print(f"WS Orchestrator Created for {meeting_id}")
@@ -89,6 +91,7 @@ async def websocket_endpoint(websocket: WebSocket, meeting_id: str):
                 chunk = await orchestrator.audio_output_queue.get()
                 # print(f"WS sending {len(chunk)} bytes to client")
                 await websocket.send_bytes(chunk)
+                orchestrator.mark_audio_sent()
         except Exception as e:
             print(f"WS Sender Task Error: {e}")
             import traceback
@@ -0,0 +1,13 @@
+-- Separate speculative (pre-final-transcript) spend from committed spend
+
+ALTER TABLE cost_ledger
+ADD COLUMN IF NOT EXISTS speculative BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Per-session breakdown used to evaluate the cost of speculative turns
+CREATE OR REPLACE VIEW session_speculative_costs AS
+SELECT
+    session_id,
+    SUM(cost_usd) FILTER (WHERE speculative) as speculative_cost,
+    SUM(cost_usd) FILTER (WHERE NOT speculative) as committed_cost
+FROM cost_ledger
+GROUP BY session_id;
@@ -0,0 +1,23 @@
+-- Per-turn latency reports emitted by LatencyTracker.finish_turn()
+
+CREATE TABLE IF NOT EXISTS turn_latency_reports (
+  id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+  meeting_id TEXT NOT NULL, -- Text: local-test / recall sessions are not UUIDs
+  turn_id INT NOT NULL,
+  time_to_first_audio_ms FLOAT,
+  report JSONB NOT NULL DEFAULT '{}'::jsonb, -- Checkpoint offsets + decision metadata
+  created_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_turn_latency_created ON turn_latency_reports(created_at);
+
+-- p50 / p95 time-to-first-audio per day
+CREATE OR REPLACE VIEW turn_latency_percentiles AS
+SELECT
+    date_trunc('day', created_at) as day,
+    COUNT(*) as turns,
+    percentile_cont(0.5) WITHIN GROUP (ORDER BY time_to_first_audio_ms) as p50_ttfa_ms,
+    percentile_cont(0.95) WITHIN GROUP (ORDER BY time_to_first_audio_ms) as p95_ttfa_ms
+FROM turn_latency_reports
+WHERE time_to_first_audio_ms IS NOT NULL
+GROUP BY 1;
@@ -0,0 +1,5 @@
+-- Barge-in bookkeeping: was the answer cut off, and how much of it was heard
+
+ALTER TABLE agent_audit_logs
+ADD COLUMN IF NOT EXISTS interrupted BOOLEAN NOT NULL DEFAULT FALSE,
+ADD COLUMN IF NOT EXISTS spoken_chars INT;
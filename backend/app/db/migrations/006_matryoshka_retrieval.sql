@@ -0,0 +1,74 @@
+-- Two-stage retrieval over Matryoshka-truncated embeddings (text-embedding-3-*)
+-- Requires pgvector >= 0.7 (subvector, l2_normalize)
+
+-- Per-agent truncation dimension; null = full-dimension match_documents
+ALTER TABLE agents
+ADD COLUMN IF NOT EXISTS retrieval_dim INT CHECK (retrieval_dim IN (256, 512));
+
+-- Coarse ANN indexes over the renormalized prefixes (the expressions must match the function below)
+CREATE INDEX IF NOT EXISTS idx_documents_embedding_256 ON documents
+USING hnsw ((l2_normalize(subvector(embedding, 1, 256))::vector(256)) vector_cosine_ops);
+
+CREATE INDEX IF NOT EXISTS idx_documents_embedding_512 ON documents
+USING hnsw ((l2_normalize(subvector(embedding, 1, 512))::vector(512)) vector_cosine_ops);
+
+-- Same contract as match_documents: `shortlist_count` rows are picked on the
+-- truncated prefix, then rescored and thresholded on the full 1536-dim vector.
+CREATE OR REPLACE FUNCTION match_documents_truncated (
+  query_embedding vector(1536),
+  match_threshold float,
+  match_count int,
+  filter_agent_id uuid,
+  filter_modes text[] default null,
+  filter_source_type text default null,
+  coarse_dim int default 256,
+  shortlist_count int default 100
+)
+RETURNS TABLE (
+  id uuid,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  shortlist uuid[];
+BEGIN
+  IF coarse_dim = 256 THEN
+    SELECT array_agg(c.id) INTO shortlist FROM (
+      SELECT documents.id FROM documents
+      WHERE documents.agent_id = filter_agent_id
+      AND (filter_modes IS NULL OR documents.allowed_modes IS NULL OR documents.allowed_modes && filter_modes)
+      AND (filter_source_type IS NULL OR documents.source_type = filter_source_type)
+      ORDER BY (l2_normalize(subvector(documents.embedding, 1, 256))::vector(256))
+               <=> (l2_normalize(subvector(query_embedding, 1, 256))::vector(256))
+      LIMIT shortlist_count
+    ) c;
+  ELSIF coarse_dim = 512 THEN
+    SELECT array_agg(c.id) INTO shortlist FROM (
+      SELECT documents.id FROM documents
+      WHERE documents.agent_id = filter_agent_id
+      AND (filter_modes IS NULL OR documents.allowed_modes IS NULL OR documents.allowed_modes && filter_modes)
+      AND (filter_source_type IS NULL OR documents.source_type = filter_source_type)
+      ORDER BY (l2_normalize(subvector(documents.embedding, 1, 512))::vector(512))
+               <=> (l2_normalize(subvector(query_embedding, 1, 512))::vector(512))
+      LIMIT shortlist_count
+    ) c;
+  ELSE
+    RAISE EXCEPTION 'Unsupported coarse_dim %', coarse_dim;
+  END IF;
+
+  RETURN QUERY
+  SELECT
+    documents.id,
+    documents.content,
+    documents.metadata,
+    1 - (documents.embedding <=> query_embedding) AS similarity
+  FROM documents
+  WHERE documents.id = ANY(shortlist)
+  AND 1 - (documents.embedding <=> query_embedding) > match_threshold
+  ORDER BY documents.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
@@ -0,0 +1,7 @@
+-- Incremental re-ingestion: a chunk is reused when a re-ingest of the same
+-- filename produces the same content, embedded with the same model
+ALTER TABLE documents
+ADD COLUMN IF NOT EXISTS content_hash TEXT,      -- sha256 of the whitespace-normalized chunk text
+ADD COLUMN IF NOT EXISTS embedding_model TEXT;   -- e.g. text-embedding-3-small; null = legacy row, always replaced
+
+CREATE INDEX IF NOT EXISTS idx_documents_agent_filename ON documents (agent_id, filename);
@@ -0,0 +1,19 @@
+-- Background ingestion jobs (app/services/ingestion_jobs.py)
+
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+  id UUID PRIMARY KEY,
+  agent_id UUID NOT NULL REFERENCES agents(id) ON DELETE CASCADE,
+  user_id UUID NOT NULL,
+  kind TEXT NOT NULL,                        -- file | text | url
+  source TEXT NOT NULL,                      -- Filename, title or URL
+  status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'succeeded', 'failed', 'cancelled')),
+  progress JSONB NOT NULL DEFAULT '{}'::jsonb, -- pages, chunks, reused, embedded, stored, failed
+  result JSONB,                              -- Ingestion stats of a finished job
+  error TEXT,
+  created_at TIMESTAMPTZ DEFAULT NOW(),
+  updated_at TIMESTAMPTZ DEFAULT NOW(),
+  finished_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_agent_created ON ingestion_jobs(agent_id, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_unfinished ON ingestion_jobs(updated_at) WHERE status IN ('queued', 'running');
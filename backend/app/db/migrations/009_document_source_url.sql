@@ -0,0 +1,6 @@
+-- Web documents are keyed by their canonical URL, not by their display filename
+-- ("WEB: <title>"): two pages with the same <title> are different documents
+ALTER TABLE documents
+ADD COLUMN IF NOT EXISTS source_url TEXT;   -- canonical URL of a scraped page; null for files and text
+
+CREATE INDEX IF NOT EXISTS idx_documents_agent_source_url ON documents (agent_id, source_url) WHERE source_url IS NOT NULL;
@@ -0,0 +1,5 @@
+-- Jobs where some chunks failed to store finish as 'partial' (counts in result / error)
+ALTER TABLE ingestion_jobs DROP CONSTRAINT IF EXISTS ingestion_jobs_status_check;
+ALTER TABLE ingestion_jobs
+ADD CONSTRAINT ingestion_jobs_status_check
+CHECK (status IN ('queued', 'running', 'succeeded', 'partial', 'failed', 'cancelled'));
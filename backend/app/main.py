@@ -26,6 +26,31 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+async def start_write_behind():
+    from app.services.write_behind import write_behind
+    write_behind.start()
+
+@app.on_event("shutdown")
+async def drain_write_behind():
+    from app.services.write_behind import write_behind
+    await write_behind.drain()
+
+@app.on_event("startup")
+async def start_ingestion_jobs():
+    from app.services.ingestion_jobs import ingestion_jobs
+    ingestion_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_ingestion_jobs():
+    from app.services.ingestion_jobs import ingestion_jobs
+    await ingestion_jobs.stop()
+
+@app.on_event("shutdown")
+async def close_embedding_client():
+    from app.services.ai.embedding_client import embedding_client
+    await embedding_client.aclose()
+
 @app.get("/health")
 async def health_check():
     return {"status": "alive", "service": "neuralis-api"}
@@ -0,0 +1,159 @@
+import asyncio
+import time
+import logging
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from app.db.supabase import get_supabase_client
+from app.services.ai.agent_runtime import AgentRuntime, AgentIdentity
+from app.services.ai.answer_cache import answer_cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_VOICE_ID = "21m00Tcm4TlvDq8ikWAM"
+
+class ResolvedAgent(BaseModel):
+    agent_id: str
+    identity: AgentIdentity
+    voice_model_id: Optional[str] = None
+    retrieval_dim: Optional[int] = None
+
+class AgentResolutionCache:
+    """
+    TTL cache for everything a session needs before it can speak:
+    meeting -> agent mapping, agent identity, and voice model -> provider voice ID.
+    Agent entries are invalidated explicitly when the agent is edited.
+    """
+    def __init__(self, ttl_seconds: float = 300.0):
+        self.ttl_seconds = ttl_seconds
+        self._agents: Dict[str, Tuple[float, ResolvedAgent]] = {}
+        self._voices: Dict[str, Tuple[float, str]] = {}
+        self._meetings: Dict[str, Tuple[float, Dict]] = {}
+
+    def _fresh(self, entry: Optional[Tuple[float, object]]):
+        if entry and time.monotonic() - entry[0] < self.ttl_seconds:
+            return entry[1]
+        return None
+
+    # --- Agents ---
+
+    async def resolve_agent(self, agent_id: str) -> ResolvedAgent:
+        cached = self._fresh(self._agents.get(agent_id))
+        if cached:
+            return cached
+
+        supabase = get_supabase_client()
+        agent_resp = await asyncio.to_thread(supabase.table("agents").select("*").eq("id", agent_id).execute)
+        if not agent_resp.data:
+            raise ValueError(f"Agent {agent_id} not found")
+
+        agent_data = agent_resp.data[0]
+        resolved = ResolvedAgent(
+            agent_id=agent_id,
+            identity=AgentIdentity(
+                name=agent_data.get("name") or "Agent",
+                role=agent_data.get("role") or "Assistant",
+                years_experience=agent_data.get("years_experience") or 0,
+                communication_style=agent_data.get("communication_style") or "formal",
+                guardrails=agent_data.get("guardrails") or {}
+            ),
+            voice_model_id=agent_data.get("voice_model_id"),
+            retrieval_dim=agent_data.get("retrieval_dim")
+        )
+        self._agents[agent_id] = (time.monotonic(), resolved)
+        return resolved
+
+    def invalidate_agent(self, agent_id: str):
+        """Drop cached identity/voice for an agent (and any runtimes or answers derived from it)."""
+        self._agents.pop(agent_id, None)
+        runtime_pool.discard(agent_id)
+        answer_cache.invalidate(agent_id, identity=True)
+
+    # --- Voices ---
+
+    async def resolve_voice(self, voice_id: Optional[str]) -> str:
+        """
+        If voice_id is an internal model ID (e.g., 'eleven_monolingual_v1'),
+        resolve it to the provider's external ID. If not found, assume it's a valid external ID.
+        """
+        voice_id = voice_id or DEFAULT_VOICE_ID
+        cached = self._fresh(self._voices.get(voice_id))
+        if cached:
+            return cached
+
+        supabase = get_supabase_client()
+        voice_res = await asyncio.to_thread(supabase.table("voice_models").select("voice_id").eq("id", voice_id).execute)
+        if voice_res.data and voice_res.data[0].get("voice_id"):
+             resolved_voice = voice_res.data[0].get("voice_id")
+             logger.info(f"Resolved Voice ID: {voice_id} -> {resolved_voice}")
+        else:
+             resolved_voice = voice_id
+             logger.info(f"Using provided Voice ID directly (likely a cloned voice): {voice_id}")
+
+        self._voices[voice_id] = (time.monotonic(), resolved_voice)
+        return resolved_voice
+
+    # --- Meetings ---
+
+    def get_meeting(self, meeting_key: str) -> Optional[Dict]:
+        return self._fresh(self._meetings.get(meeting_key))
+
+    def put_meeting(self, meeting: Dict, key: Optional[str] = None):
+        self._meetings[key or meeting["id"]] = (time.monotonic(), meeting)
+
+class RuntimePool:
+    """
+    Pre-initialized AgentRuntime instances for agents with upcoming meetings,
+    keyed by (agent_id, mode). A runtime is handed out once; unclaimed runtimes
+    expire, and every prewarm/acquire sweeps all keys (agents whose meeting never
+    started are never acquired, so a per-key sweep would keep them forever).
+    """
+    def __init__(self, max_per_agent: int = 2, ttl_seconds: float = 900.0):
+        self.max_per_agent = max_per_agent
+        self.ttl_seconds = ttl_seconds
+        self._pool: Dict[Tuple[str, str], List[Tuple[float, AgentRuntime]]] = {}
+
+    async def prewarm(self, agent_id: str, mode: str = "interview"):
+        key = (agent_id, mode)
+        self._expire()
+        if len(self._pool.get(key, [])) >= self.max_per_agent:
+            return
+        try:
+            resolved = await agent_cache.resolve_agent(agent_id)
+            if resolved.voice_model_id:
+                await agent_cache.resolve_voice(resolved.voice_model_id)
+            runtime = AgentRuntime(agent_id, resolved.identity, mode, retrieval_dim=resolved.retrieval_dim)
+            await runtime.warm_start()
+        except Exception as e:
+            logger.error(f"Pre-warm failed for agent {agent_id}: {e}")
+            return
+        self._pool.setdefault(key, []).append((time.monotonic(), runtime))
+        logger.info(f"Pre-warmed runtime for agent {agent_id} ({mode})")
+
+    def acquire(self, agent_id: str, mode: str) -> Optional[AgentRuntime]:
+        key = (agent_id, mode)
+        self._expire()
+        entries = self._pool.get(key)
+        if not entries:
+            return None
+        _, runtime = entries.pop(0)
+        if not entries:
+            del self._pool[key]
+        return runtime
+
+    def discard(self, agent_id: str):
+        for key in [k for k in self._pool if k[0] == agent_id]:
+            for _, runtime in self._pool.pop(key):
+                runtime.close()
+
+    def _expire(self):
+        now = time.monotonic()
+        for key, entries in list(self._pool.items()):
+            for ts, runtime in entries:
+                if now - ts >= self.ttl_seconds:
+                    runtime.close()
+            entries[:] = [(ts, rt) for ts, rt in entries if now - ts < self.ttl_seconds]
+            if not entries:
+                del self._pool[key]
+
+agent_cache = AgentResolutionCache()
+runtime_pool = RuntimePool()
@@ -1,15 +1,28 @@
 import json
 import asyncio
-from typing import List, Optional, Dict, Any
+from typing import AsyncGenerator, Callable, List, Optional, Dict, Any, Set
 from pydantic import BaseModel
 from app.services.ai.base import AIService
 from app.services.ai.llm_service import OpenAILLMService
-from app.services.ai.rag_service import RAGService
+from app.services.ai.rag_service import RAGService, corpus_version
+from app.services.ai.embedding_client import EmbeddingError
 from app.services.ai.question_boundary_detector import QuestionBoundaryDetector
+from app.services.ai.latency_tracker import LatencyTracker
+from app.services.ai.answer_cache import answer_cache, CachedAnswer
+from app.services.ai.cognitive_cache import CognitiveCache
+from app.services.ai.index_registry import index_registry, IndexHandle
 import logging
 
 logger = logging.getLogger(__name__)
 
+MODES = ["interview", "standup"]
+
+# Fixed utterances (no LLM involved); their audio is pre-rendered per voice (see audio_store)
+DEFAULT_REFUSAL_TEXT = "I cannot answer that."
+GREETING_TEXT = "Hello! I am ready to begin."
+CLARIFY_TEXT = "Could you clarify that?"
+ERROR_TEXT = "I am experiencing a temporary system error."
+
 class AgentIdentity(BaseModel):
     name: str
     role: str = "Assistant"
@@ -17,54 +30,43 @@ class AgentIdentity(BaseModel):
     communication_style: str = "formal"  # 'confident', 'concise', 'casual', 'formal'
     guardrails: Dict = {}
 
-class CognitiveCache:
+def disclosure_text(identity: AgentIdentity, mode: str) -> str:
+    """Opening AI disclosure spoken when the agent joins a meeting."""
+    return f"Hello. I am {identity.name}, an AI assistant. I am recording this session for {mode} purposes."
+
+def fixed_utterances(identity: AgentIdentity) -> List[str]:
+    """Every text an agent can speak without the LLM, across modes."""
+    return (
+        [disclosure_text(identity, mode) for mode in MODES]
+        + list(QuestionBoundaryDetector.REFUSAL_TEMPLATES.values())
+        + [DEFAULT_REFUSAL_TEXT, GREETING_TEXT, CLARIFY_TEXT, ERROR_TEXT]
+    )
+
+class ResponseStream:
     """
-    In-memory vector store for the active session.
-    Eliminates DB latency for high-frequency access.
+    Token stream for a single turn, as returned by `AgentRuntime.stream_response`.
+    `result` has the same shape as the `generate_response` dict.
     """
-    def __init__(self):
-        self._cache: List[Dict[str, Any]] = []
-        self._frozen = False
+    def __init__(self, result: Dict, tokens: Optional[AsyncGenerator[str, None]] = None):
+        self.result = result
+        self._tokens = tokens
+
+    @property
+    def is_fixed(self) -> bool:
+        """True when the answer was decided without the LLM (refusals, greetings)."""
+        return self._tokens is None
 
-    def add_document(self, doc_id: str, content: str, embedding: List[float], metadata: Dict):
-        if self._frozen:
+    async def __aiter__(self):
+        if self._tokens is None:
+            if self.result.get("text"):
+                yield self.result["text"]
             return
-        self._cache.append({
-            "id": doc_id,
-            "content": content,
-            "embedding": embedding,
-            "metadata": metadata
-        })
-
-    def freeze(self):
-        self._frozen = True
-        logger.info(f"CognitiveCache frozen with {len(self._cache)} items.")
-
-    def search(self, query_embedding: List[float], limit: int = 3, threshold: float = 0.75) -> List[Any]:
-        """
-        O(N) Cosine Similarity in pure Python (numpy-free for minimal dependency).
-        Efficient enough for < 1000 items (typical resume/project scale).
-        """
-        if not self._cache:
-            return []
-
-        results = []
-        # Simple dot product for normalized vectors (assuming OpenAI embeddings are normalized)
-        for item in self._cache:
-            score = sum(a * b for a, b in zip(item["embedding"], query_embedding))
-            if score >= threshold:
-                results.append((score, item))
-        
-        results.sort(key=lambda x: x[0], reverse=True)
-        
-        # Return object-like structure to match RAGService API
-        class CacheResult:
-            def __init__(self, id, content, score):
-                self.id = id
-                self.content = content
-                self.score = score
-                
-        return [CacheResult(r[1]["id"], r[1]["content"], r[0]) for r in results[:limit]]
+        async for token in self._tokens:
+            yield token
+
+    async def aclose(self):
+        if self._tokens is not None:
+            await self._tokens.aclose()
 
 class AgentRuntime(AIService):
     """
@@ -75,11 +77,14 @@ class AgentRuntime(AIService):
     3. RAG-enforced knowledge boundaries (deflects if unknown)
     """
 
-    def __init__(self, agent_id: str, identity: AgentIdentity, mode: str = "interview"):
+    def __init__(self, agent_id: str, identity: AgentIdentity, mode: str = "interview", latency_tracker: Optional[LatencyTracker] = None,
+                 retrieval_dim: Optional[int] = None):
         super().__init__()
         self.agent_id = agent_id
         self.identity = identity
         self.mode = mode  # 'interview' | 'standup'
+        # Matryoshka truncation for two-stage retrieval (agents.retrieval_dim; None = full-dimension search)
+        self.retrieval_dim = retrieval_dim
         self.llm = OpenAILLMService()
         self.rag = RAGService()
         
@@ -87,19 +92,57 @@ class AgentRuntime(AIService):
         self.standup_context: Optional[str] = None
         self.cognitive_cache = CognitiveCache()
         self.warm_started = False
+        # Shared read-only index borrowed from the registry (None = cold, RPC retrieval)
+        self._index: Optional[IndexHandle] = None
+        self._refresh_task: Optional[asyncio.Task] = None
         self.qbd = QuestionBoundaryDetector()
+        self._system_prompts: Dict[str, str] = {}
+        # Answer cache generations: the agent's identity this runtime was built
+        # with (fixed) and its knowledge, re-read on index refresh (see AnswerCache)
+        self._identity_generation = answer_cache.identity_generation(agent_id)
+        self._answer_generation = answer_cache.generation(agent_id)
+        self._store_tasks: Set[asyncio.Task] = set()  # Answers waiting on their final query's embedding
+        # Per-meeting tracker owned by the Orchestrator (None = no instrumentation)
+        self.latency_tracker = latency_tracker
     
     async def warm_start(self):
         """
         Pre-fetch documents relevant to the current mode into memory.
+        Borrows the agent's shared index for the allowed modes (loading it if no
+        other session holds it); retrieval then stays in-process until the corpus
+        or mode changes. On failure the runtime stays cold and uses the match_documents RPC.
         """
         logger.info(f"Warm-starting Agent {self.agent_id} for mode {self.mode}")
-        # Temporary Stub: We mark as warm to allow generation to proceed.
-        # In a real implementation with `rag.list_documents_with_embeddings`, we would populate self.cognitive_cache here.
+        # Read before loading: an ingest racing the load must still invalidate
+        generation = answer_cache.generation(self.agent_id)
+        try:
+            handle = await index_registry.acquire(self.agent_id, self._allowed_modes(), self.rag, coarse_dim=self.retrieval_dim)
+        except Exception as e:
+            logger.error(f"Warm start failed for Agent {self.agent_id}, using RPC retrieval: {e}")
+            return
+
+        previous, self._index = self._index, handle
+        self.cognitive_cache = handle.cache
+        if previous:
+            previous.release()
         self.warm_started = True
+        self._refresh_answer_generation(generation)
+
+    def _refresh_answer_generation(self, generation: int):
+        """Adopt the agent's current answer generation, unless this runtime's identity is outdated."""
+        if self._identity_generation == answer_cache.identity_generation(self.agent_id):
+            self._answer_generation = generation
+
+    def close(self):
+        """End of session: give the shared index back to the registry."""
+        if self._refresh_task and not self._refresh_task.done():
+            self._refresh_task.cancel()
+        if self._index:
+            self._index.release()
+            self._index = None
 
     def set_mode(self, mode: str):
-        if mode not in ["interview", "standup"]:
+        if mode not in MODES:
             raise ValueError(f"Invalid mode: {mode}")
         self.mode = mode
         logger.info(f"Agent {self.agent_id} switched to {mode} mode.")
@@ -113,13 +156,203 @@ class AgentRuntime(AIService):
         Main entry point for generating a response.
         Enforces all constraints with Dual-Loop Logic & Question Boundary Detector.
         """
-        
+        plan = await self._plan_turn(query)
+        if "llm_request" not in plan:
+            return plan
+
+        llm_request = plan.pop("llm_request")
+        query_embedding = plan.pop("query_embedding", None)
+        try:
+            response_text = await self.llm.generate(**llm_request)
+            plan["text"] = response_text
+            plan["decision_path"] = self._classify_answer(response_text)
+            self._store_answer(query, query_embedding, plan)
+            return plan
+
+        except Exception as e:
+            logger.error(f"LLM Generation failed: {e}")
+            return self._error_response()
+
+    async def stream_response(self, query: str, meeting_id: str, speculation: Optional[Dict] = None) -> "ResponseStream":
+        """
+        Streaming entry point used by the Orchestrator.
+        Runs the same gates as `generate_response`, then returns a ResponseStream
+        whose tokens can be piped straight into TTS. Decision metadata is final
+        once the stream has been exhausted (or closed).
+
+        `speculation` is a committed result of `speculate()`: its embedding and
+        retrieved docs replace those stages, and its LLM draft (if any) replaces
+        generation. QBD always re-runs on the final query. The answer is cached
+        under the final query's embedding, not the speculated prefix's.
+        """
+        docs = speculation.get("docs") if speculation else None
+        embedding = speculation.get("embedding") if speculation else None
+        plan = await self._plan_turn(query, docs=docs, embedding=embedding)
+        if "llm_request" not in plan:
+            return ResponseStream(plan)
+
+        llm_request = plan.pop("llm_request")
+        query_embedding = plan.pop("query_embedding", None)
+        if embedding is not None and speculation.get("query") != query:
+            # The speculation embedded a prefix of the question
+            store = lambda result: self._store_answer_reembedded(query, result)
+        else:
+            store = lambda result: self._store_answer(query, query_embedding, result)
+        if speculation and speculation.get("draft"):
+            plan["text"] = speculation["draft"]
+            plan["decision_path"] = self._classify_answer(plan["text"])
+            store(plan)
+            return ResponseStream(plan)
+
+        plan["text"] = ""
+        return ResponseStream(plan, self._stream_llm(plan, llm_request, meeting_id, store))
+
+    async def speculate(self, query: str, draft: bool = False, usage: Optional[Dict[str, float]] = None) -> Dict:
+        """
+        Speculative pre-computation on a (possibly partial) interim transcript.
+        Runs QBD and, if the query would reach retrieval, the embedding + RPC.
+        With `draft`, also generates a full LLM answer for the prefix.
+        Results are only used if the final transcript matches (see SpeculativeExecutor).
+        `usage` is filled with token estimates (chars/4) as requests are issued, so
+        a cancelled speculation can still be billed.
+        """
+        speculation = {"query": query, "embedding": None, "docs": None, "draft": None, "llm_request": None}
+        usage = usage if usage is not None else {}
+
+        embedding_task = asyncio.create_task(self.rag.embed_query(query))
+        usage["embedding_tokens"] = len(query) / 4
+        try:
+            qbd_verdict = await self.qbd.evaluate(query, self.cognitive_cache, self.mode, self.identity)
+            if qbd_verdict.decision == "REFUSE" or qbd_verdict.intent == "greeting":
+                # Nothing expensive to pre-compute
+                return speculation
+
+            speculation["embedding"] = await embedding_task
+            speculation["docs"] = await self._retrieve(query, embedding=speculation["embedding"])
+        except EmbeddingError as e:
+            # Nothing pre-computed: the committed turn embeds (and reports the failure) itself
+            logger.warning(f"Speculative embedding failed: {e}")
+            speculation["embedding"] = None
+            return speculation
+        finally:
+            embedding_task.cancel()
+
+        if draft:
+            plan = await self._plan_turn(query, docs=speculation["docs"], embedding=speculation["embedding"])
+            if "llm_request" in plan:
+                llm_request = speculation["llm_request"] = plan["llm_request"]
+                usage["llm_input_tokens"] = len(llm_request["system_prompt"] + llm_request["user_prompt"]) / 4
+                speculation["draft"] = await self.llm.generate(**llm_request)
+                usage["llm_output_tokens"] = len(speculation["draft"] or "") / 4
+
+        return speculation
+
+    async def _stream_llm(self, result: Dict, llm_request: Dict, meeting_id: str,
+                          store: Callable[[Dict], None]) -> AsyncGenerator[str, None]:
+        parts: List[str] = []
+        completed = False
+        stream = self.llm.generate_stream(**llm_request, tracker=self.latency_tracker, session_id=meeting_id)
+        try:
+            async for token in stream:
+                parts.append(token)
+                yield token
+            completed = True
+        except Exception as e:
+            logger.error(f"LLM Streaming failed: {e}")
+            if not parts:
+                # Nothing spoken yet: fall back to the standard error utterance
+                result.update(self._error_response())
+                yield result["text"]
+                return
+        finally:
+            # Barge-in closes us mid-answer: close the provider stream now, not at GC
+            await stream.aclose()
+            if parts:
+                result["text"] = "".join(parts)
+                result["decision_path"] = self._classify_answer(result["text"])
+            if completed:
+                # Answers cut short by barge-in are never cached
+                store(result)
+
+    def _allowed_modes(self) -> List[str]:
+        # We only retrieve docs allowed for the current mode.
+        allowed_modes = [self.mode]
+        if self.mode == "standup":
+             allowed_modes.append("general")
+        return allowed_modes
+
+    def _cache_ready(self, allowed_modes: List[str]) -> bool:
+        """
+        The in-memory index is usable: loaded, for these modes, and not behind an ingest/delete.
+        A stale index triggers a background swap to the current snapshot.
+        """
+        if not self._index:
+            # RPC retrieval always sees the current corpus
+            self._refresh_answer_generation(answer_cache.generation(self.agent_id))
+            return False
+        if self._index.modes == allowed_modes and self._index.version == corpus_version(self.agent_id):
+            return True
+        if not self._refresh_task or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self.warm_start())
+        return False
+
+    async def _retrieve(self, query: str, embedding: Optional[List[float]] = None, tracker: Optional[LatencyTracker] = None) -> List[Any]:
+        allowed_modes = self._allowed_modes()
+
+        if embedding is None:
+            embedding = await self.rag.embed_query(query, tracker=tracker)
+
+        if self._cache_ready(allowed_modes):
+            # Same limit/threshold as the RPC below
+            docs = self.cognitive_cache.search(embedding, limit=5, threshold=0.75)
+            if tracker:
+                tracker.annotate("retrieval", "memory")
+            return docs
+
+        if tracker:
+            tracker.annotate("retrieval", "rpc")
+        return await self.rag.search_by_embedding(
+            embedding,
+            agent_id=self.agent_id, 
+            filters={"modes": allowed_modes},
+            threshold=0.75,
+            tracker=tracker,
+            coarse_dim=self.retrieval_dim
+        )
+
+    async def _plan_turn(self, query: str, docs: Optional[List[Any]] = None, embedding: Optional[List[float]] = None) -> Dict:
+        """
+        Everything up to the LLM call: QBD gates, retrieval and prompt compilation.
+        Returns either a finished response (short-circuit) or a response skeleton
+        carrying an `llm_request` for the generation step.
+        Pre-fetched `docs` / `embedding` (from a committed speculation) skip those stages.
+
+        Stage graph (only the answer cache and match_documents depend on the embedding):
+            embed_query ──────────────┐
+            QBD (regex, intent, mode) ┴─> answer cache ─> match_documents ─> context ─> llm_request
+        The embedding starts before QBD and is cancelled if QBD short-circuits.
+        The system prompt is compiled once per mode, off the turn's critical path.
+        """
+        embedding_task = None
+        if embedding is None and docs is None:
+            embedding_task = asyncio.create_task(self.rag.embed_query(query, tracker=self.latency_tracker))
+
+        try:
+            return await self._run_turn_stages(query, docs, embedding, embedding_task)
+        finally:
+            if embedding_task and not embedding_task.done():
+                embedding_task.cancel()
+
+    async def _run_turn_stages(self, query: str, docs: Optional[List[Any]], embedding: Optional[List[float]],
+                               embedding_task: Optional[asyncio.Task]) -> Dict:
         # --- STAGE 0: QUESTION BOUNDARY DETECTOR (Pre-Retrieval) ---
         qbd_verdict = await self.qbd.evaluate(query, self.cognitive_cache, self.mode, self.identity)
+        if self.latency_tracker:
+            self.latency_tracker.mark("qbd_complete")
         
         if qbd_verdict.decision == "REFUSE":
             return {
-                "text": qbd_verdict.suggested_template or "I cannot answer that.",
+                "text": qbd_verdict.suggested_template or DEFAULT_REFUSAL_TEXT,
                 "retrieved_sources": [],
                 "confidence": 1.0,
                 "decision_path": f"qbd_refusal_{qbd_verdict.refusal_reason}",
@@ -129,7 +362,7 @@ class AgentRuntime(AIService):
         if qbd_verdict.decision == "ALLOW_FAST" and qbd_verdict.intent == "greeting":
              # Fast greeting short-circuit
              return {
-                 "text": "Hello! I am ready to begin.",
+                 "text": GREETING_TEXT,
                  "retrieved_sources": [],
                  "confidence": 1.0,
                  "decision_path": "qbd_fast_greeting",
@@ -144,19 +377,31 @@ class AgentRuntime(AIService):
         loop_type = "FAST" if is_fast_loop else "DEEP"
         # ------------------------
 
+        if embedding is None and embedding_task is not None:
+            try:
+                embedding = await embedding_task
+            except EmbeddingError as e:
+                # Retrieving without an embedding would answer from no knowledge
+                logger.error(f"Query embedding failed for Agent {self.agent_id}: {e}")
+                return {**self._error_response(), "decision_path": "embedding_error", "loop_used": loop_type}
+
+        # 0. ANSWER CACHE: a semantically identical question skips retrieval and the LLM
+        if embedding is not None and self._answer_cacheable():
+            self._cache_ready(self._allowed_modes())  # Refreshes a stale index / answer generation
+            cached = answer_cache.get(self.agent_id, self.mode, embedding, self._answer_generation, loop_used=loop_type)
+            if cached:
+                return {
+                    "text": cached.text,
+                    "retrieved_sources": cached.retrieved_sources,
+                    "confidence": cached.confidence,
+                    "decision_path": "answer_cache_hit",
+                    "loop_used": loop_type
+                }
+
         # 1. RETRIEVAL (STRICT)
         # Try Cache first (if implemented), else DB.
-        # We only retrieve docs allowed for the current mode.
-        allowed_modes = [self.mode]
-        if self.mode == "standup":
-             allowed_modes.append("general")
-
-        docs = await self.rag.search(
-            query=query, 
-            agent_id=self.agent_id, 
-            filters={"modes": allowed_modes},
-            threshold=0.75
-        )
+        if docs is None:
+            docs = await self._retrieve(query, embedding=embedding, tracker=self.latency_tracker)
 
         # 2. DECISION: DEFINE CONTEXT
         context_str = ""
@@ -186,7 +431,7 @@ class AgentRuntime(AIService):
              if loop_type == "FAST":
                  # Fast loop refusal
                  return {
-                     "text": "Could you clarify that?",
+                     "text": CLARIFY_TEXT,
                      "retrieved_sources": [],
                      "confidence": 0.0,
                      "decision_path": "fast_refusal",
@@ -194,44 +439,84 @@ class AgentRuntime(AIService):
                  }
 
         # 4. SYSTEM PROMPT COMPILATION
-        system_prompt = self._compile_system_prompt()
+        system_prompt = self._system_prompt()
 
         # 5. GENERATE (Dual-Loop optimized)
         max_tokens = 50 if is_fast_loop else self.identity.guardrails.get("max_answer_seconds", 30) * 8
         
-        try:
-            # If Fast Loop, we append a "Be extremely concise" instruction
-            final_system_prompt = system_prompt
-            if is_fast_loop:
-                final_system_prompt += "\n[SPEED CONSTRAINT] Answer in 1 sentence. < 15 words."
-
-            response_text = await self.llm.generate(
-                system_prompt=final_system_prompt,
-                user_prompt=f"Context:\n{context_str}\n\nUser Query: {query}",
-                max_tokens=int(max_tokens)
-            )
-            
-            # Post-processing: Check if LLM refused
-            decision = "retrieval"
-            if "I don't have that information" in response_text:
-                decision = "refusal"
+        # If Fast Loop, we append a "Be extremely concise" instruction
+        final_system_prompt = system_prompt
+        if is_fast_loop:
+            final_system_prompt += "\n[SPEED CONSTRAINT] Answer in 1 sentence. < 15 words."
 
-            return {
-                "text": response_text,
-                "retrieved_sources": retrieved_ids,
-                "confidence": docs[0].score if docs else 0.0,
-                "decision_path": decision,
-                "loop_used": loop_type
+        return {
+            "text": None,
+            "retrieved_sources": retrieved_ids,
+            "confidence": docs[0].score if docs else 0.0,
+            "decision_path": "retrieval",
+            "loop_used": loop_type,
+            "query_embedding": embedding,
+            "llm_request": {
+                "system_prompt": final_system_prompt,
+                "user_prompt": f"Context:\n{context_str}\n\nUser Query: {query}",
+                "max_tokens": int(max_tokens)
             }
+        }
 
-        except Exception as e:
-            logger.error(f"LLM Generation failed: {e}")
-            return {
-                "text": "I am experiencing a temporary system error.",
-                "retrieved_sources": [],
-                "confidence": 0.0,
-                "decision_path": "error"
-            }
+    def _classify_answer(self, response_text: str) -> str:
+        # Post-processing: Check if LLM refused
+        if "I don't have that information" in response_text:
+            return "refusal"
+        return "retrieval"
+
+    def _answer_cacheable(self) -> bool:
+        # Standup answers depend on the ephemeral standup context
+        return not (self.mode == "standup" and self.standup_context)
+
+    def _answer_storable(self, result: Dict) -> bool:
+        return result.get("decision_path") == "retrieval" and bool(result.get("text")) and self._answer_cacheable()
+
+    def _store_answer(self, query: str, embedding: Optional[List[float]], result: Dict):
+        if embedding is None or not self._answer_storable(result):
+            return
+        answer_cache.put(self.agent_id, self.mode, CachedAnswer(
+            query=query,
+            embedding=embedding,
+            text=result["text"],
+            retrieved_sources=[str(s) for s in result.get("retrieved_sources", [])],
+            confidence=result.get("confidence") or 0.0,
+            loop_used=result.get("loop_used") or "DEEP"
+        ), self._answer_generation)
+
+    def _store_answer_reembedded(self, query: str, result: Dict):
+        """Cache an answer under `query`'s own embedding, computed in the background."""
+        if not self._answer_storable(result):
+            return
+        task = asyncio.create_task(self._embed_and_store(query, result))
+        self._store_tasks.add(task)
+        task.add_done_callback(self._store_tasks.discard)
+
+    async def _embed_and_store(self, query: str, result: Dict):
+        try:
+            embedding = await self.rag.embed_query(query)
+        except EmbeddingError as e:
+            logger.warning(f"Answer not cached, embedding the final query failed: {e}")
+            return
+        self._store_answer(query, embedding, result)
+
+    def _error_response(self) -> Dict:
+        return {
+            "text": ERROR_TEXT,
+            "retrieved_sources": [],
+            "confidence": 0.0,
+            "decision_path": "error"
+        }
+
+    def _system_prompt(self) -> str:
+        # Identity is immutable, so the prompt only changes with the mode
+        if self.mode not in self._system_prompts:
+            self._system_prompts[self.mode] = self._compile_system_prompt()
+        return self._system_prompts[self.mode]
 
     def _compile_system_prompt(self) -> str:
         """
@@ -0,0 +1,134 @@
+import os
+import math
+import logging
+from abc import ABC, abstractmethod
+from typing import Optional
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class ANNIndex(ABC):
+    """
+    Abstract Base Class for approximate candidate generators over the unit-row
+    matrix of a CognitiveCache. `candidates` returns row indices to score; the
+    cache rescores them exactly, so an ANN backend only trades recall for fewer rows scanned.
+    """
+    name = "base"
+
+    @abstractmethod
+    def build(self, matrix: np.ndarray):
+        """
+        Index the rows of `matrix` (unit-normalized float32).
+        """
+        pass
+
+    @abstractmethod
+    def candidates(self, query: np.ndarray) -> np.ndarray:
+        """
+        Row indices worth scoring for a unit `query` vector.
+        """
+        pass
+
+    def save(self, path: str):
+        """
+        Persist next to a CognitiveCache snapshot. Optional: by default the index is rebuilt on open.
+        """
+        pass
+
+class IVFIndex(ANNIndex):
+    """
+    Inverted-file index: a spherical k-means coarse quantizer partitions the
+    rows into `nlist` lists; a query scans the rows of its `nprobe` closest lists.
+
+    Tuning: recall and latency both grow with `nprobe` (rows scanned is about
+    nprobe / nlist of the corpus). `nlist` defaults to ~sqrt(N).
+    """
+    name = "ivf"
+    CENTROIDS_FILE = "ivf_centroids.npy"
+    ORDER_FILE = "ivf_order.npy"
+    OFFSETS_FILE = "ivf_offsets.npy"
+
+    def __init__(self, nlist: Optional[int] = None, nprobe: Optional[int] = None,
+                 train_iters: int = 10, sample_per_list: int = 64, seed: int = 0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iters = train_iters
+        self.sample_per_list = sample_per_list
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.order: Optional[np.ndarray] = None     # Row ids grouped by list
+        self.offsets: Optional[np.ndarray] = None   # List boundaries into `order`
+
+    def build(self, matrix: np.ndarray):
+        n = len(matrix)
+        nlist = min(n, self.nlist or max(1, int(round(math.sqrt(n)))))
+        self.nlist = nlist
+        if not self.nprobe:
+            self.nprobe = max(4, nlist // 16)
+
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(n, nlist * self.sample_per_list)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+        for _ in range(self.train_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            counts = np.bincount(assign, minlength=nlist)
+            filled = np.flatnonzero(counts)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            centroids[filled] = np.add.reduceat(sample[order], starts, axis=0)
+            # Re-seed empty lists from random sample rows
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            centroids /= norms
+
+        self.centroids = centroids
+        self._assign_rows(matrix)
+
+    def _assign_rows(self, matrix: np.ndarray, block: int = 8192):
+        assign = np.empty(len(matrix), dtype=np.int32)
+        for start in range(0, len(matrix), block):
+            assign[start:start + block] = np.argmax(np.asarray(matrix[start:start + block]) @ self.centroids.T, axis=1)
+        self.order = np.argsort(assign, kind="stable").astype(np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=self.nlist)))).astype(np.int64)
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        nprobe = min(self.nlist, nprobe or self.nprobe)
+        centroid_scores = self.centroids @ query
+        if nprobe < self.nlist:
+            probe = np.argpartition(centroid_scores, -nprobe)[-nprobe:]
+        else:
+            probe = np.arange(self.nlist)
+        rows = np.concatenate([self.order[self.offsets[c]:self.offsets[c + 1]] for c in probe])
+        rows.sort()  # Sequential access into the (possibly mmapped) matrix
+        return rows
+
+    def save(self, path: str):
+        np.save(os.path.join(path, self.CENTROIDS_FILE), self.centroids)
+        np.save(os.path.join(path, self.ORDER_FILE), self.order)
+        np.save(os.path.join(path, self.OFFSETS_FILE), self.offsets)
+
+    @classmethod
+    def load(cls, path: str, n_rows: int, nprobe: Optional[int] = None) -> Optional["IVFIndex"]:
+        """The index persisted with a snapshot, or None if absent or not built for `n_rows` rows."""
+        try:
+            centroids = np.load(os.path.join(path, cls.CENTROIDS_FILE))
+            order = np.load(os.path.join(path, cls.ORDER_FILE))
+            offsets = np.load(os.path.join(path, cls.OFFSETS_FILE))
+        except FileNotFoundError:
+            return None
+        if len(order) != n_rows:
+            return None
+        index = cls(nlist=len(centroids), nprobe=nprobe or max(4, len(centroids) // 16))
+        index.centroids, index.order, index.offsets = centroids, order, offsets
+        return index
+
+def choose_index(n_rows: int, min_rows: int) -> Optional[ANNIndex]:
+    """Exact scan (None) for small corpora, IVF from `min_rows` chunks up."""
+    if n_rows < min_rows:
+        return None
+    return IVFIndex()
@@ -0,0 +1,182 @@
+import logging
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+class CachedAnswer(BaseModel):
+    query: str
+    embedding: List[float]
+    text: str
+    retrieved_sources: List[str] = []
+    confidence: float = 0.0
+    loop_used: str = "DEEP"
+
+class _Partition:
+    """
+    Answers of one (agent_id, mode): unit query vectors as rows of a float32
+    matrix, with the answer of each row in `slots`. A lookup is one `matrix @ q`.
+    `slots` is ordered least to most recently used (row index -> answer).
+    Rows are allocated on demand, doubling from `initial` up to `capacity`.
+    """
+    def __init__(self, capacity: int, dim: int, initial: int = 8):
+        self.capacity = capacity
+        rows = min(initial, capacity)
+        self.matrix = np.zeros((rows, dim), dtype=np.float32)
+        self.loops = np.empty(rows, dtype=object)   # loop_used per row
+        self.used = np.zeros(rows, dtype=bool)
+        self.slots: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    @property
+    def nbytes(self) -> int:
+        return self.matrix.nbytes + self.loops.nbytes + self.used.nbytes
+
+    def _grow(self):
+        rows = min(2 * len(self.matrix), self.capacity)
+        matrix = np.zeros((rows, self.matrix.shape[1]), dtype=np.float32)
+        matrix[:len(self.matrix)] = self.matrix
+        loops = np.empty(rows, dtype=object)
+        loops[:len(self.loops)] = self.loops
+        used = np.zeros(rows, dtype=bool)
+        used[:len(self.used)] = self.used
+        self.matrix, self.loops, self.used = matrix, loops, used
+
+    def search(self, query: np.ndarray, threshold: float, loop_used: Optional[str]) -> Optional[int]:
+        scores = self.matrix @ query
+        mask = self.used if not loop_used else self.used & (self.loops == loop_used)
+        scores[~mask] = -np.inf
+        row = int(np.argmax(scores))
+        return row if scores[row] >= threshold else None
+
+    def add(self, vector: np.ndarray, answer: CachedAnswer) -> bool:
+        """Store in a free row, else in the least recently used one. True if an answer was evicted."""
+        if len(self.slots) == len(self.matrix) < self.capacity:
+            self._grow()
+        free = np.flatnonzero(~self.used)
+        evicted = not len(free)
+        row = int(free[0]) if len(free) else next(iter(self.slots))
+        self.slots.pop(row, None)
+        self.matrix[row] = vector
+        self.loops[row] = answer.loop_used
+        self.used[row] = True
+        self.slots[row] = answer
+        return evicted
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers, partitioned by (agent_id, mode).
+    A lookup is a hit when a stored query embedding is within `threshold`
+    cosine similarity of the new one. Each partition is an LRU capped at
+    `max_entries` and grows its matrix as answers arrive; whole partitions are
+    LRU-evicted past `max_partitions` or `max_bytes` of matrices in total.
+    Lookups are a numpy matrix-vector product (a few microseconds for a full
+    partition), cheap enough to stay on the event loop.
+
+    Agents carry a generation number that is bumped whenever their documents
+    or identity change. Runtimes re-read it whenever their index is refreshed; a
+    runtime holding an older generation bypasses the cache (counted as `stale`)
+    so it cannot serve or store stale answers. Identity changes also bump an
+    identity generation: runtimes built with the old identity never catch up.
+    """
+    def __init__(self, threshold: float = 0.95, max_entries: int = 256, max_partitions: int = 512,
+                 max_bytes: int = 128 * 1024 * 1024):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.max_partitions = max_partitions
+        self.max_bytes = max_bytes
+        self._partitions: "OrderedDict[Tuple[str, str], _Partition]" = OrderedDict()
+        self._bytes = 0  # Sum of partition nbytes
+        self._generations: Dict[str, int] = {}
+        self._identity_generations: Dict[str, int] = {}
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0       # Lookups bypassed by a runtime behind the agent's generation
+        self.evictions = 0
+
+    def generation(self, agent_id: str) -> int:
+        return self._generations.get(agent_id, 0)
+
+    def identity_generation(self, agent_id: str) -> int:
+        return self._identity_generations.get(agent_id, 0)
+
+    def get(self, agent_id: str, mode: str, embedding: List[float], generation: int, loop_used: Optional[str] = None) -> Optional[CachedAnswer]:
+        if generation != self.generation(agent_id):
+            self.stale += 1
+            return None
+        partition = self._partitions.get((agent_id, mode))
+        if not partition:
+            self.misses += 1
+            return None
+
+        query = self._unit(embedding)
+        row = partition.search(query, self.threshold, loop_used) if len(query) == partition.matrix.shape[1] else None
+        if row is None:
+            self.misses += 1
+            return None
+
+        partition.slots.move_to_end(row)
+        self._partitions.move_to_end((agent_id, mode))
+        self.hits += 1
+        return partition.slots[row]
+
+    def put(self, agent_id: str, mode: str, answer: CachedAnswer, generation: int):
+        if generation != self.generation(agent_id):
+            return
+        vector = self._unit(answer.embedding)
+        partition = self._partitions.get((agent_id, mode))
+        if partition is None or partition.matrix.shape[1] != len(vector):
+            # New partition, or the embedding model (dimension) changed
+            if partition is not None:
+                self._bytes -= partition.nbytes
+            partition = self._partitions[(agent_id, mode)] = _Partition(self.max_entries, len(vector))
+            self._bytes += partition.nbytes
+        self._partitions.move_to_end((agent_id, mode))
+
+        answer.embedding = []  # The vector lives in the partition matrix
+        before = partition.nbytes
+        if partition.add(vector, answer):
+            self.evictions += 1
+        self._bytes += partition.nbytes - before
+
+        # The partition just written to is the most recent one and never dropped here
+        while len(self._partitions) > 1 and (len(self._partitions) > self.max_partitions or self._bytes > self.max_bytes):
+            _, dropped = self._partitions.popitem(last=False)
+            self._bytes -= dropped.nbytes
+            self.evictions += len(dropped)
+
+    def invalidate(self, agent_id: str, identity: bool = False):
+        """Drop every cached answer for an agent (documents or, with `identity`, identity changed)."""
+        self._generations[agent_id] = self.generation(agent_id) + 1
+        if identity:
+            self._identity_generations[agent_id] = self.identity_generation(agent_id) + 1
+        for key in [k for k in self._partitions if k[0] == agent_id]:
+            self._bytes -= self._partitions.pop(key).nbytes
+        logger.info(f"AnswerCache invalidated for agent {agent_id}")
+
+    def metrics(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.stale
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "partitions": len(self._partitions),
+            "entries": sum(len(p) for p in self._partitions.values()),
+            "bytes": self._bytes,
+        }
+
+    @staticmethod
+    def _unit(vec: List[float]) -> np.ndarray:
+        v = np.asarray(vec, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+answer_cache = AnswerCache()
@@ -0,0 +1,219 @@
+import asyncio
+import re
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+class AudioChannel:
+    """
+    Bounded byte ring buffer for streaming audio between pipeline stages.
+    Replaces one-`bytes`-per-frame asyncio.Queues: frames are copied into a single
+    preallocated bytearray through memoryviews, and reads hand out whatever has
+    accumulated as one chunk. Keeps the `put`/`get`/`empty` surface of asyncio.Queue.
+
+    Overflow policies:
+    - DROP_OLDEST: writes never wait; the oldest audio is discarded (live raw PCM input).
+    - DROP_CHUNK: writes never wait; a `put()` that does not fit is discarded whole.
+      For container/compressed streams (WebM/Opus), where cutting bytes out of the
+      middle of a chunk corrupts the stream.
+    - BLOCK: writers wait for the reader (generated output), which backpressures TTS.
+    """
+    DROP_OLDEST = "drop_oldest"
+    DROP_CHUNK = "drop_chunk"
+    BLOCK = "block"
+
+    def __init__(self, capacity_ms: int, bytes_per_ms: float, overflow: str = BLOCK,
+                 align: int = 1, max_read_ms: Optional[int] = None, name: str = "audio"):
+        if overflow not in (self.DROP_OLDEST, self.DROP_CHUNK, self.BLOCK):
+            raise ValueError(f"Invalid overflow policy: {overflow}")
+        self.name = name
+        self.overflow = overflow
+        self.capacity_ms = capacity_ms
+        self.max_read_ms = max_read_ms
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+
+        # Metrics
+        self.dropped_bytes = 0
+        self.dropped_chunks = 0
+        self.blocked_puts = 0
+        self.flushes = 0
+        self.high_watermark_bytes = 0
+
+        self.reconfigure(bytes_per_ms, align)
+
+    @staticmethod
+    def format_bytes_per_ms(output_format: str) -> float:
+        """
+        Byte rate of an ElevenLabs-style output format, e.g.
+        'mp3_44100_128' -> 16.0 (128 kbps), 'pcm_44100' -> 88.2 (16-bit mono).
+        """
+        codec, _, rest = output_format.partition("_")
+        numbers = [int(n) for n in re.findall(r"\d+", rest)]
+        if codec == "pcm" and numbers:
+            return numbers[0] * 2 / 1000
+        if codec in ("ulaw", "alaw") and numbers:
+            return numbers[0] / 1000
+        if len(numbers) >= 2:
+            return numbers[1] / 8  # kbps -> bytes/ms
+        return 16.0
+
+    def reconfigure(self, bytes_per_ms: float, align: int = 1):
+        """
+        (Re)allocate the ring for a new byte rate. Only valid while empty,
+        e.g. once the output format of a pipeline is known.
+        """
+        if getattr(self, "_size", 0):
+            raise RuntimeError(f"AudioChannel[{self.name}] reconfigured while holding audio")
+        self.bytes_per_ms = bytes_per_ms
+        self.align = max(1, align)
+        capacity = int(self.capacity_ms * bytes_per_ms)
+        self.capacity = max(self.align, capacity - capacity % self.align)
+        self._buf = bytearray(self.capacity)
+        self._view = memoryview(self._buf)
+        self._read = 0
+        self._size = 0
+        self._max_read = None
+        if self.max_read_ms:
+            max_read = int(self.max_read_ms * bytes_per_ms)
+            self._max_read = max(self.align, max_read - max_read % self.align)
+
+    # --- Producer side ---
+
+    async def put(self, data: bytes):
+        mv = memoryview(data).cast("B")
+        if self.overflow == self.DROP_OLDEST:
+            self._put_dropping(mv)
+            return
+        if self.overflow == self.DROP_CHUNK:
+            self._put_whole(mv)
+            return
+
+        while len(mv):
+            if self._size == self.capacity:
+                self.blocked_puts += 1
+                self._writable.clear()
+                await self._writable.wait()
+                continue
+            written = self._write(mv)
+            mv = mv[written:]
+
+    def put_nowait(self, data: bytes):
+        mv = memoryview(data).cast("B")
+        if self.overflow == self.DROP_OLDEST:
+            self._put_dropping(mv)
+            return
+        if self.overflow == self.DROP_CHUNK:
+            self._put_whole(mv)
+            return
+        if len(mv) > self.capacity - self._size:
+            raise asyncio.QueueFull
+        self._write(mv)
+
+    def _put_dropping(self, mv: memoryview):
+        if len(mv) >= self.capacity:
+            # Larger than the whole ring: keep only its newest audio
+            keep = self.capacity
+            self.dropped_bytes += self._size + len(mv) - keep
+            self._read = 0
+            self._size = 0
+            mv = mv[len(mv) - keep:]
+        else:
+            overflow = self._size + len(mv) - self.capacity
+            if overflow > 0:
+                overflow += (-overflow) % self.align
+                overflow = min(overflow, self._size)
+                self._read = (self._read + overflow) % self.capacity
+                self._size -= overflow
+                self.dropped_bytes += overflow
+        self._write(mv)
+
+    def _put_whole(self, mv: memoryview):
+        if len(mv) > self.capacity - self._size:
+            self.dropped_bytes += len(mv)
+            self.dropped_chunks += 1
+            return
+        self._write(mv)
+
+    def _write(self, mv: memoryview) -> int:
+        n = min(len(mv), self.capacity - self._size)
+        if n == 0:
+            return 0
+        start = (self._read + self._size) % self.capacity
+        first = min(n, self.capacity - start)
+        self._view[start:start + first] = mv[:first]
+        if n > first:
+            self._view[0:n - first] = mv[first:n]
+        self._size += n
+        self.high_watermark_bytes = max(self.high_watermark_bytes, self._size)
+        self._readable.set()
+        return n
+
+    # --- Consumer side ---
+
+    async def get(self) -> bytes:
+        """Waits for audio and returns everything buffered (up to `max_read_ms`) as one chunk."""
+        while self._size < self.align:
+            self._readable.clear()
+            await self._readable.wait()
+        return self._take()
+
+    def get_nowait(self) -> bytes:
+        if self._size < self.align:
+            raise asyncio.QueueEmpty
+        return self._take()
+
+    def _take(self) -> bytes:
+        n = self._size
+        if self._max_read:
+            n = min(n, self._max_read)
+        n -= n % self.align
+        end = self._read + n
+        if end <= self.capacity:
+            chunk = bytes(self._view[self._read:end])
+        else:
+            chunk = b"".join((self._view[self._read:], self._view[:end - self.capacity]))
+        self._read = end % self.capacity
+        self._size -= n
+        if self._size == 0:
+            self._read = 0
+        self._writable.set()
+        return chunk
+
+    def flush(self) -> int:
+        """
+        O(1) discard of everything buffered (barge-in). Wakes blocked writers.
+        Returns the number of bytes discarded.
+        """
+        discarded = self._size
+        self._read = 0
+        self._size = 0
+        self.flushes += 1
+        self._writable.set()
+        return discarded
+
+    # --- asyncio.Queue compatibility / metrics ---
+
+    def empty(self) -> bool:
+        return self._size == 0
+
+    def qsize(self) -> int:
+        return self._size
+
+    @property
+    def occupancy_ms(self) -> float:
+        return self._size / self.bytes_per_ms
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "capacity_ms": self.capacity_ms,
+            "occupancy_ms": self.occupancy_ms,
+            "occupancy_ratio": self._size / self.capacity,
+            "high_watermark_ms": self.high_watermark_bytes / self.bytes_per_ms,
+            "dropped_ms": self.dropped_bytes / self.bytes_per_ms,
+            "dropped_chunks": self.dropped_chunks,
+            "blocked_puts": self.blocked_puts,
+            "flushes": self.flushes,
+        }
@@ -0,0 +1,123 @@
+import logging
+from collections import OrderedDict
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
+from .tts_service import ElevenLabsTTSService, SpeechProgress
+from .latency_tracker import LatencyTracker
+from .agent_runtime import fixed_utterances
+from .agent_cache import agent_cache
+
+logger = logging.getLogger(__name__)
+
+class PreSynthesizedAudioStore:
+    """
+    Pre-rendered audio for fixed utterances (disclosure, QBD refusals, greeting,
+    clarification, error fallback), keyed by (voice_id, output_format, text).
+    Filled in the background when an agent is created or its voice changes;
+    a miss is synthesized once, streamed through and kept. Served audio costs
+    no TTS request. LRU-evicted past `max_bytes`.
+    """
+    # Formats used by the transports: WebSocket clients (mp3) and the Recall bot (pcm)
+    OUTPUT_FORMATS = ["mp3_44100_128", "pcm_44100"]
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.tts = ElevenLabsTTSService()
+        self._audio: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self._bytes = 0
+
+        # Stats
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, voice_id: str, output_format: str, text: str) -> Optional[bytes]:
+        key = (voice_id, output_format, text)
+        audio = self._audio.get(key)
+        if audio is None:
+            return None
+        self._audio.move_to_end(key)
+        return audio
+
+    def put(self, voice_id: str, output_format: str, text: str, audio: bytes):
+        key = (voice_id, output_format, text)
+        previous = self._audio.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous)
+        self._audio[key] = audio
+        self._bytes += len(audio)
+        while self._bytes > self.max_bytes and len(self._audio) > 1:
+            _, evicted = self._audio.popitem(last=False)
+            self._bytes -= len(evicted)
+
+    async def stream(self, voice_id: str, output_format: str, text: str,
+                     tracker: Optional[LatencyTracker] = None, progress: Optional[SpeechProgress] = None,
+                     session_id: str = "session_123") -> AsyncGenerator[bytes, None]:
+        """
+        Audio for a fixed utterance: the stored clip if present, otherwise a
+        regular TTS stream whose audio is kept once it completes.
+        Same tracker/progress contract as `ElevenLabsTTSService.speak_stream`.
+        """
+        if progress:
+            progress.segments.append((text, progress.bytes_out))
+
+        audio = self.get(voice_id, output_format, text)
+        if audio is not None:
+            self.hits += 1
+            if tracker:
+                tracker.mark("tts_request_start", once=True)
+                tracker.mark("tts_first_byte", once=True)
+            if progress:
+                progress.bytes_out += len(audio)
+            yield audio
+            return
+
+        self.misses += 1
+        async def text_once():
+            yield text
+
+        chunks: List[bytes] = []
+        completed = False
+        tts_stream = self.tts.speak_stream(text_once(), voice_id, output_format=output_format, tracker=tracker, session_id=session_id)
+        try:
+            async for chunk in tts_stream:
+                chunks.append(chunk)
+                if progress:
+                    progress.bytes_out += len(chunk)
+                yield chunk
+            completed = True
+        finally:
+            await tts_stream.aclose()
+            # Interrupted or failed renders are not kept
+            if completed and chunks:
+                self.put(voice_id, output_format, text, b"".join(chunks))
+
+    async def prefill(self, agent_id: str, output_formats: Optional[List[str]] = None):
+        """Render every fixed utterance of an agent in its current voice (background task)."""
+        try:
+            resolved = await agent_cache.resolve_agent(agent_id)
+            voice_id = await agent_cache.resolve_voice(resolved.voice_model_id)
+        except Exception as e:
+            logger.error(f"Audio prefill skipped for agent {agent_id}: {e}")
+            return
+
+        rendered = 0
+        for output_format in output_formats or self.OUTPUT_FORMATS:
+            for text in fixed_utterances(resolved.identity):
+                if self.get(voice_id, output_format, text) is not None:
+                    continue
+                try:
+                    async for _ in self.stream(voice_id, output_format, text, session_id=f"agent:{agent_id}"):
+                        pass
+                    rendered += 1
+                except Exception as e:
+                    logger.error(f"Audio prefill failed for '{text[:30]}' ({output_format}): {e}")
+        logger.info(f"Pre-rendered {rendered} fixed utterances for agent {agent_id} (voice {voice_id})")
+
+    def metrics(self) -> Dict[str, float]:
+        return {
+            "clips": len(self._audio),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+audio_store = PreSynthesizedAudioStore()
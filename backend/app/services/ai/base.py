@@ -1,5 +1,13 @@
 from abc import ABC, abstractmethod
 from typing import AsyncGenerator, Any, Dict, Optional
+from pydantic import BaseModel
+
+class TranscriptEvent(BaseModel):
+    text: str
+    is_final: bool = True  # False for interim (still-changing) hypotheses
+    # End of the utterance. A final segment may be followed by more segments of the same
+    # utterance; providers without segmentation report every final as the end.
+    speech_final: bool = True
 
 class STTService(ABC):
     """
@@ -12,6 +20,14 @@ class STTService(ABC):
         """
         pass
 
+    async def transcribe_events(self, audio_chunk_iterator: AsyncGenerator[bytes, None]) -> AsyncGenerator[TranscriptEvent, None]:
+        """
+        Like `transcribe_stream`, but tags each transcript as interim or final.
+        Providers without interim results report everything as final.
+        """
+        async for transcript in self.transcribe_stream(audio_chunk_iterator):
+            yield TranscriptEvent(text=transcript, is_final=True)
+
 class TTSService(ABC):
     """
     Abstract Base Class for Text-to-Speech Services (The Voice).
@@ -41,6 +57,13 @@ class LLMService(ABC):
         """
         pass
 
+    @abstractmethod
+    async def generate_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, tracker: Optional[Any] = None, session_id: str = "session_123") -> AsyncGenerator[str, None]:
+        """
+        Streaming raw generation with strict prompt control.
+        """
+        pass
+
     @abstractmethod
     async def plan_response(self, context: str, history: list) -> Dict[str, Any]:
         """
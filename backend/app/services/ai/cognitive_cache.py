@@ -0,0 +1,379 @@
+import os
+import json
+import mmap
+import logging
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+from app.services.ai.ann_index import ANNIndex, IVFIndex, choose_index
+
+logger = logging.getLogger(__name__)
+
+class CacheResult:
+    """Search hit; same shape as `rag_service.DocResult`."""
+    __slots__ = ("id", "content", "score")
+
+    def __init__(self, id, content, score):
+        self.id = id
+        self.content = content
+        self.score = score
+
+class CognitiveCache:
+    """
+    In-memory vector store for the active session.
+    Eliminates DB latency for high-frequency access.
+
+    Documents are staged by `add_document` and packed at `freeze()` into one
+    contiguous float32 matrix of unit-length rows, so a search is a single
+    matrix-vector product (cosine similarity) plus a top-k partition.
+
+    A frozen cache can be saved to a snapshot directory and re-opened with
+    mmap (see `save` / `open`): the matrix and chunk text are then paged in
+    by the OS instead of being loaded.
+
+    Index modes: "exact" always scans every row; "ivf" generates candidates
+    with an IVFIndex and rescores them exactly; "auto" (default) uses IVF
+    from `ann_min_rows` chunks up. `nprobe` trades recall for latency.
+
+    Storage: "float32" (default), "float16" (2x smaller, slower scans: numpy
+    upcasts half floats without SIMD) or "int8" (per-dimension scalar
+    quantization, 4x smaller, float32 scan speed). With compact storage, searches score the
+    compact matrix and, with `rescore`, re-rank a shortlist in full precision
+    from the snapshot's float32 mmap (paged in only for the shortlist). Caches
+    not opened from a snapshot keep only the compact matrix and skip rescoring.
+
+    Two-stage search: with `coarse_dim` (e.g. 256 or 512), a first pass scores
+    the renormalized `coarse_dim` prefix of every row (Matryoshka embeddings
+    such as text-embedding-3-* keep most of their signal in the leading
+    dimensions), then a shortlist is rescored with the full vectors. The
+    prefix matrix is float32 and resident (coarse_dim / dim of the full size).
+    """
+    # Snapshot layout
+    EMBEDDINGS_FILE = "embeddings.npy"   # float32 (N, dim), unit-length rows
+    OFFSETS_FILE = "offsets.npy"         # int64 (N + 1,), byte offsets into the text blob
+    TEXT_FILE = "chunks.bin"             # UTF-8 chunk text, concatenated
+    ROWS_FILE = "rows.json"              # [{"id", "metadata"}] per row
+
+    ANN_MIN_ROWS = 5000
+    RESCORE_FACTOR = 4    # Shortlist = max(limit * RESCORE_FACTOR, RESCORE_MIN) rows
+    RESCORE_MIN = 32
+    COARSE_RESCORE_FACTOR = 20  # Truncated prefixes rank less faithfully: rescore a wider shortlist
+    SCORE_BLOCK_ROWS = 256   # Compact rows upcast to float32 per block
+
+    def __init__(self, index: str = "auto", ann_min_rows: int = ANN_MIN_ROWS, nprobe: Optional[int] = None,
+                 storage: str = "float32", rescore: bool = True, coarse_dim: Optional[int] = None):
+        if index not in ("auto", "exact", "ivf"):
+            raise ValueError(f"Invalid index mode: {index}")
+        if storage not in ("float32", "float16", "int8"):
+            raise ValueError(f"Invalid storage: {storage}")
+        self.index_mode = index
+        self.storage = storage
+        self.rescore = rescore
+        self.coarse_dim = coarse_dim
+        self.ann_min_rows = ann_min_rows
+        self.nprobe = nprobe
+        self._ann: Optional[ANNIndex] = None
+        self._ids: List[str] = []
+        self._contents: List[str] = []
+        self._metadata: List[Dict] = []
+        self._staged: List[np.ndarray] = []
+        self._matrix: Optional[np.ndarray] = None
+        self._frozen = False
+        # Set when opened from a snapshot
+        self._offsets: Optional[np.ndarray] = None
+        self._text: Optional[mmap.mmap] = None
+        self._row_mask: Optional[np.ndarray] = None
+        # Set with compact storage
+        self._compact: Optional[np.ndarray] = None   # float16 / int8 rows
+        self._scale: Optional[np.ndarray] = None     # int8 per-dimension scale
+        self._full: Optional[np.ndarray] = None      # float32 snapshot mmap, for rescoring
+        # Set with coarse_dim
+        self._coarse: Optional[np.ndarray] = None    # Unit-length coarse_dim prefixes
+
+    def add_document(self, doc_id: str, content: str, embedding: List[float], metadata: Dict):
+        if self._frozen:
+            return
+        self._ids.append(doc_id)
+        self._contents.append(content)
+        self._metadata.append(metadata)
+        self._staged.append(np.asarray(embedding, dtype=np.float32))
+        self._matrix = None
+
+    def add_documents(self, doc_ids: List[str], contents: List[str], embeddings: np.ndarray, metadata: List[Dict]):
+        """Bulk `add_document` from a float32 (N, dim) block (staged as is, not row by row)."""
+        if self._frozen or not doc_ids:
+            return
+        self._ids.extend(doc_ids)
+        self._contents.extend(contents)
+        self._metadata.extend(metadata)
+        self._staged.append(np.asarray(embeddings, dtype=np.float32))
+        self._matrix = None
+
+    def freeze(self):
+        self._pack()
+        self._staged = []  # Rows now live only in the matrix
+        self._frozen = True
+        self._build_ann()
+        self._build_coarse()
+        self._compact_storage()
+        logger.info(f"CognitiveCache frozen with {len(self._ids)} items.")
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def _build_ann(self):
+        if self.index_mode == "exact" or not self._ids:
+            return
+        ann = IVFIndex(nprobe=self.nprobe) if self.index_mode == "ivf" else choose_index(len(self._ids), self.ann_min_rows)
+        if ann is None:
+            return
+        if isinstance(ann, IVFIndex) and self.nprobe:
+            ann.nprobe = self.nprobe
+        ann.build(self._matrix)
+        self._ann = ann
+        logger.info(f"CognitiveCache built {ann.name} index over {len(self._ids)} items.")
+
+    @property
+    def index_name(self) -> str:
+        return self._ann.name if self._ann else "exact"
+
+    def _build_coarse(self):
+        """Renormalized `coarse_dim` prefixes of the (full-precision) rows."""
+        if not self.coarse_dim or not self._ids or self.coarse_dim >= self._matrix.shape[1]:
+            return
+        coarse = np.empty((len(self._ids), self.coarse_dim), dtype=np.float32)
+        for start in range(0, len(coarse), self.SCORE_BLOCK_ROWS):
+            coarse[start:start + self.SCORE_BLOCK_ROWS] = self._matrix[start:start + self.SCORE_BLOCK_ROWS, :self.coarse_dim]
+        norms = np.linalg.norm(coarse, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        coarse /= norms
+        self._coarse = coarse
+
+    def _compact_storage(self):
+        """Replace the resident float32 matrix by `storage` (after the ANN index is built from it)."""
+        if self.storage == "float32" or not self._ids:
+            return
+        full = self._matrix
+        if self.storage == "float16":
+            compact = np.empty(full.shape, dtype=np.float16)
+            for start in range(0, len(full), self.SCORE_BLOCK_ROWS):
+                compact[start:start + self.SCORE_BLOCK_ROWS] = full[start:start + self.SCORE_BLOCK_ROWS]
+        else:
+            scale = np.zeros(full.shape[1], dtype=np.float32)
+            for start in range(0, len(full), self.SCORE_BLOCK_ROWS):
+                np.maximum(scale, np.abs(full[start:start + self.SCORE_BLOCK_ROWS]).max(axis=0), out=scale)
+            scale[scale == 0] = 1.0
+            scale /= 127.0
+            compact = np.empty(full.shape, dtype=np.int8)
+            for start in range(0, len(full), self.SCORE_BLOCK_ROWS):
+                compact[start:start + self.SCORE_BLOCK_ROWS] = np.round(full[start:start + self.SCORE_BLOCK_ROWS] / scale)
+            self._scale = scale
+
+        self._compact = compact
+        # A snapshot mmap costs no resident memory until touched: keep it for rescoring
+        self._full = full if isinstance(full, np.memmap) else None
+        self._matrix = None
+
+    def memory_bytes(self) -> int:
+        """Resident bytes of the vector storage (mmapped float32 rows are not counted)."""
+        total = self._coarse.nbytes if self._coarse is not None else 0
+        if self._compact is not None:
+            total += self._compact.nbytes + (self._scale.nbytes if self._scale is not None else 0)
+        elif self._matrix is not None and not isinstance(self._matrix, np.memmap):
+            total += self._matrix.nbytes
+        return total
+
+    def _full_matrix(self) -> np.ndarray:
+        """Full-precision rows: the float32 matrix, the snapshot mmap, or dequantized compact rows."""
+        if self._matrix is not None:
+            return self._matrix
+        if self._full is not None:
+            return self._full
+        matrix = self._compact.astype(np.float32)
+        if self._scale is not None:
+            matrix *= self._scale
+        return matrix
+
+    def _scores(self, query: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Similarity of `query` with all rows (or `rows`), from the resident storage."""
+        if self._compact is None:
+            matrix = self._matrix if rows is None else self._matrix[rows]
+            return np.asarray(matrix) @ query
+
+        compact = self._compact if rows is None else self._compact[rows]
+        # int8: q . (scale * x) == (q * scale) . x
+        weights = query * self._scale if self._scale is not None else query
+        scores = np.empty(len(compact), dtype=np.float32)
+        # Small blocks keep the upcast scratch in CPU cache (int8 scans then match float32)
+        scratch = np.empty((self.SCORE_BLOCK_ROWS, compact.shape[1]), dtype=np.float32)
+        for start in range(0, len(compact), self.SCORE_BLOCK_ROWS):
+            block = compact[start:start + self.SCORE_BLOCK_ROWS]
+            upcast = scratch[:len(block)]
+            np.copyto(upcast, block, casting="unsafe")
+            np.dot(upcast, weights, out=scores[start:start + len(block)])
+        return scores
+
+    def _pack(self):
+        if self._frozen or self._matrix is not None:
+            return
+        if not self._staged:
+            self._matrix = np.zeros((0, 0), dtype=np.float32)
+            return
+        if len(self._staged) == 1 and self._staged[0].ndim == 2:
+            matrix = self._staged[0]  # One bulk block: normalized in place, no copy
+        else:
+            matrix = np.vstack(self._staged).astype(np.float32, copy=False)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        self._matrix = matrix
+
+    def search(self, query_embedding: List[float], limit: int = 3, threshold: float = 0.75) -> List[CacheResult]:
+        """
+        Top-`limit` documents with cosine similarity >= `threshold`, best first.
+        """
+        if not self._ids or limit <= 0:
+            return []
+        self._pack()
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0:
+            return []
+        query = query / norm
+
+        # Score the ANN candidates only, or every row
+        rows = self._ann.candidates(query) if self._ann is not None else None
+        if self._coarse is not None:
+            prefix = query[:self.coarse_dim]
+            prefix_norm = np.linalg.norm(prefix)
+            coarse = self._coarse if rows is None else self._coarse[rows]
+            scores = coarse @ (prefix / prefix_norm) if prefix_norm else np.zeros(len(coarse), dtype=np.float32)
+            factor = self.COARSE_RESCORE_FACTOR
+        else:
+            scores = self._scores(query, rows)
+            factor = self.RESCORE_FACTOR if self._compact is not None and self._full is not None and self.rescore else None
+        if self._row_mask is not None:
+            scores[~(self._row_mask if rows is None else self._row_mask[rows])] = -np.inf
+
+        if factor:
+            # First-pass scores pick a shortlist; its final scores come from the full vectors
+            shortlist_size = min(len(scores), max(limit * factor, self.RESCORE_MIN))
+            shortlist = np.argpartition(scores, -shortlist_size)[-shortlist_size:]
+            shortlist = shortlist[np.isfinite(scores[shortlist])]
+            rows = np.sort(shortlist if rows is None else rows[shortlist])
+            scores = self._rescore(query, rows)
+
+        candidates = np.flatnonzero(scores >= threshold)
+        if len(candidates) > limit:
+            top = np.argpartition(scores[candidates], -limit)[-limit:]
+            candidates = candidates[top]
+        ranked = candidates[np.argsort(scores[candidates])[::-1]]
+
+        results = []
+        for i in ranked:
+            row = int(rows[i]) if rows is not None else i
+            results.append(CacheResult(self._ids[row], self.content(row), float(scores[i])))
+        return results
+
+    def _rescore(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Full-vector scores of a shortlist: float32 rows when available, else the compact rows."""
+        if self._matrix is not None:
+            return np.asarray(self._matrix[rows]) @ query
+        if self._full is not None and self.rescore:
+            return np.asarray(self._full[rows]) @ query
+        return self._scores(query, rows)
+
+    def content(self, row: int) -> str:
+        if self._offsets is None:
+            return self._contents[row]
+        return self._text[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def rows(self):
+        """(id, content, unit embedding, metadata) for every row; used to rewrite snapshots."""
+        self._pack()
+        matrix = self._full_matrix()
+        for i, doc_id in enumerate(self._ids):
+            yield doc_id, self.content(i), matrix[i], self._metadata[i]
+
+    # --- Snapshots ---
+
+    def save(self, path: str):
+        """Write a frozen cache as a snapshot directory (see class docstring for the layout)."""
+        if not self._frozen:
+            raise RuntimeError("Only a frozen CognitiveCache can be saved")
+        os.makedirs(path, exist_ok=True)
+        matrix = self._full_matrix()
+        dim = matrix.shape[1] if len(self._ids) else 0
+        np.save(os.path.join(path, self.EMBEDDINGS_FILE), np.asarray(matrix, dtype=np.float32).reshape(len(self._ids), dim))
+
+        offsets = np.zeros(len(self._ids) + 1, dtype=np.int64)
+        with open(os.path.join(path, self.TEXT_FILE), "wb") as f:
+            for i in range(len(self._ids)):
+                encoded = self.content(i).encode("utf-8")
+                f.write(encoded)
+                offsets[i + 1] = offsets[i] + len(encoded)
+        np.save(os.path.join(path, self.OFFSETS_FILE), offsets)
+
+        with open(os.path.join(path, self.ROWS_FILE), "w") as f:
+            json.dump([{"id": doc_id, "metadata": meta} for doc_id, meta in zip(self._ids, self._metadata)], f)
+
+        if self._ann is not None:
+            self._ann.save(path)
+
+    @classmethod
+    def open(cls, path: str, modes: Optional[List[str]] = None, **options) -> "CognitiveCache":
+        """
+        Open a snapshot read-only with mmap. With `modes`, rows whose metadata
+        `allowed_modes` don't intersect them are masked out of searches
+        (same rule as the match_documents RPC: null modes are universal).
+        """
+        cache = cls(**options)
+        with open(os.path.join(path, cls.ROWS_FILE)) as f:
+            rows = json.load(f)
+        cache._ids = [row["id"] for row in rows]
+        cache._metadata = [row["metadata"] for row in rows]
+        cache._matrix = np.load(os.path.join(path, cls.EMBEDDINGS_FILE), mmap_mode="r")
+        cache._offsets = np.load(os.path.join(path, cls.OFFSETS_FILE))
+
+        text_path = os.path.join(path, cls.TEXT_FILE)
+        if os.path.getsize(text_path):
+            with open(text_path, "rb") as f:
+                cache._text = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            cache._text = b""
+
+        cache._frozen = True
+        if cache.index_mode != "exact" and (cache.index_mode == "ivf" or len(cache._ids) >= cache.ann_min_rows):
+            # Index persisted with the snapshot, else built now
+            cache._ann = IVFIndex.load(path, len(cache._ids), nprobe=cache.nprobe)
+        if cache._ann is None:
+            cache._build_ann()
+        cache._build_coarse()
+        cache._compact_storage()
+        if modes is not None:
+            cache.restrict_modes(modes)
+        return cache
+
+    def restrict_modes(self, modes: List[str]):
+        """
+        Mask out rows whose metadata `allowed_modes` don't intersect `modes`
+        (same rule as the match_documents RPC: null modes are universal).
+        """
+        wanted = set(modes)
+        mask = np.array([
+            meta.get("allowed_modes") is None or bool(wanted & set(meta["allowed_modes"]))
+            for meta in self._metadata
+        ], dtype=bool)
+        self._row_mask = None if mask.all() else mask
+
+    def exclude(self, ids: Iterable[str]):
+        """Mask out rows by id (deleted since the snapshot was written). Apply after `restrict_modes`."""
+        ids = set(ids)
+        keep = np.array([doc_id not in ids for doc_id in self._ids], dtype=bool)
+        if keep.all():
+            return
+        self._row_mask = keep if self._row_mask is None else self._row_mask & keep
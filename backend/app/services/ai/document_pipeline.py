@@ -0,0 +1,358 @@
+import io
+import re
+import zlib
+import codecs
+import hashlib
+from collections import Counter, OrderedDict, deque
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+# Streaming ingestion stages (all lazy generators, so memory stays bounded by
+# a few pages plus a few chunks regardless of document size):
+#     iter_pages -> normalize_pages -> strip_boilerplate (PDF) -> StructuredChunker.chunks -> iter_batches
+# RAGService.ingest_document pulls from the end of the chain and embeds /
+# inserts each batch while later pages are still unparsed.
+
+TEXT_BLOCK_CHARS = 64 * 1024  # Plain-text documents are streamed in blocks of this size
+
+Chunk = Tuple[int, str]  # (chunk_index, text)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (chars / 4, as in the FinOps logging)."""
+    return len(text) // 4 + 1
+
+def content_hash(text: str) -> str:
+    """Identity of a chunk across re-ingests: sha256 of its whitespace-normalized text."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()
+
+def iter_pages(filename: str, content: Union[str, bytes]) -> Iterator[str]:
+    """
+    Raw text of a document, page by page (PDF) or block by block (text).
+    pypdf parses each page only when it is reached; text bytes are decoded block by block.
+    Raises ValueError for a PDF given as str and UnicodeDecodeError for undecodable text
+    (when the bad block is reached: use `check_text` to validate up front).
+    """
+    if filename.lower().endswith(".pdf"):
+        if isinstance(content, str):
+            raise ValueError("PDF content must be bytes")
+        from pypdf import PdfReader
+        reader = PdfReader(io.BytesIO(content))
+        for page in reader.pages:
+            yield (page.extract_text() or "") + "\n"
+        return
+
+    if isinstance(content, str):
+        for start in range(0, len(content), TEXT_BLOCK_CHARS):
+            yield content[start:start + TEXT_BLOCK_CHARS]
+        return
+    yield from _decode_blocks(content)
+
+def _decode_blocks(content: bytes) -> Iterator[str]:
+    # Incremental: a multi-byte character split across blocks is carried over
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(content), TEXT_BLOCK_CHARS):
+        end = start + TEXT_BLOCK_CHARS
+        text = decoder.decode(content[start:end], final=end >= len(content))
+        if text:
+            yield text
+
+def check_text(filename: str, content: Union[str, bytes]):
+    """
+    Raises ValueError if a non-PDF document is not UTF-8, before anything is stored.
+    Decodes block by block without keeping the text.
+    """
+    if filename.lower().endswith(".pdf") or isinstance(content, str):
+        return
+    try:
+        for _ in _decode_blocks(content):
+            pass
+    except UnicodeDecodeError as e:
+        raise ValueError(f"{filename} is not valid UTF-8 text") from e
+
+_SPACES = re.compile(r"[ \t\f\v]+")
+_BLANK_LINES = re.compile(r"\n{3,}")
+
+def normalize_text(text: str) -> str:
+    """Unify line endings, drop NULs, collapse runs of spaces and of blank lines."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\x00", "")
+    text = _SPACES.sub(" ", text)
+    return _BLANK_LINES.sub("\n\n", text)
+
+def normalize_pages(pages: Iterable[str]) -> Iterator[str]:
+    for page in pages:
+        yield normalize_text(page)
+
+def is_heading(line: str) -> bool:
+    """Markdown / numbered / short title-case or upper-case lines without sentence punctuation."""
+    text = line.strip()
+    if len(text) < 3 or len(text) > 100:
+        return False
+    if _MD_HEADING.match(text):
+        return True
+    if text[-1] in ".,;:!?" or len(text.split()) > 12:
+        return False
+    if _NUMBERED_HEADING.match(text):
+        return True
+    words = [w for w in text.split() if w[0].isalpha()]
+    return bool(words) and (text.isupper() or all(w[0].isupper() or w.lower() in _MINOR_WORDS for w in words))
+
+_MD_HEADING = re.compile(r"^#{1,6}\s+\S")
+_NUMBERED_HEADING = re.compile(r"^(\d+(\.\d+)*\.?|[IVXLC]+\.|Chapter|Section|Part)\s+\S", re.IGNORECASE)
+_MINOR_WORDS = {"a", "an", "and", "as", "at", "by", "for", "in", "of", "on", "or", "the", "to", "with"}
+CUT_EVERY = 4  # Content-defined cut probability per piece (see _ChunkState.add)
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])")
+
+class ChunkStats:
+    """Per-ingest chunking report, compared with the previous fixed 1000-char slicing."""
+    FIXED_CHUNK_CHARS = 1000
+
+    def __init__(self):
+        self.chars = 0               # Normalized text, before boilerplate removal
+        self.boilerplate_lines = 0
+        self.boilerplate_chars = 0
+        self.chunks = 0
+        self.tokens = 0
+        self.min_tokens: Optional[int] = None
+        self.max_tokens = 0
+        self.merged_fragments = 0
+        self.duplicates = 0
+
+    def add_chunk(self, tokens: int):
+        self.chunks += 1
+        self.tokens += tokens
+        self.max_tokens = max(self.max_tokens, tokens)
+        self.min_tokens = tokens if self.min_tokens is None else min(self.min_tokens, tokens)
+
+    def as_dict(self) -> Dict[str, Any]:
+        fixed = -(-self.chars // self.FIXED_CHUNK_CHARS)
+        return {
+            "chunks": self.chunks,
+            "fixed_size_chunks": fixed,
+            "reduction": round(1 - self.chunks / fixed, 3) if fixed else 0.0,
+            "avg_tokens": round(self.tokens / self.chunks, 1) if self.chunks else 0.0,
+            "min_tokens": self.min_tokens or 0,
+            "max_tokens": self.max_tokens,
+            "merged_fragments": self.merged_fragments,
+            "duplicates_dropped": self.duplicates,
+            "boilerplate_lines_dropped": self.boilerplate_lines,
+        }
+
+def strip_boilerplate(pages: Iterable[str], stats: Optional[ChunkStats] = None, window: int = 6,
+                      edge_lines: int = 2, min_pages: int = 3, ratio: float = 0.5) -> Iterator[str]:
+    """
+    Drop running headers / footers: the first or last `edge_lines` lines of a
+    page that recur (digits ignored, so "Page 3 of 9" matches) at the edges of
+    at least `ratio` of the pages seen so far. Only those edge positions are
+    removed, never matching lines in the body; pages with no more than
+    2 * `edge_lines` lines are left alone (their edges are their body).
+    Pages are released after a look-ahead of `window` pages, so early pages
+    are judged with some context.
+    """
+    counts: Counter = Counter()
+    buffer: deque = deque()
+    seen = 0
+
+    def edges(lines: List[str]) -> List[int]:
+        """Indices of the leading / trailing non-empty lines."""
+        filled = [i for i, line in enumerate(lines) if line.strip()]
+        if len(filled) <= 2 * edge_lines:
+            return []
+        return filled[:edge_lines] + filled[-edge_lines:]
+
+    def key(line: str) -> str:
+        return re.sub(r"\d+", "#", " ".join(line.split()).casefold())
+
+    def clean(page: str) -> str:
+        if seen < min_pages:
+            return page
+        threshold = max(min_pages, ratio * seen)
+        lines = page.split("\n")
+        drop = {i for i in edges(lines) if counts[key(lines[i])] >= threshold}
+        if not drop:
+            return page
+        if stats:
+            stats.boilerplate_lines += len(drop)
+            stats.boilerplate_chars += sum(len(lines[i]) for i in drop)
+        return "\n".join(line for i, line in enumerate(lines) if i not in drop)
+
+    for page in pages:
+        seen += 1
+        lines = page.split("\n")
+        counts.update({key(lines[i]) for i in edges(lines)})
+        buffer.append(page)
+        if len(buffer) > window:
+            yield clean(buffer.popleft())
+    while buffer:
+        yield clean(buffer.popleft())
+
+class StructuredChunker:
+    """
+    Chunks a text stream along its structure instead of fixed character windows:
+    - headings start a new chunk and are repeated at the top of its continuations;
+    - paragraphs are kept whole when they fit `max_tokens`, otherwise split at
+      sentence ends (and, for run-on sentences, at word boundaries);
+    - chunks end at content-defined boundaries between 3/4 and all of the budget,
+      so a local edit only changes the chunks around it;
+    - consecutive chunks share up to `overlap_tokens` of trailing sentences;
+    - fragments under `min_tokens` are merged into a neighbour when it fits;
+    - exact duplicate chunks (after whitespace/case folding) among the last
+      DEDUPE_WINDOW chunks are dropped.
+    Streaming: memory holds one paragraph, two chunks and DEDUPE_WINDOW fingerprints.
+    """
+    DEDUPE_WINDOW = 4096
+
+    def __init__(self, max_tokens: int = 400, overlap_tokens: int = 40, min_tokens: int = 60):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.min_tokens = min_tokens
+
+    def chunks(self, texts: Iterable[str], stats: Optional[ChunkStats] = None) -> Iterator[Chunk]:
+        stats = stats or ChunkStats()
+        state = _ChunkState(self, stats)
+        for kind, text in self._units(texts, stats):
+            if kind == "heading":
+                yield from state.heading(text)
+            else:
+                for piece in self._pieces(text):
+                    yield from state.add(piece)
+        yield from state.finish()
+
+    def _units(self, texts: Iterable[str], stats: ChunkStats) -> Iterator[Tuple[str, str]]:
+        """("heading" | "paragraph", text) from a stream of text blocks."""
+        carry = ""
+        paragraph: List[str] = []
+        paragraph_chars = 0
+        for text in texts:
+            stats.chars += len(text)
+            *lines, carry = (carry + text).split("\n")
+            for line in lines:
+                stripped = line.strip()
+                if not stripped or is_heading(stripped):
+                    if paragraph:
+                        yield "paragraph", " ".join(paragraph)
+                        paragraph, paragraph_chars = [], 0
+                    if stripped:
+                        yield "heading", stripped.lstrip("#").strip()
+                    continue
+                paragraph.append(stripped)
+                paragraph_chars += len(stripped)
+                if paragraph_chars > 16 * self.max_tokens:
+                    # Bound memory on documents without paragraph breaks
+                    yield "paragraph", " ".join(paragraph)
+                    paragraph, paragraph_chars = [], 0
+        if carry.strip():
+            paragraph.append(carry.strip())
+        if paragraph:
+            yield "paragraph", " ".join(paragraph)
+
+    def _pieces(self, paragraph: str) -> Iterator[str]:
+        if estimate_tokens(paragraph) <= self.max_tokens:
+            yield paragraph
+            return
+        for sentence in _SENTENCE_END.split(paragraph):
+            if estimate_tokens(sentence) <= self.max_tokens:
+                yield sentence
+                continue
+            limit = self.max_tokens * 4
+            words = [word[i:i + limit] for word in sentence.split() for i in range(0, len(word), limit)]
+            part, part_chars = [], 0
+            for word in words:
+                if part and part_chars + len(word) + 1 > limit:
+                    yield " ".join(part)
+                    part, part_chars = [], 0
+                part.append(word)
+                part_chars += len(word) + 1
+            if part:
+                yield " ".join(part)
+
+class _ChunkState:
+    """Packing state of one StructuredChunker.chunks() run."""
+    def __init__(self, chunker: StructuredChunker, stats: ChunkStats):
+        self.chunker = chunker
+        self.stats = stats
+        self.heading_text: Optional[str] = None
+        self.pieces: List[str] = []
+        self.tokens = 0
+        self.held: Optional[str] = None   # Last finished chunk, held back so a tiny successor can merge
+        self.index = 0
+        self.fingerprints: "OrderedDict[int, None]" = OrderedDict()  # Recent chunks, oldest first
+
+    def heading(self, text: str) -> Iterator[Chunk]:
+        if not self.pieces and self.heading_text and len(self.heading_text) + len(text) < 200:
+            self.heading_text += "\n" + text  # Stacked headings ("Chapter 2" / "Pricing")
+            return
+        yield from self._close(overlap=False)
+        self.heading_text = text
+
+    def add(self, piece: str) -> Iterator[Chunk]:
+        tokens = estimate_tokens(piece)
+        heading_tokens = estimate_tokens(self.heading_text) if self.heading_text else 0
+        if self.pieces and heading_tokens + self.tokens + tokens > self.chunker.max_tokens:
+            yield from self._close(overlap=True)
+        self.pieces.append(piece)
+        self.tokens += tokens
+        # Content-defined boundary: past 3/4 of the budget, cut after pieces whose hash
+        # hits 1 in CUT_EVERY. Boundaries depend on content rather than on position,
+        # so after an edit they re-align within a chunk or two and the following
+        # chunks hash the same as before (incremental re-ingest reuses them).
+        if self.tokens >= self.chunker.max_tokens * 3 // 4 and zlib.crc32(piece.encode("utf-8")) % CUT_EVERY == 0:
+            yield from self._close(overlap=True)
+
+    def finish(self) -> Iterator[Chunk]:
+        yield from self._close(overlap=False)
+        if self.held is not None:
+            yield from self._release(self.held)
+            self.held = None
+
+    def _close(self, overlap: bool) -> Iterator[Chunk]:
+        """Finish the current chunk; keep trailing pieces as the next chunk's overlap."""
+        if not self.pieces:
+            return
+        text = "\n".join(([self.heading_text] if self.heading_text else []) + [" ".join(self.pieces)])
+        carried: List[str] = []
+        if overlap and self.chunker.overlap_tokens:
+            budget = self.chunker.overlap_tokens
+            for piece in reversed(self.pieces[1:]):
+                budget -= estimate_tokens(piece)
+                if budget < 0:
+                    break
+                carried.insert(0, piece)
+        self.pieces = carried
+        self.tokens = sum(estimate_tokens(p) for p in carried)
+        yield from self._hold(text)
+
+    def _hold(self, text: str) -> Iterator[Chunk]:
+        if self.held is not None:
+            held_tokens, tokens = estimate_tokens(self.held), estimate_tokens(text)
+            if min(held_tokens, tokens) < self.chunker.min_tokens and held_tokens + tokens <= self.chunker.max_tokens:
+                self.held = self.held + "\n" + text
+                self.stats.merged_fragments += 1
+                return
+            yield from self._release(self.held)
+        self.held = text
+
+    def _release(self, text: str) -> Iterator[Chunk]:
+        fingerprint = hash(" ".join(text.split()).casefold())
+        if fingerprint in self.fingerprints:
+            self.fingerprints.move_to_end(fingerprint)
+            self.stats.duplicates += 1
+            return
+        self.fingerprints[fingerprint] = None
+        if len(self.fingerprints) > self.chunker.DEDUPE_WINDOW:
+            self.fingerprints.popitem(last=False)
+        self.stats.add_chunk(estimate_tokens(text))
+        yield self.index, text
+        self.index += 1
+
+def iter_batches(chunks: Iterable[Chunk], max_inputs: int, max_tokens: int) -> Iterator[List[Chunk]]:
+    """Consecutive chunk batches bounded by input count and estimated tokens."""
+    batch: List[Chunk] = []
+    tokens = 0
+    for chunk in chunks:
+        cost = estimate_tokens(chunk[1])
+        if batch and (len(batch) >= max_inputs or tokens + cost > max_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += cost
+    if batch:
+        yield batch
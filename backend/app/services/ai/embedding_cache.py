@@ -0,0 +1,102 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+EmbeddingKey = Tuple[str, str]  # (model, normalized text)
+
+class EmbeddingCache:
+    """
+    Process-wide LRU + TTL cache of query embeddings, keyed by (model, normalized text).
+    Repeated phrases (greetings, follow-ups) and identical questions from
+    concurrent sessions of an agent cost one upstream call. Concurrent misses
+    for the same key are coalesced onto a single in-flight request, which is
+    cancelled when its last waiter is (e.g. QBD refused the turn).
+    Returned vectors are shared: callers must not mutate them.
+    """
+    def __init__(self, max_entries: int = 4096, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # key -> (stored_at, embedding, upstream latency in ms)
+        self._entries: "OrderedDict[EmbeddingKey, Tuple[float, List[float], float]]" = OrderedDict()
+        self._inflight: Dict[EmbeddingKey, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+        # Stats (saved_ms: upstream latency of the cached calls, summed over hits)
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.cancelled = 0
+        self.saved_ms = 0.0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Case- and whitespace-insensitive form of a query."""
+        return " ".join(text.split()).casefold()
+
+    async def get_or_compute(self, model: str, text: str, compute: Callable[[], Awaitable[List[float]]]) -> List[float]:
+        key: EmbeddingKey = (model, self.normalize(text))
+        entry = self._entries.get(key)
+        if entry is not None:
+            stored_at, embedding, cost_ms = entry
+            if time.monotonic() - stored_at < self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self.saved_ms += cost_ms
+                return embedding
+            del self._entries[key]
+
+        # Single-flight: concurrent identical queries wait on one upstream call
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.create_task(self._compute(key, compute))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # Shielded so one cancelled caller doesn't abort the request for the others;
+        # the request itself is cancelled with its last waiter
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            embedding, _ = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters.get(task) == 1 and not task.done():
+                task.cancel()
+                self.cancelled += 1
+            raise
+        finally:
+            remaining = self._waiters.pop(task) - 1
+            if remaining:
+                self._waiters[task] = remaining
+        return embedding
+
+    async def _compute(self, key: EmbeddingKey, compute: Callable[[], Awaitable[List[float]]]) -> Tuple[List[float], float]:
+        start = time.perf_counter()
+        embedding = await compute()  # Failures raise: nothing is cached
+        cost_ms = (time.perf_counter() - start) * 1000
+        self._entries[key] = (time.monotonic(), embedding, cost_ms)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return embedding, cost_ms
+
+    def metrics(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            "saved_ms": self.saved_ms,
+            "evictions": self.evictions,
+            "cancelled": self.cancelled,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+        }
+
+embedding_cache = EmbeddingCache()
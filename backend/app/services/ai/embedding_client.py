@@ -0,0 +1,135 @@
+import random
+import asyncio
+import logging
+from typing import Dict, List, Optional, Sequence
+import httpx
+
+try:
+    import h2  # noqa: F401  (httpx's optional HTTP/2 support: httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingError(Exception):
+    """No embedding could be produced: missing API key, provider error or deadline exceeded."""
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable      # Timeouts, transport errors, 429 and 5xx
+        self.retry_after = retry_after  # Seconds requested by the provider (Retry-After)
+
+class EmbeddingClient:
+    """
+    Process-wide async HTTP client for the embedding providers.
+    One keep-alive connection pool is shared by every session (HTTP/2 when
+    `h2` is installed), at most `max_concurrency` requests are in flight, and
+    each attempt has a deadline covering both the wait for a slot and the request.
+    Failures raise EmbeddingError instead of returning a placeholder vector.
+    With `retries`, transient failures (timeouts, 429 rate limits, 5xx) are
+    retried with exponential backoff, honouring the provider's Retry-After.
+    """
+    def __init__(self, timeout: float = 10.0, max_concurrency: int = 16,
+                 max_connections: int = 32, keepalive_expiry: float = 60.0):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.keepalive_expiry = keepalive_expiry
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Stats
+        self.requests = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.retries = 0
+        self.rate_limited = 0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_expiry,
+                ),
+                timeout=httpx.Timeout(self.timeout),
+            )
+        return self._client
+
+    async def embed(self, url: str, headers: Dict[str, str], model: str, texts: Sequence[str],
+                    timeout: Optional[float] = None, retries: int = 0, backoff: float = 0.5) -> List[List[float]]:
+        """One embedding per text, in order. `timeout` applies per attempt. Raises EmbeddingError."""
+        deadline = timeout or self.timeout
+        attempt = 0
+        while True:
+            try:
+                return await asyncio.wait_for(self._request(url, headers, model, list(texts)), deadline)
+            except asyncio.TimeoutError:
+                self.timeouts += 1
+                error = EmbeddingError(f"Embedding request exceeded its {deadline:.1f}s deadline", retryable=True)
+            except EmbeddingError as e:
+                error = e
+            if not error.retryable or attempt >= retries:
+                raise error
+            delay = error.retry_after if error.retry_after is not None else backoff * (2 ** attempt) * (1 + random.random())
+            logger.warning(f"Embedding attempt {attempt + 1} failed ({error}), retrying in {delay:.1f}s")
+            self.retries += 1
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _request(self, url: str, headers: Dict[str, str], model: str, texts: List[str]) -> List[List[float]]:
+        async with self._semaphore:
+            self.requests += 1
+            try:
+                response = await self._get_client().post(url, headers=headers, json={"input": texts, "model": model})
+            except httpx.HTTPError as e:
+                self.errors += 1
+                raise EmbeddingError(f"Embedding request failed: {e}", retryable=True) from e
+
+        if response.status_code == 401:
+            self.errors += 1
+            raise EmbeddingError("Unauthorized (401) from AI provider. Check your API key.")
+        if response.status_code == 429:
+            self.rate_limited += 1
+            raise EmbeddingError("Rate limited (429) by AI provider", retryable=True,
+                                 retry_after=self._retry_after(response))
+        if response.status_code >= 400:
+            self.errors += 1
+            raise EmbeddingError(f"Embedding provider returned {response.status_code}: {response.text[:200]}",
+                                 retryable=response.status_code >= 500)
+
+        try:
+            data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+            embeddings = [item["embedding"] for item in data]
+        except (ValueError, KeyError, TypeError) as e:
+            self.errors += 1
+            raise EmbeddingError(f"Malformed embedding response: {e}") from e
+        if len(embeddings) != len(texts):
+            self.errors += 1
+            raise EmbeddingError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+        return embeddings
+
+    @staticmethod
+    def _retry_after(response: httpx.Response) -> Optional[float]:
+        try:
+            return float(response.headers["retry-after"])
+        except (KeyError, ValueError):
+            return None
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "http2": HTTP2_AVAILABLE,
+        }
+
+embedding_client = EmbeddingClient()
@@ -0,0 +1,170 @@
+import os
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from app.services.ai.cognitive_cache import CognitiveCache
+from app.services.ai.index_snapshot import index_snapshots, snapshot_metadata
+from app.services.ai.rag_service import RAGService, corpus_version
+
+logger = logging.getLogger(__name__)
+
+# Resident vector storage of shared indexes: "int8" (default), "float16" or "float32".
+# Compact storage is rescored in float32 from the snapshot mmap.
+INDEX_STORAGE = os.getenv("INDEX_STORAGE", "int8")
+
+IndexKey = Tuple[str, Tuple[str, ...], int, Optional[int]]  # (agent_id, modes, corpus version, coarse dim)
+
+class SharedIndex:
+    """A frozen CognitiveCache for one agent/mode set at one corpus version. Never mutated."""
+    def __init__(self, agent_id: str, modes: Tuple[str, ...], version: int, cache: CognitiveCache, coarse_dim: Optional[int] = None):
+        self.agent_id = agent_id
+        self.modes = modes
+        self.version = version
+        self.coarse_dim = coarse_dim
+        self.cache = cache
+        self.refcount = 0
+
+    @property
+    def key(self) -> IndexKey:
+        return (self.agent_id, self.modes, self.version, self.coarse_dim)
+
+class IndexHandle:
+    """A runtime's borrowed reference to a SharedIndex. Release exactly once (idempotent)."""
+    def __init__(self, registry: "IndexRegistry", index: SharedIndex):
+        self._registry = registry
+        self._index: Optional[SharedIndex] = index
+
+    @property
+    def cache(self) -> CognitiveCache:
+        return self._index.cache
+
+    @property
+    def version(self) -> int:
+        return self._index.version
+
+    @property
+    def modes(self) -> List[str]:
+        return list(self._index.modes)
+
+    def release(self):
+        if self._index is not None:
+            self._registry._release(self._index)
+            self._index = None
+
+class IndexRegistry:
+    """
+    Process-wide, reference-counted registry of read-only per-agent indexes.
+    Concurrent meetings of the same agent borrow one snapshot instead of each
+    loading the corpus. Snapshots are stamped with the agent's corpus version:
+    after a re-ingest, new acquisitions load a new snapshot while running
+    meetings keep the one they hold. A snapshot is dropped when its last holder releases it.
+    """
+    def __init__(self):
+        self._indexes: Dict[IndexKey, SharedIndex] = {}
+        self._loading: Dict[IndexKey, asyncio.Task] = {}
+
+        # Stats
+        self.loads = 0
+        self.shared_acquires = 0
+
+    async def acquire(self, agent_id: str, modes: List[str], rag: Optional[RAGService] = None,
+                      coarse_dim: Optional[int] = None) -> IndexHandle:
+        """`coarse_dim`: the agent's Matryoshka truncation for two-stage search (None = full-dimension scan)."""
+        key: IndexKey = (agent_id, tuple(modes), corpus_version(agent_id), coarse_dim)
+        index = self._indexes.get(key)
+        if index is not None:
+            self.shared_acquires += 1
+        else:
+            # Single-flight: concurrent sessions of the same agent wait on one load
+            task = self._loading.get(key)
+            if task is None:
+                task = asyncio.create_task(self._load(key, rag or RAGService()))
+                self._loading[key] = task
+                task.add_done_callback(lambda _: self._loading.pop(key, None))
+            else:
+                self.shared_acquires += 1
+            # Shielded so one cancelled session doesn't abort the load for the others
+            loaded = await asyncio.shield(task)
+            index = self._indexes.setdefault(key, loaded)
+
+        index.refcount += 1
+        return IndexHandle(self, index)
+
+    def _release(self, index: SharedIndex):
+        index.refcount -= 1
+        if index.refcount <= 0 and self._indexes.get(index.key) is index:
+            del self._indexes[index.key]
+            logger.info(f"Released index for agent {index.agent_id} (v{index.version}, {len(index.cache)} chunks)")
+
+    async def _load(self, key: IndexKey, rag: RAGService) -> SharedIndex:
+        """
+        Open the agent's on-disk snapshot (mmap) if it matches the database,
+        otherwise page the corpus from PostgREST and write a new snapshot.
+        """
+        agent_id, modes, version, coarse_dim = key
+        options = {"storage": INDEX_STORAGE, "coarse_dim": coarse_dim}
+        cache = await asyncio.to_thread(index_snapshots.open, agent_id, list(modes), **options)
+        if cache is not None:
+            # Another process may have changed the corpus since the snapshot was written
+            db_count = await rag.count_chunks(agent_id)
+            if db_count is not None and db_count != len(cache):
+                logger.info(f"Index snapshot for agent {agent_id} is stale ({len(cache)} vs {db_count} chunks)")
+                cache = None
+
+        if cache is None:
+            corpus = await self._fetch_corpus(agent_id, rag)
+            try:
+                full = CognitiveCache()
+                full.add_documents(*corpus)
+                full.freeze()
+                await asyncio.to_thread(index_snapshots.write, agent_id, full)
+                cache = await asyncio.to_thread(index_snapshots.open, agent_id, list(modes), **options)
+            except Exception as e:
+                logger.error(f"Could not write index snapshot for agent {agent_id}, keeping it in memory: {e}")
+            if cache is None:
+                cache = CognitiveCache(**options)
+                cache.add_documents(*corpus)
+                cache.freeze()
+                cache.restrict_modes(list(modes))
+
+        self.loads += 1
+        return SharedIndex(agent_id, modes, version, cache, coarse_dim)
+
+    @staticmethod
+    async def _fetch_corpus(agent_id: str, rag: RAGService) -> Tuple[List[str], List[str], np.ndarray, List[Dict]]:
+        """(ids, contents, float32 embedding matrix, metadata), filled page by page into one preallocated matrix."""
+        ids, contents, metadata = [], [], []
+        matrix: Optional[np.ndarray] = None
+        expected = await rag.count_chunks(agent_id) or 0
+        async for page in rag.iter_corpus(agent_id):
+            for row in page:
+                embedding = row.get("embedding")
+                if embedding is None or not len(embedding):
+                    continue
+                if matrix is None:
+                    matrix = np.empty((max(expected, len(page)), len(embedding)), dtype=np.float32)
+                elif len(ids) == len(matrix):
+                    # More rows than counted (concurrent ingest): grow geometrically
+                    grown = np.empty((len(matrix) * 2, matrix.shape[1]), dtype=np.float32)
+                    grown[:len(matrix)] = matrix
+                    matrix = grown
+                matrix[len(ids)] = embedding
+                ids.append(row["id"])
+                contents.append(row["content"])
+                metadata.append(snapshot_metadata(row))
+        if matrix is None:
+            matrix = np.zeros((0, 0), dtype=np.float32)
+        return ids, contents, matrix[:len(ids)], metadata
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "indexes": len(self._indexes),
+            "references": sum(i.refcount for i in self._indexes.values()),
+            "chunks": sum(len(i.cache) for i in self._indexes.values()),
+            "vector_bytes": sum(i.cache.memory_bytes() for i in self._indexes.values()),
+            "loads": self.loads,
+            "shared_acquires": self.shared_acquires,
+        }
+
+index_registry = IndexRegistry()
@@ -0,0 +1,385 @@
+import os
+import json
+import time
+import uuid
+import shutil
+import logging
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from app.services.ai.cognitive_cache import CognitiveCache, CacheResult
+
+logger = logging.getLogger(__name__)
+
+def snapshot_metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Row metadata kept in a snapshot: chunk metadata plus what filtering/deletes need."""
+    return {**(row.get("metadata") or {}), "filename": row.get("filename"), "allowed_modes": row.get("allowed_modes")}
+
+class SegmentedCache:
+    """
+    A snapshot generation with deltas: the base CognitiveCache plus small appended
+    segments (exact search), minus tombstoned ids. Same read surface as CognitiveCache.
+    """
+    def __init__(self, parts: List[CognitiveCache], removed: Set[str]):
+        self.parts = parts
+        self.removed = removed
+        for part in parts:
+            part.exclude(removed)
+        self._live = len({doc_id for part in parts for doc_id in part._ids} - removed)
+
+    @property
+    def frozen(self) -> bool:
+        return True
+
+    @property
+    def index_name(self) -> str:
+        return self.parts[0].index_name
+
+    def __len__(self) -> int:
+        return self._live
+
+    def memory_bytes(self) -> int:
+        return sum(part.memory_bytes() for part in self.parts)
+
+    def search(self, query_embedding: List[float], limit: int = 3, threshold: float = 0.75) -> List[CacheResult]:
+        results = [hit for part in self.parts for hit in part.search(query_embedding, limit, threshold)]
+        results.sort(key=lambda hit: hit.score, reverse=True)
+        return results[:limit]
+
+    def restrict_modes(self, modes: List[str]):
+        for part in self.parts:
+            part.restrict_modes(modes)
+            part.exclude(self.removed)
+
+    def rows(self):
+        for part in self.parts:
+            for doc_id, content, embedding, metadata in part.rows():
+                if doc_id not in self.removed:
+                    yield doc_id, content, embedding, metadata
+
+class _Deltas:
+    """
+    Ids of a generation (base + segments), by filename, and the size of its deltas.
+    Kept in memory per agent so updates don't re-read every rows.json; reloaded when CURRENT moves.
+    """
+    def __init__(self, store: "IndexSnapshotStore", path: str):
+        self.path = path
+        self.ids: Set[str] = set()
+        self.by_filename: Dict[Optional[str], Set[str]] = {}
+        self.base_rows = 0
+        self.delta_rows = 0
+        segments = store._list(path, store.SEGMENTS_DIR)
+        tombstones = store._list(path, store.TOMBSTONES_DIR)
+        for i, directory in enumerate([path] + [os.path.join(path, store.SEGMENTS_DIR, name) for name in segments]):
+            with open(os.path.join(directory, CognitiveCache.ROWS_FILE)) as f:
+                rows = json.load(f)
+            self.add((row["id"], row["metadata"].get("filename")) for row in rows)
+            if i == 0:
+                self.base_rows = len(rows)
+            else:
+                self.delta_rows += len(rows)
+        self.removed = store._read_tombstones(path, tombstones)
+        self.delta_rows += len(self.removed)
+        self.files = len(segments) + len(tombstones)
+
+    def add(self, rows: Iterable[Tuple[str, Optional[str]]]):
+        for doc_id, filename in rows:
+            self.ids.add(doc_id)
+            self.by_filename.setdefault(filename, set()).add(doc_id)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.ids or doc_id in self.removed
+
+class IndexSnapshotStore:
+    """
+    Per-agent CognitiveCache snapshots on local disk (INDEX_CACHE_DIR):
+        <root>/<agent_id>/CURRENT                            name of the live generation
+        <root>/<agent_id>/<generation>/                      CognitiveCache.save() layout (base)
+        <root>/<agent_id>/<generation>/segments/<seq>/       rows appended since (same layout, no ANN)
+        <root>/<agent_id>/<generation>/tombstones/<seq>.json ids removed since
+    Full rebuilds write a new generation and swap CURRENT atomically. Ingests and
+    deletes only add a segment or a tombstone file (each renamed into place, so
+    readers never see a partial one); once the deltas outgrow COMPACT_RATIO of the
+    base (or COMPACT_MAX_SEGMENTS segments), a background thread folds them into a
+    new generation. Updates of an agent are serialized so none is lost.
+    The replaced generation is kept until the next swap (a reader may have just
+    resolved CURRENT to it); older ones are removed. Sessions that mmapped them
+    keep reading: their files are unlinked, not truncated.
+    All methods do blocking file IO (run them with asyncio.to_thread).
+    """
+    SEGMENTS_DIR = "segments"
+    TOMBSTONES_DIR = "tombstones"
+    COMPACT_RATIO = 0.5
+    COMPACT_MIN_ROWS = 2000
+    COMPACT_MAX_SEGMENTS = 64
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.getenv("INDEX_CACHE_DIR", os.path.join(tempfile.gettempdir(), "neuralis-index"))
+        self._locks: Dict[str, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+        self._compactor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="index-compaction")
+        self._compacting: Set[str] = set()
+        self._deltas: Dict[str, _Deltas] = {}
+
+        # Stats
+        self.segments_written = 0
+        self.tombstones_written = 0
+        self.compactions = 0
+
+    def _lock(self, agent_id: str) -> threading.RLock:
+        with self._locks_guard:
+            return self._locks.setdefault(agent_id, threading.RLock())
+
+    def _agent_dir(self, agent_id: str) -> str:
+        return os.path.join(self.root, agent_id)
+
+    def _current_generation(self, agent_id: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._agent_dir(agent_id), "CURRENT")) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def current_path(self, agent_id: str) -> Optional[str]:
+        generation = self._current_generation(agent_id)
+        if not generation:
+            return None
+        path = os.path.join(self._agent_dir(agent_id), generation)
+        return path if os.path.isdir(path) else None
+
+    def open(self, agent_id: str, modes: Optional[List[str]] = None, **options):
+        """The live generation with its deltas applied: a CognitiveCache, or a SegmentedCache if it has deltas."""
+        path = self.current_path(agent_id)
+        if not path:
+            return None
+        try:
+            return self._open_generation(path, modes, options)
+        except Exception as e:
+            logger.error(f"Corrupt index snapshot for agent {agent_id}, ignoring: {e}")
+            return None
+
+    def _open_generation(self, path: str, modes: Optional[List[str]], options: Dict[str, Any],
+                         segments: Optional[List[str]] = None, tombstones: Optional[List[str]] = None):
+        segments = self._list(path, self.SEGMENTS_DIR) if segments is None else segments
+        tombstones = self._list(path, self.TOMBSTONES_DIR) if tombstones is None else tombstones
+        base = CognitiveCache.open(path, modes, **options)
+        if not segments and not tombstones:
+            return base
+        parts = [base] + [
+            CognitiveCache.open(os.path.join(path, self.SEGMENTS_DIR, name), modes, **{**options, "index": "exact"})
+            for name in segments
+        ]
+        return SegmentedCache(parts, self._read_tombstones(path, tombstones))
+
+    @staticmethod
+    def _list(path: str, kind: str) -> List[str]:
+        """Committed delta names of a generation, oldest first (in-progress writes are dot-prefixed)."""
+        try:
+            return sorted(name for name in os.listdir(os.path.join(path, kind)) if not name.startswith("."))
+        except FileNotFoundError:
+            return []
+
+    def _read_tombstones(self, path: str, names: List[str]) -> Set[str]:
+        removed: Set[str] = set()
+        for name in names:
+            with open(os.path.join(path, self.TOMBSTONES_DIR, name)) as f:
+                removed.update(json.load(f))
+        return removed
+
+    def write(self, agent_id: str, cache: CognitiveCache):
+        agent_dir = self._agent_dir(agent_id)
+        with self._lock(agent_id):
+            generation = self._new_name()
+            cache.save(os.path.join(agent_dir, generation))
+            self._swap(agent_id, generation)
+        logger.info(f"Wrote index snapshot for agent {agent_id} ({len(cache)} chunks)")
+
+    def _swap(self, agent_id: str, generation: str):
+        """Point CURRENT at `generation`; caller holds the agent lock."""
+        agent_dir = self._agent_dir(agent_id)
+        replaced = self._current_generation(agent_id)
+
+        pointer_tmp = os.path.join(agent_dir, f"CURRENT.{generation}")
+        with open(pointer_tmp, "w") as f:
+            f.write(generation)
+        os.replace(pointer_tmp, os.path.join(agent_dir, "CURRENT"))
+
+        if replaced:
+            for name in os.listdir(agent_dir):
+                if not name.startswith("CURRENT") and self._generation_time(name) < self._generation_time(replaced):
+                    shutil.rmtree(os.path.join(agent_dir, name), ignore_errors=True)
+
+    @staticmethod
+    def _new_name() -> str:
+        return f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+
+    @staticmethod
+    def _generation_time(name: str) -> int:
+        """Generations are named `<time_ns>-<suffix>`; anything else sorts as newest and is left alone."""
+        try:
+            return int(name.split("-", 1)[0])
+        except ValueError:
+            return 2 ** 63
+
+    def _deltas_for(self, agent_id: str, path: str) -> _Deltas:
+        """Caller holds the agent lock."""
+        deltas = self._deltas.get(agent_id)
+        if deltas is None or deltas.path != path:
+            deltas = self._deltas[agent_id] = _Deltas(self, path)
+        return deltas
+
+    def write_rows(self, agent_id: str, rows: Iterable[Dict[str, Any]]):
+        """Full rebuild from `documents` rows (id, content, embedding, metadata, filename, allowed_modes)."""
+        cache = CognitiveCache()
+        for row in rows:
+            cache.add_document(row["id"], row["content"], row["embedding"], snapshot_metadata(row))
+        cache.freeze()
+        self.write(agent_id, cache)
+
+    def append(self, agent_id: str, rows: List[Dict[str, Any]]):
+        """Incremental update after an ingest. No snapshot yet = nothing to do (built on next warm start)."""
+        with self._lock(agent_id):
+            path = self.current_path(agent_id)
+            if path is None:
+                return
+            deltas = self._deltas_for(agent_id, path)
+            # A rebuild from the database during a streaming ingest may already hold the row
+            new = [row for row in rows if row["id"] not in deltas]
+            if not new:
+                return
+            segment = CognitiveCache(index="exact")
+            for row in new:
+                segment.add_document(row["id"], row["content"], row["embedding"], snapshot_metadata(row))
+            segment.freeze()
+            self._commit_delta(path, self.SEGMENTS_DIR, segment.save)
+            deltas.add((row["id"], row.get("filename")) for row in new)
+            deltas.delta_rows += len(new)
+            deltas.files += 1
+            self.segments_written += 1
+            compact = self._needs_compaction(deltas)
+        if compact:
+            self._schedule_compaction(agent_id)
+
+    def remove(self, agent_id: str, filename: str):
+        """Incremental update after `delete_document`."""
+        with self._lock(agent_id):
+            path = self.current_path(agent_id)
+            if path is None:
+                return
+            deltas = self._deltas_for(agent_id, path)
+            compact = self._tombstone(deltas, deltas.by_filename.get(filename, set()))
+        if compact:
+            self._schedule_compaction(agent_id)
+
+    def remove_ids(self, agent_id: str, ids: Iterable[str]):
+        """Incremental update after a re-ingest dropped some chunks of a document."""
+        with self._lock(agent_id):
+            path = self.current_path(agent_id)
+            if path is None:
+                return
+            compact = self._tombstone(self._deltas_for(agent_id, path), ids)
+        if compact:
+            self._schedule_compaction(agent_id)
+
+    def _tombstone(self, deltas: _Deltas, ids: Iterable[str]) -> bool:
+        """Returns whether the generation now needs compaction."""
+        ids = sorted(set(ids) - deltas.removed)
+        if not ids:
+            return False
+
+        def save(target: str):
+            with open(target, "w") as f:
+                json.dump(ids, f)
+
+        self._commit_delta(deltas.path, self.TOMBSTONES_DIR, save, suffix=".json")
+        deltas.removed.update(ids)
+        deltas.delta_rows += len(ids)
+        deltas.files += 1
+        self.tombstones_written += 1
+        return self._needs_compaction(deltas)
+
+    def _commit_delta(self, path: str, kind: str, save, suffix: str = ""):
+        """Write a segment/tombstone under a hidden name, then rename it into place."""
+        directory = os.path.join(path, kind)
+        os.makedirs(directory, exist_ok=True)
+        name = self._new_name() + suffix
+        tmp = os.path.join(directory, f".{name}")
+        save(tmp)
+        os.rename(tmp, os.path.join(directory, name))
+
+    # --- Compaction ---
+
+    def _needs_compaction(self, deltas: _Deltas) -> bool:
+        # Relative to the base, so a growing corpus is rewritten a logarithmic number of times
+        return (deltas.files >= self.COMPACT_MAX_SEGMENTS
+                or deltas.delta_rows >= max(self.COMPACT_MIN_ROWS, self.COMPACT_RATIO * deltas.base_rows))
+
+    def _schedule_compaction(self, agent_id: str):
+        with self._locks_guard:
+            if agent_id in self._compacting:
+                return
+            self._compacting.add(agent_id)
+        try:
+            self._compactor.submit(self._compact_in_background, agent_id)
+        except RuntimeError:
+            with self._locks_guard:
+                self._compacting.discard(agent_id)
+
+    def _compact_in_background(self, agent_id: str):
+        try:
+            self.compact(agent_id)
+        except Exception as e:
+            logger.error(f"Index snapshot compaction failed for agent {agent_id}: {e}")
+        finally:
+            with self._locks_guard:
+                self._compacting.discard(agent_id)
+
+    def compact(self, agent_id: str):
+        """
+        Fold the live generation's deltas into a new generation (rebuilding its ANN index).
+        Built outside the agent lock; deltas committed meanwhile are carried over.
+        """
+        with self._lock(agent_id):
+            path = self.current_path(agent_id)
+            if path is None:
+                return
+            generation = os.path.basename(path)
+            segments = self._list(path, self.SEGMENTS_DIR)
+            tombstones = self._list(path, self.TOMBSTONES_DIR)
+        if not segments and not tombstones:
+            return
+
+        current = self._open_generation(path, None, {"index": "exact"}, segments, tombstones)
+        cache = CognitiveCache()
+        for doc_id, content, embedding, metadata in current.rows():
+            cache.add_document(doc_id, content, embedding, metadata)
+        cache.freeze()
+        compacted = self._new_name()
+        target = os.path.join(self._agent_dir(agent_id), compacted)
+        cache.save(target)
+
+        with self._lock(agent_id):
+            if self._current_generation(agent_id) != generation:
+                # Replaced by a full rebuild meanwhile: that one is newer
+                shutil.rmtree(target, ignore_errors=True)
+                return
+            for kind, folded in ((self.SEGMENTS_DIR, segments), (self.TOMBSTONES_DIR, tombstones)):
+                for name in self._list(path, kind):
+                    if name not in folded:
+                        os.makedirs(os.path.join(target, kind), exist_ok=True)
+                        source = os.path.join(path, kind, name)
+                        (shutil.copytree if os.path.isdir(source) else shutil.copy2)(source, os.path.join(target, kind, name))
+            self._swap(agent_id, compacted)
+        self.compactions += 1
+        logger.info(f"Compacted index snapshot for agent {agent_id} ({len(cache)} chunks, "
+                    f"{len(segments)} segments, {len(tombstones)} tombstone files)")
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "segments_written": self.segments_written,
+            "tombstones_written": self.tombstones_written,
+            "compactions": self.compactions,
+        }
+
+index_snapshots = IndexSnapshotStore()
@@ -1,19 +1,41 @@
 import time
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+def write_behind_sink(report: Dict[str, Any]):
+    """Default sink: one row per turn in `turn_latency_reports`, written off the speech path."""
+    from app.services.write_behind import write_behind
+    write_behind.enqueue("turn_latency_reports", {
+        "meeting_id": report["meeting_id"],
+        "turn_id": report["turn_id"],
+        "time_to_first_audio_ms": report.get("time_to_first_audio_ms"),
+        "report": report
+    })
+
 class LatencyTracker:
     """
     Millisecond-precision timer for the AI Pipeline.
-    Tracks checkpoints: audio_in -> stt -> qbd -> llm -> tts.
+    Tracks checkpoints: audio_in -> stt -> qbd -> embedding -> rpc -> llm -> tts -> client.
+    A turn is active from `start_turn` to `finish_turn`; marks outside it (speculation
+    on interim transcripts, work still winding down after a barge-in) are ignored.
     """
-    def __init__(self, meeting_id: str):
+    CHECKPOINTS = [
+        "stt_complete", "qbd_complete",
+        "embedding_start", "embedding_complete", "rpc_complete",
+        "llm_start", "llm_first_token", "llm_complete",
+        "tts_request_start", "tts_first_byte", "first_audio_sent"
+    ]
+    HISTORY_SIZE = 100
+
+    def __init__(self, meeting_id: str, sink: Optional[Callable[[Dict[str, Any]], None]] = write_behind_sink):
         self.meeting_id = meeting_id
         self.checkpoints: Dict[str, float] = {}
+        self.annotations: Dict[str, Any] = {}
         self.turn_id = 0
         self.history: List[Dict] = []
+        self.sink = sink
 
     def start_turn(self):
         """Resets the timer for a new conversational turn."""
@@ -21,23 +43,35 @@ class LatencyTracker:
         self.checkpoints = {
             "start": time.perf_counter()
         }
+        self.annotations = {}
         # Reset specific metrics
-        for key in ["stt_complete", "qbd_complete", "llm_start", "tts_first_byte"]:
+        for key in self.CHECKPOINTS:
             self.checkpoints[key] = 0.0
 
-    def mark(self, checkpoint: str):
-        """Records a timestamp for a specific stage."""
+    def mark(self, checkpoint: str, once: bool = False):
+        """
+        Records a timestamp for a specific stage.
+        With `once`, only the first occurrence in the turn is kept (first token, first byte...).
+        """
         if "start" not in self.checkpoints:
-             self.start_turn()
-        
+            return
+
+        if once and self.checkpoints.get(checkpoint):
+            return
+
         self.checkpoints[checkpoint] = time.perf_counter()
-        
+
         # Calculate delta immediately for logging
         start = self.checkpoints["start"]
         current = self.checkpoints[checkpoint]
         delta_ms = (current - start) * 1000
         # logger.debug(f"Latency [{self.meeting_id}]: {checkpoint} @ +{delta_ms:.2f}ms")
 
+    def annotate(self, key: str, value: Any):
+        """Attach turn metadata (decision path, loop, speculation...) to the report."""
+        if "start" in self.checkpoints:
+            self.annotations[key] = value
+
     def get_report(self) -> Dict[str, float]:
         """Returns validated latencies in ms."""
         start = self.checkpoints.get("start", 0)
@@ -49,9 +83,42 @@ class LatencyTracker:
             if key == "start": continue
             if val > 0:
                 report[f"latency_{key}_ms"] = (val - start) * 1000
-        
+
         # Calculate specific gaps if data exists
         if "tts_first_byte" in self.checkpoints and self.checkpoints["tts_first_byte"] > 0:
              report["total_e2e_latency_ms"] = (self.checkpoints["tts_first_byte"] - start) * 1000
-             
+        if self.checkpoints.get("first_audio_sent"):
+             report["time_to_first_audio_ms"] = (self.checkpoints["first_audio_sent"] - start) * 1000
+        if self.checkpoints.get("embedding_start") and self.checkpoints.get("embedding_complete"):
+             report["embedding_ms"] = (self.checkpoints["embedding_complete"] - self.checkpoints["embedding_start"]) * 1000
+        if self.checkpoints.get("llm_start") and self.checkpoints.get("llm_first_token"):
+             report["llm_ttft_ms"] = (self.checkpoints["llm_first_token"] - self.checkpoints["llm_start"]) * 1000
+        if self.checkpoints.get("tts_request_start") and self.checkpoints.get("tts_first_byte"):
+             report["tts_ttfb_ms"] = (self.checkpoints["tts_first_byte"] - self.checkpoints["tts_request_start"]) * 1000
+
         return report
+
+    def finish_turn(self):
+        """
+        Closes the current turn and hands its report to the sink.
+        The sink must not block (default: write-behind queue).
+        """
+        report = self.get_report()
+        annotations = self.annotations
+        self.checkpoints = {}
+        self.annotations = {}
+        if not report:
+            return
+        report.update(annotations)
+        report["meeting_id"] = self.meeting_id
+        report["turn_id"] = self.turn_id
+
+        self.history.append(report)
+        if len(self.history) > self.HISTORY_SIZE:
+            self.history.pop(0)
+
+        if self.sink:
+            try:
+                self.sink(report)
+            except Exception as e:
+                logger.error(f"Latency sink failed: {e}")
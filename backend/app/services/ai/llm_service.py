@@ -1,8 +1,9 @@
 import os
 import json
-from typing import AsyncGenerator, Dict, Any
+from typing import AsyncGenerator, Dict, Any, Optional
 from openai import AsyncOpenAI
 from .base import LLMService
+from .latency_tracker import LatencyTracker
 # FinOps hook
 from ...services.finops_service import finops_service
 
@@ -135,3 +136,42 @@ class OpenAILLMService(LLMService):
         except Exception as e:
             print(f"LLM Raw Generation failed: {e}")
             raise e
+
+    async def generate_stream(self, system_prompt: str, user_prompt: str, max_tokens: int, tracker: Optional[LatencyTracker] = None,
+                              session_id: str = "session_123") -> AsyncGenerator[str, None]:
+        """
+        Streaming variant of `generate` for AgentRuntime.
+        Yields content tokens as they arrive so TTS can start on the first sentence.
+        Closing the generator (barge-in) aborts the request; output tokens are
+        accounted only up to the cut-off.
+        """
+        if tracker:
+            tracker.mark("llm_start")
+        stream = await self.client.chat.completions.create(
+            model="gpt-4-1106-preview",
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            max_tokens=max_tokens,
+            temperature=0.3,
+            stream=True
+        )
+
+        output_chars = 0
+        try:
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if tracker:
+                        tracker.mark("llm_first_token", once=True)
+                    output_chars += len(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+            if tracker:
+                tracker.mark("llm_complete")
+        finally:
+            # Closes the HTTP response if the consumer stops early
+            await stream.close()
+
+            # Log FinOps (Approximate token count for speed: chars/4)
+            await finops_service.log_cost(session_id, "LLM_TOKEN_INPUT", len(system_prompt + user_prompt) / 4, "OpenAI")
+            await finops_service.log_cost(session_id, "LLM_TOKEN_OUTPUT", output_chars / 4, "OpenAI")
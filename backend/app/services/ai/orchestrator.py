@@ -1,19 +1,26 @@
 import asyncio
 import json
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Optional
 from .stt_service import DeepgramSTTService
-from .tts_service import ElevenLabsTTSService
-from .agent_runtime import AgentRuntime, AgentIdentity
+from .tts_service import ElevenLabsTTSService, SpeechProgress
+from .agent_runtime import AgentRuntime, disclosure_text, fixed_utterances
+from .agent_cache import agent_cache, runtime_pool
 from .memory_service import MemoryService
 from .speech_governor import SpeechGovernor
 from .latency_tracker import LatencyTracker
-from app.db.supabase import get_supabase_client
+from .speculative_executor import SpeculativeExecutor
+from .audio_channel import AudioChannel
+from .audio_store import audio_store
+from app.services.write_behind import write_behind
 import logging
 
 logger = logging.getLogger(__name__)
 
 class AIOrchestrator:
-    def __init__(self, meeting_id: str, agent_id: str, voice_id: str, mode: str = "interview"):
+    def __init__(self, meeting_id: str, agent_id: str, voice_id: str, mode: str = "interview",
+                 speculative: bool = True, speculative_draft: bool = False,
+                 input_buffer_ms: int = 2000, output_buffer_ms: int = 10000, input_format: str = "webm",
+                 output_read_ms: int = 20):
         self.meeting_id = meeting_id
         self.agent_id = agent_id
         self.voice_id = voice_id or "21m00Tcm4TlvDq8ikWAM"
@@ -26,45 +33,57 @@ class AIOrchestrator:
         # Runtime
         self.runtime = None 
         self.pending_mode = mode
+        self.speculative = speculative
+        self.speculative_draft = speculative_draft
+        self.speculator = None
+        self._fixed_texts = set()
         
         # State
         self.is_speaking = False
+        self.current_turn = None
+        self._turn_audio_queued = 0
+        self._turn_audio_discarded = 0
         self.governor = SpeechGovernor()
         self.latency_tracker = LatencyTracker(meeting_id)
         
-        # Queues
-        self.audio_input_queue = asyncio.Queue()
-        self.audio_output_queue = asyncio.Queue()
+        # Queues (bounded ring buffers)
+        # Input: live mic audio in the transport's format (`input_format`): raw PCM from
+        # WebRTC ("pcm_16000") drops its stalest samples; MediaRecorder WebM/Opus from the
+        # WebSocket client ("webm") drops whole chunks, never bytes from inside one.
+        # Output: generated TTS audio; producers block, which backpressures the TTS stream.
+        # Reads are capped at `output_read_ms` (the WebRTC track's 20 ms frame pacing), so audio
+        # waits here, where barge-in can flush it, rather than in the transport's own buffers.
+        # The output byte rate is set once the TTS format is known (run_pipeline).
+        self.audio_input_queue = self._input_channel(input_format, input_buffer_ms)
+        self.audio_output_queue = AudioChannel(output_buffer_ms, bytes_per_ms=16, overflow=AudioChannel.BLOCK,
+                                               max_read_ms=output_read_ms, name="output")
+
+    @staticmethod
+    def _input_channel(input_format: str, buffer_ms: int) -> AudioChannel:
+        if input_format.startswith("pcm"):
+            return AudioChannel(buffer_ms, AudioChannel.format_bytes_per_ms(input_format),
+                                overflow=AudioChannel.DROP_OLDEST, align=2, name="input")
+        # Opus in WebM: ~128 kbps upper bound for MediaRecorder's default bitrate
+        return AudioChannel(buffer_ms, bytes_per_ms=16, overflow=AudioChannel.DROP_CHUNK, name="input")
 
     async def initialize(self):
-        supabase = get_supabase_client()
-        agent_resp = supabase.table("agents").select("*").eq("id", self.agent_id).execute()
-        if not agent_resp.data:
-            raise ValueError(f"Agent {self.agent_id} not found")
-        
-        agent_data = agent_resp.data[0]
-        
-        # --- Voice ID Resolution ---
-        # If voice_id is an internal model ID (e.g., 'eleven_monolingual_v1'), 
-        # we resolve it to the provider's external ID. If not found, assume it's a valid external ID.
-        voice_res = supabase.table("voice_models").select("voice_id").eq("id", self.voice_id).execute()
-        if voice_res.data and voice_res.data[0].get("voice_id"):
-             resolved_voice = voice_res.data[0].get("voice_id")
-             logger.info(f"Resolved Voice ID: {self.voice_id} -> {resolved_voice}")
-             self.voice_id = resolved_voice
+        # Identity and voice come from the resolution cache; a runtime pre-warmed
+        # for this agent (see RuntimePool) is used when available.
+        resolved = await agent_cache.resolve_agent(self.agent_id)
+        self.voice_id = await agent_cache.resolve_voice(self.voice_id)
+
+        runtime = runtime_pool.acquire(self.agent_id, self.pending_mode)
+        if runtime:
+            logger.info(f"Using pre-warmed runtime for agent {self.agent_id}")
+            runtime.latency_tracker = self.latency_tracker
         else:
-             logger.info(f"Using provided Voice ID directly (likely a cloned voice): {self.voice_id}")
-        # ---------------------------
-
-        identity = AgentIdentity(
-            name=agent_data.get("name") or "Agent",
-            role=agent_data.get("role") or "Assistant",
-            years_experience=agent_data.get("years_experience") or 0,
-            communication_style=agent_data.get("communication_style") or "formal",
-            guardrails=agent_data.get("guardrails") or {}
-        )
-        
-        self.runtime = AgentRuntime(self.agent_id, identity, self.pending_mode)
+            runtime = AgentRuntime(self.agent_id, resolved.identity, self.pending_mode, latency_tracker=self.latency_tracker,
+                                   retrieval_dim=resolved.retrieval_dim)
+        self.runtime = runtime
+        self._fixed_texts = set(fixed_utterances(resolved.identity))
+
+        if self.speculative:
+            self.speculator = SpeculativeExecutor(self.runtime, self.meeting_id, draft=self.speculative_draft)
 
     async def ingest_audio(self, audio_data: bytes):
         await self.audio_input_queue.put(audio_data)
@@ -77,92 +96,224 @@ class AIOrchestrator:
     async def run_pipeline(self, tts_output_format: str = "mp3_44100_128"):
         if not self.runtime:
             await self.initialize()
+
+        # Load the agent's corpus into memory while the disclosure plays;
+        # turns that arrive before it finishes use RPC retrieval.
+        warm_task = None
+        if not self.runtime.warm_started:
+            warm_task = asyncio.create_task(self.runtime.warm_start())
+
+        self.audio_output_queue.reconfigure(
+            AudioChannel.format_bytes_per_ms(tts_output_format),
+            align=2 if tts_output_format.startswith("pcm") else 1  # Whole 16-bit samples for PCM consumers
+        )
             
         # Disclosure logic
         try:
-            disclosure_text = f"Hello. I am {self.runtime.identity.name}, an AI assistant. I am recording this session for {self.runtime.mode} purposes."
+            disclosure = disclosure_text(self.runtime.identity, self.runtime.mode)
             
-            # DB Logs
-            get_supabase_client().table('meeting_transcripts').insert([
+            # DB Logs (write-behind, off the speech path)
+            write_behind.enqueue('meeting_transcripts', [
                 {"meeting_id": self.meeting_id, "speaker": "system", "content": f"Agent {self.runtime.identity.name} joined.", "confidence": 1.0},
-                {"meeting_id": self.meeting_id, "speaker": "agent", "content": disclosure_text, "confidence": 1.0}
-            ]).execute()
+                {"meeting_id": self.meeting_id, "speaker": "agent", "content": disclosure, "confidence": 1.0}
+            ])
             
-            self.is_speaking = True
-            async def announcement_yielder():
-                yield disclosure_text
-            
-            tts_stream = self.tts.speak_stream(announcement_yielder(), self.voice_id, output_format=tts_output_format)
-            async for audio_chunk in tts_stream:
+            # Pre-rendered per voice (see audio_store); rendered and kept on first use
+            self._set_speaking(True)
+            audio_stream = audio_store.stream(self.voice_id, tts_output_format, disclosure, session_id=self.meeting_id)
+            async for audio_chunk in audio_stream:
                  await self.audio_output_queue.put(audio_chunk)
-            self.is_speaking = False
+            self._set_speaking(False)
             
         except Exception as e:
             logger.error(f"Disclosure failed: {e}")
         
         # STT Loop
-        stt_stream = self.stt.transcribe_stream(self.audio_generator())
-        async for transcript in stt_stream:
-            self.latency_tracker.start_turn()
-            
-            if self.is_speaking and self.governor.should_interrupt(transcript):
-                 await self.governor.interrupt()
-                 self.is_speaking = False
-                 while not self.audio_output_queue.empty():
-                    try: self.audio_output_queue.get_nowait()
-                    except: pass
-                 continue
-
-            if len(transcript) > 5:
-                await self.process_turn(transcript, tts_output_format=tts_output_format)
-
-    async def process_turn(self, user_text: str, tts_output_format: str = "mp3_44100_128"):
+        # Turns run as tasks so barge-in can be detected (and the turn cancelled) while the agent speaks.
+        stt_stream = self.stt.transcribe_events(self.audio_generator())
+        # Final segments of the utterance in progress: a long question is finalized in several
+        # segments, and the turn starts only at its end (speech_final / UtteranceEnd)
+        segments = []
+        try:
+            async for event in stt_stream:
+                transcript = event.text
+                
+                if self.is_speaking:
+                    # Backchannels ("ok.", "yes.") must not cut the answer off
+                    if not self.governor.should_interrupt(transcript):
+                        continue
+                    # Barge-in: flushes the output buffer, so only audio actually heard is recorded
+                    await self.interrupt_turn()
+                    if self.speculator:
+                        self.speculator.cancel()
+                    if not event.is_final:
+                        continue
+                    # A final that interrupted the agent is also (part of) the user's next question
+
+                if event.is_final and transcript:
+                    segments.append(transcript)
+                if not event.speech_final:
+                    # User still speaking: get QBD/retrieval done on the stable prefix
+                    if self.speculator:
+                        self.speculator.observe(" ".join(segments if event.is_final else segments + [transcript]))
+                    continue
+
+                transcript = " ".join(segments)
+                segments = []
+                if not transcript:
+                    continue
+
+                # A new question while the previous answer is still being prepared (not yet spoken) supersedes it
+                await self._cancel_turn()
+
+                self.latency_tracker.start_turn()
+                # Never awaited here: a draft may still be generating, and STT must keep flowing
+                speculation = self.speculator.resolve(transcript) if self.speculator else None
+
+                if len(transcript) > 5:
+                    self.current_turn = asyncio.create_task(
+                        self.process_turn(transcript, tts_output_format=tts_output_format, speculation=speculation)
+                    )
+                else:
+                    # Nothing to answer: close the turn so stray marks aren't attributed to it
+                    if speculation:
+                        speculation.cancel()
+                    self.latency_tracker.finish_turn()
+        finally:
+            await self._cancel_turn()
+            if warm_task and not warm_task.done():
+                warm_task.cancel()
+            self.runtime.close()
+
+    async def interrupt_turn(self):
+        """
+        Barge-in: stop playback immediately and cancel the in-flight turn,
+        which aborts its LLM and TTS requests.
+        """
+        await self.governor.interrupt()
+        self._set_speaking(False)
+        self._turn_audio_discarded += self.audio_output_queue.flush()
+        await self._cancel_turn()
+
+    async def _cancel_turn(self):
+        turn = self.current_turn
+        self.current_turn = None
+        if turn and not turn.done():
+            turn.cancel()
+            # wait() (unlike awaiting the task) doesn't swallow our own cancellation
+            await asyncio.wait([turn])
+
+    def _set_speaking(self, speaking: bool):
+        self.is_speaking = speaking
+        self.governor.is_speaking = speaking
+
+    def audio_metrics(self) -> dict:
+        return {
+            "input": self.audio_input_queue.metrics(),
+            "output": self.audio_output_queue.metrics()
+        }
+
+    def mark_audio_sent(self):
+        """Called by the transport (WebSocket / WebRTC) after a chunk reaches the client."""
+        self.latency_tracker.mark("first_audio_sent", once=True)
+
+    async def process_turn(self, user_text: str, tts_output_format: str = "mp3_44100_128",
+                           speculation: Optional[asyncio.Task] = None):
+        """`speculation`: pending commit from SpeculativeExecutor.resolve (cancelled with the turn)."""
         self.governor.clear_interruption()
         self.latency_tracker.mark("stt_complete")
+        try:
+            committed = await speculation if speculation else None
+            self.latency_tracker.annotate("speculation_committed", committed is not None)
+            await self._run_turn(user_text, tts_output_format, committed)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Turn failed: {e}")
+        finally:
+            self.latency_tracker.finish_turn()
+
+    async def _run_turn(self, user_text: str, tts_output_format: str, speculation: dict):
         
         # Log user text
-        get_supabase_client().table('meeting_transcripts').insert({
+        write_behind.enqueue('meeting_transcripts', {
             "meeting_id": self.meeting_id, "speaker": "user", "content": user_text, "confidence": 1.0
-        }).execute()
+        })
 
-        # Brain
-        response_data = await self.runtime.generate_response(user_text, self.meeting_id)
-        response_text = response_data["text"]
-        
-        # Pacing
-        pause_duration = self.governor.calculate_pause(self.runtime.mode)
-        if response_data.get("loop_used") == "FAST":
-             pause_duration = 0.1
-        if pause_duration > 0:
-            await asyncio.sleep(pause_duration)
-        
-        if self.governor.interrupt_event.is_set():
-            return
+        progress = SpeechProgress()
+        self._turn_audio_queued = 0
+        self._turn_audio_discarded = 0
+        response_stream = None
+        interrupted = False
+        try:
+            # Brain: gates + retrieval run here, generation is streamed into TTS below
+            response_stream = await self.runtime.stream_response(user_text, self.meeting_id, speculation=speculation)
+            
+            # Pacing
+            pause_duration = self.governor.calculate_pause(self.runtime.mode)
+            if response_stream.result.get("loop_used") == "FAST":
+                 pause_duration = 0.1
+            if pause_duration > 0:
+                await asyncio.sleep(pause_duration)
+
+            # Speak while the LLM is still generating.
+            # Fixed utterances (refusals, greeting, clarification, error) play pre-rendered audio.
+            self._set_speaking(True)
+            fixed_text = response_stream.result.get("text")
+            if response_stream.is_fixed and fixed_text in self._fixed_texts:
+                audio_stream = audio_store.stream(
+                    self.voice_id, tts_output_format, fixed_text,
+                    tracker=self.latency_tracker, progress=progress, session_id=self.meeting_id
+                )
+            else:
+                audio_stream = self.tts.speak_stream(
+                    response_stream, self.voice_id, output_format=tts_output_format,
+                    tracker=self.latency_tracker, progress=progress, session_id=self.meeting_id
+                )
+            try:
+                async for audio_chunk in audio_stream:
+                    await self.audio_output_queue.put(audio_chunk)
+                    self._turn_audio_queued += len(audio_chunk)
+            finally:
+                await audio_stream.aclose()
+
+        except asyncio.CancelledError:
+            interrupted = True
+            raise
+        finally:
+            self._set_speaking(False)
+            if response_stream:
+                await response_stream.aclose()
+                self._record_turn(user_text, response_stream.result, progress, interrupted)
+
+    def _record_turn(self, user_text: str, response_data: dict, progress: SpeechProgress, interrupted: bool):
+        response_text = response_data["text"] or ""
+        spoken_text = response_text
+        if interrupted:
+            # Only audio that left the output buffer was heard
+            delivered = max(0, self._turn_audio_queued - self._turn_audio_discarded)
+            spoken_text = progress.spoken_text(delivered)
+
+        self.latency_tracker.annotate("decision_path", response_data["decision_path"])
+        self.latency_tracker.annotate("loop_used", response_data.get("loop_used"))
+        self.latency_tracker.annotate("interrupted", interrupted)
+        self.latency_tracker.annotate("spoken_ratio", len(spoken_text) / len(response_text) if response_text else 0.0)
+        self.latency_tracker.annotate("output_buffer_ms", self.audio_output_queue.occupancy_ms)
+        self.latency_tracker.annotate("input_dropped_ms", self.audio_input_queue.metrics()["dropped_ms"])
 
         # Audit
-        get_supabase_client().table('agent_audit_logs').insert({
+        write_behind.enqueue('agent_audit_logs', {
             "meeting_id": self.meeting_id, "agent_id": self.agent_id,
             "question": user_text, "answer": response_text,
             "retrieved_sources": json.dumps(response_data["retrieved_sources"]),
             "confidence_score": response_data["confidence"],
-            "decision_path": response_data["decision_path"]
-        }).execute()
+            "decision_path": response_data["decision_path"],
+            "interrupted": interrupted,
+            "spoken_chars": len(spoken_text)
+        })
 
-        # Speak
-        if response_text and response_text.strip():
-            self.is_speaking = True
-            get_supabase_client().table('meeting_transcripts').insert({
-                "meeting_id": self.meeting_id, "speaker": "agent", "content": response_text, "confidence": response_data["confidence"]
-            }).execute()
-
-            async def text_yielder():
-                yield response_text
-
-            tts_stream = self.tts.speak_stream(text_yielder(), self.voice_id, output_format=tts_output_format)
-            
-            async for audio_chunk in tts_stream:
-                if self.governor.interrupt_event.is_set():
-                    break
-                await self.audio_output_queue.put(audio_chunk)
-            
-            self.is_speaking = False
+        # The transcript records what the meeting actually heard
+        if spoken_text.strip():
+            write_behind.enqueue('meeting_transcripts', {
+                "meeting_id": self.meeting_id, "speaker": "agent", "content": spoken_text, "confidence": response_data["confidence"]
+            })
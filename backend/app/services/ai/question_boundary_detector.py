@@ -33,6 +33,13 @@ class QuestionBoundaryDetector:
         r"visa sponsorship" # Legal guard
     ]
 
+    # Pre-baked refusal text per refusal_reason (fixed, so its audio can be pre-rendered)
+    REFUSAL_TEMPLATES = {
+        "malicious": "I cannot discuss that topic.",
+        "mode_violation": "Let's save the deep dive for a follow-up; I want to focus on today's status.",
+        "low_confidence": "I don't have the specific details on that right now.",
+    }
+
     def __init__(self):
         self.compiled_patterns = [re.compile(p, re.IGNORECASE) for p in self.MALICIOUS_PATTERNS]
 
@@ -50,7 +57,7 @@ class QuestionBoundaryDetector:
                     decision="REFUSE",
                     confidence=1.0,
                     refusal_reason="malicious",
-                    suggested_template="I cannot discuss that topic.",
+                    suggested_template=self.REFUSAL_TEMPLATES["malicious"],
                     intent="malicious"
                 )
 
@@ -74,7 +81,7 @@ class QuestionBoundaryDetector:
                     decision="REFUSE",
                     confidence=0.9,
                     refusal_reason="mode_violation",
-                    suggested_template="Let's save the deep dive for a follow-up; I want to focus on today's status.",
+                    suggested_template=self.REFUSAL_TEMPLATES["mode_violation"],
                     intent=intent
                 )
         
@@ -120,7 +127,7 @@ class QuestionBoundaryDetector:
                 decision="REFUSE",
                 confidence=1.0,
                 refusal_reason="low_confidence",
-                suggested_template="I don't have the specific details on that right now.",
+                suggested_template=self.REFUSAL_TEMPLATES["low_confidence"],
                 intent="unknown"
             )
 
@@ -131,7 +138,7 @@ class QuestionBoundaryDetector:
                 decision="REFUSE",
                 confidence=1.0,
                 refusal_reason="low_confidence",
-                suggested_template="I don't have the specific details on that right now.",
+                suggested_template=self.REFUSAL_TEMPLATES["low_confidence"],
                 intent="unknown"
             )
             
@@ -1,13 +1,70 @@
 import os
+import json
+import time
+import asyncio
 import requests
-from typing import List, Dict, Any
+import numpy as np
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+from typing import AsyncGenerator, Callable, List, Dict, Any, Optional, Tuple
 from app.db.supabase import get_supabase_client
+from app.services.ai.latency_tracker import LatencyTracker
+from app.services.ai.answer_cache import answer_cache
+from app.services.ai.index_snapshot import index_snapshots
+from app.services.ai.cognitive_cache import CognitiveCache
+from app.services.ai.embedding_cache import embedding_cache
+from app.services.ai.embedding_client import embedding_client, EmbeddingError
+from app.services.ai.document_pipeline import (
+    iter_pages, check_text, normalize_pages, strip_boilerplate, iter_batches, StructuredChunker, ChunkStats, content_hash
+)
+
+class DocResult:
+    """Search hit returned by `RAGService.search`."""
+    def __init__(self, id, content, score):
+        self.id = id
+        self.content = content
+        self.score = score
+
+# Per-agent corpus version, bumped on every ingest/delete in this process.
+# In-memory indexes built from an older version are stale.
+_corpus_versions: Dict[str, int] = {}
+
+def corpus_version(agent_id: str) -> int:
+    return _corpus_versions.get(agent_id, 0)
+
+def _corpus_changed(agent_id: str):
+    _corpus_versions[agent_id] = corpus_version(agent_id) + 1
+    # Cached answers were generated from the old knowledge base
+    answer_cache.invalidate(agent_id)
+
+# Ingestion embedding batches: provider limits are 2048 inputs / ~300k tokens per
+# request; smaller batches keep a few in flight and make retries cheap.
+EMBED_BATCH_INPUTS = 128
+EMBED_BATCH_TOKENS = 32000
+EMBED_CONCURRENCY = 4      # Batches in flight per ingestion
+EMBED_RETRIES = 4
+EMBED_BATCH_TIMEOUT = 60.0
+
+# Structure-aware chunking (see StructuredChunker); ~400 tokens is ~1600 chars,
+# so a chunk now carries about 1.6x the text of the former fixed 1000-char slices
+CHUNK_MAX_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 40
+CHUNK_MIN_TOKENS = 60
+
+# Chunk rows per `documents` insert request (~20 KB of JSON per 1536-dim row, so
+# ~1.3 MB). A divisor of EMBED_BATCH_INPUTS: a full embedding batch is exactly two
+# inserts instead of a full one plus a small remainder.
+INSERT_BATCH_ROWS = EMBED_BATCH_INPUTS // 2
+# Stored rows buffered before they are appended to the agent's index snapshot (one
+# segment each; four full embedding batches). Runtimes only reload once per
+# document: the corpus version is bumped at the end.
+SNAPSHOT_FLUSH_ROWS = 4 * EMBED_BATCH_INPUTS
 
 class RAGService:
     def __init__(self, user_id: str = None):
         self.user_id = user_id
         self.openai_api_key = os.getenv("OPENAI_API_KEY")
         self.openrouter_api_key = os.getenv("OPENROUTER_API_KEY")
+        self.chunker = StructuredChunker(CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, CHUNK_MIN_TOKENS)
         
         if self.user_id:
             self._load_user_keys()
@@ -23,10 +80,8 @@ class RAGService:
         except Exception as e:
             print(f"Failed to load user keys: {e}")
 
-    def _get_embedding(self, text: str) -> List[float]:
-        """
-        Generate embedding using OpenAI or OpenRouter.
-        """
+    def _embedding_endpoint(self) -> Optional[Tuple[str, Dict[str, str], str]]:
+        """(url, headers, model) of the configured embedding provider, None without API keys."""
         if self.openai_api_key:
             url = "https://api.openai.com/v1/embeddings"
             headers = {
@@ -45,32 +100,137 @@ class RAGService:
             # OpenRouter usually requires "vendor/model" format
             model = "openai/text-embedding-3-small"
         else:
-             print("WARNING: No AI API Keys found. Using Mock Embeddings.")
-             return [0.0] * 1536
+            return None
+        return url, headers, model
 
-        data = {
-            "input": text,
-            "model": model
-        }
-        
+    @staticmethod
+    def canonical_url(url: str) -> str:
+        """Identity of a web document: lower-case scheme/host, no fragment or default port, sorted query."""
+        parts = urlsplit(url.strip())
+        scheme = parts.scheme.lower() or "https"
+        host = (parts.hostname or "").lower()
+        if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+            host = f"{host}:{parts.port}"
+        path = parts.path.rstrip("/") or "/"
+        query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+        return urlunsplit((scheme, host, path, query, ""))
+
+    @staticmethod
+    def embedding_model_tag(model: str) -> str:
+        """Model recorded on stored chunks; the provider prefix is dropped (same vectors via OpenRouter)."""
+        return model.split("/")[-1]
+
+    async def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeddings for `texts` (one provider request) via the shared async client.
+        Raises EmbeddingError when no key is configured or the provider fails.
+        """
+        endpoint = self._embedding_endpoint()
+        if endpoint is None:
+            raise EmbeddingError("No AI API keys configured for embeddings")
+        url, headers, model = endpoint
+        return await embedding_client.embed(url, headers, model, texts)
+
+    async def get_embedding(self, text: str) -> List[float]:
+        return (await self.get_embeddings([text]))[0]
+
+    async def _embed_and_insert(self, endpoint: Tuple[str, Dict[str, str], str],
+                                rows: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], int, int]:
+        """
+        One ingestion batch: a multi-input embedding request (transient failures and
+        rate limits retried), then bulk insert.
+        Returns (inserted rows, failures, insert requests, embedded count).
+        """
+        url, headers, model = endpoint
         try:
-            response = requests.post(url, headers=headers, json=data)
-            
-            if response.status_code == 401:
-                print("WARNING: Unauthorized (401) from AI Provider. Check your API Key.")
-                return [0.0] * 1536
-                
-            response.raise_for_status()
-            return response.json()["data"][0]["embedding"]
-        except Exception as e:
-            print(f"Embedding generation failed: {e}")
-            return [0.0] * 1536
+            vectors = await embedding_client.embed(
+                url, headers, model, [row["content"] for row in rows],
+                timeout=EMBED_BATCH_TIMEOUT, retries=EMBED_RETRIES
+            )
+        except EmbeddingError as e:
+            chunk_indices = [row["metadata"]["chunk_index"] for row in rows]
+            print(f"Failed to embed chunks {chunk_indices[0]}-{chunk_indices[-1]}: {e}")
+            return [], [{"chunk_indices": chunk_indices, "error": f"embedding failed: {e}"}], 0, 0
+
+        for row, vector in zip(rows, vectors):
+            row["embedding"] = vector
+        inserted, failures = await self.insert_chunks(rows)
+        return inserted, failures, -(-len(rows) // INSERT_BATCH_ROWS), len(rows)
+
+    async def insert_chunks(self, rows: List[Dict[str, Any]], batch_rows: int = INSERT_BATCH_ROWS) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Bulk-insert `documents` rows, `batch_rows` per request (each request is one
+        PostgREST transaction). Returns (inserted rows with ids, failed batches as
+        {"chunk_indices", "error"}).
+        """
+        supabase = get_supabase_client()
+        inserted: List[Dict[str, Any]] = []
+        failures: List[Dict[str, Any]] = []
+
+        for start in range(0, len(rows), batch_rows):
+            batch = rows[start:start + batch_rows]
+            try:
+                response = await asyncio.to_thread(supabase.table("documents").insert(batch).execute)
+                if len(response.data or []) != len(batch):
+                    raise RuntimeError(f"{len(response.data or [])} of {len(batch)} rows returned")
+                # PostgREST returns inserted rows in request order
+                inserted.extend({**row, "id": stored["id"]} for row, stored in zip(batch, response.data))
+            except Exception as e:
+                chunk_indices = [row["metadata"]["chunk_index"] for row in batch]
+                print(f"Failed to insert chunks {chunk_indices[0]}-{chunk_indices[-1]}: {e}")
+                failures.append({"chunk_indices": chunk_indices, "error": str(e)})
+
+        return inserted, failures
+
+    async def delete_chunks(self, ids: List[str], batch_rows: int = INSERT_BATCH_ROWS):
+        supabase = get_supabase_client()
+        for start in range(0, len(ids), batch_rows):
+            await asyncio.to_thread(supabase.table("documents").delete().in_("id", ids[start:start + batch_rows]).execute)
+
+    async def existing_chunks(self, agent_id: str, filename: str, source_url: Optional[str] = None,
+                              page_size: int = 1000) -> List[Dict[str, Any]]:
+        """
+        Stored chunks of a document, without content or embeddings (for re-ingest diffs).
+        Web documents are matched on `source_url`, files and text on `filename`.
+        """
+        supabase = get_supabase_client()
+        chunks: List[Dict[str, Any]] = []
+        while True:
+            query = supabase.table("documents").select("id, content_hash, embedding_model, source_type, allowed_modes") \
+                .eq("agent_id", agent_id)
+            if source_url:
+                query = query.eq("source_url", source_url)
+            else:
+                query = query.eq("filename", filename).is_("source_url", "null")
+            response = await asyncio.to_thread(query.order("id").range(len(chunks), len(chunks) + page_size - 1).execute)
+            rows = response.data or []
+            chunks.extend(rows)
+            if len(rows) < page_size:
+                return chunks
 
-    async def ingest_document(self, agent_id: str, user_id: str, filename: str, content: Any, source_type: str = "general", allowed_modes: List[str] = None, token: str = None):
+    async def ingest_document(self, agent_id: str, user_id: str, filename: str, content: Any, source_type: str = "general", allowed_modes: List[str] = None, token: str = None,
+                              atomic: bool = False, progress: Optional[Callable[[Dict[str, Any]], None]] = None,
+                              source_url: Optional[str] = None):
         """
         Chunk text, embed, and store in DB with strict scoping.
         Active content can be str (text) or bytes (file).
+        Streaming: pages are parsed, chunked, embedded and inserted batch by batch,
+        so memory stays bounded and early chunks are stored (and searchable through
+        match_documents) while later pages are still being parsed. Stored chunks are
+        appended to the index snapshot every SNAPSHOT_FLUSH_ROWS rows, and in-memory
+        indexes are invalidated once, when the document is done.
+        Incremental: re-ingesting a document reuses stored chunks with the same
+        content hash, embedding model, source type and modes; only new chunks are
+        embedded, and chunks no longer produced are deleted once every new chunk is stored.
+        A document is identified by `source_url` (canonical URL) when given, else by `filename`.
+        With `atomic`, a failed batch stops the ingest and removes what was stored
+        (the previous version of the document stays intact). A cancelled ingest
+        removes the chunks it stored before re-raising. Raises ValueError for a
+        text file that is not UTF-8 (nothing is stored).
+        `progress`, if given, is called with the running stats after every batch.
+        Returns ingestion stats (chunk counts, failures per batch, timings, chunks/sec).
         """
+        check_text(filename, content)
         supabase = get_supabase_client()
         
         # Create user client if token is provided
@@ -86,8 +246,6 @@ class RAGService:
                  options=ClientOptions(headers={"Authorization": f"Bearer {token}"})
              )
 
-        text_content = ""
-        
         if isinstance(content, bytes):
              # 0. Upload to Storage
              try:
@@ -95,7 +253,7 @@ class RAGService:
                  storage_client.storage.from_("knowledge-base").upload(
                      file_path,
                      content,
-                     {"content-type": "application/pdf" if filename.endswith(".pdf") else "text/plain"}
+                     {"content-type": "application/pdf" if filename.endswith(".pdf") else "text/plain", "upsert": "true"}
                  )
              except Exception as e:
                  # Try to create bucket if it doesn't exist
@@ -110,7 +268,7 @@ class RAGService:
                         storage_client.storage.from_("knowledge-base").upload(
                             file_path,
                             content,
-                             {"content-type": "application/pdf" if filename.endswith(".pdf") else "text/plain"}
+                             {"content-type": "application/pdf" if filename.endswith(".pdf") else "text/plain", "upsert": "true"}
                         )
                      except Exception as e2:
                          print(f"CRITICAL: Failed to create/upload to 'knowledge-base' bucket. Raw file not backed up: {e2}")
@@ -118,74 +276,173 @@ class RAGService:
                  else:
                      print(f"Bypassing storage upload (might already exist): {e}")
 
-        # 1. Extract Text based on type
-        if filename.lower().endswith('.pdf'):
+        # 1-2. Stream pages -> normalized text -> chunks -> embedding batches (see document_pipeline)
+        is_pdf = filename.lower().endswith(".pdf")
+        endpoint = self._embedding_endpoint()
+        if endpoint is None:
+            raise EmbeddingError("No AI API keys configured for embeddings")
+        model_tag = self.embedding_model_tag(endpoint[2])
+        stats = {"pages": 0, "chunks": 0, "reused": 0, "embedded": 0, "stored": 0, "removed": 0, "failed": 0, "failures": [], "insert_requests": 0}
+
+        # Re-ingest: stored chunks still produced are kept as they are, the rest is stale
+        reusable: Dict[str, List[str]] = {}
+        stale: List[str] = []
+        for row in await self.existing_chunks(agent_id, filename, source_url):
+            if (row.get("content_hash") and row.get("embedding_model") == model_tag and row.get("source_type") == source_type
+                    and sorted(row.get("allowed_modes") or []) == sorted(allowed_modes or [])):
+                reusable.setdefault(row["content_hash"], []).append(row["id"])
+            else:
+                stale.append(row["id"])
+
+        def changed(chunks):
+            for chunk in chunks:
+                stats["chunks"] += 1
+                ids = reusable.get(content_hash(chunk[1]))
+                if ids:
+                    ids.pop()
+                    stats["reused"] += 1
+                    continue
+                yield chunk
+
+        def counted(pages):
+            for page in pages:
+                stats["pages"] += 1
+                yield page
+
+        chunk_stats = ChunkStats()
+        pages = normalize_pages(counted(iter_pages(filename, content)))
+        if is_pdf:
+            # Running headers / footers only exist on real pages, not on text blocks
+            pages = strip_boilerplate(pages, chunk_stats)
+        batches = iter_batches(
+            changed(self.chunker.chunks(pages, chunk_stats)),
+            max_inputs=EMBED_BATCH_INPUTS, max_tokens=EMBED_BATCH_TOKENS
+        )
+
+        # 3. Embed + insert each batch as it is produced; at most EMBED_CONCURRENCY in flight
+        row_template = {
+            "agent_id": agent_id,
+            "user_id": user_id,
+            "filename": filename,
+            "source_url": source_url,
+            "source_type": source_type,
+            "allowed_modes": allowed_modes or [],
+            "embedding_model": model_tag
+        }
+        started = time.perf_counter()
+        first_stored = None
+        stored_ids: List[str] = []
+        pending_snapshot: List[Dict[str, Any]] = []
+        in_flight = set()
+
+        async def flush_snapshot():
+            if pending_snapshot:
+                await self._update_snapshot(index_snapshots.append, agent_id, list(pending_snapshot))
+                pending_snapshot.clear()
+
+        async def collect(done):
+            nonlocal first_stored
+            for task in done:
+                inserted, failures, requests_made, embedded = task.result()
+                stats["insert_requests"] += requests_made
+                stats["embedded"] += embedded
+                stats["failures"].extend(failures)
+                if not inserted:
+                    continue
+                if first_stored is None:
+                    first_stored = time.perf_counter() - started
+                stored_ids.extend(row["id"] for row in inserted)
+                stats["stored"] = len(stored_ids)
+                # float32 keeps the buffered snapshot rows ~8x smaller than float lists
+                pending_snapshot.extend({**row, "embedding": np.asarray(row["embedding"], dtype=np.float32)} for row in inserted)
+            # Atomic ingests only publish to the in-memory index once complete
+            if not atomic and len(pending_snapshot) >= SNAPSHOT_FLUSH_ROWS:
+                await flush_snapshot()
+            if progress:
+                progress(stats)
+
+        exhausted = False
+        try:
+            while True:
+                batch = await asyncio.to_thread(next, batches, None)  # Page parsing stays off the event loop
+                if batch is None:
+                    exhausted = True
+                    break
+                if atomic and stats["failures"]:
+                    break
+                rows = [{**row_template, "content": chunk, "content_hash": content_hash(chunk), "metadata": {"chunk_index": i}}
+                        for i, chunk in batch]
+                in_flight.add(asyncio.create_task(self._embed_and_insert(endpoint, rows)))
+                if progress:
+                    progress(stats)
+                if len(in_flight) >= EMBED_CONCURRENCY:
+                    done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    await collect(done)
+            if in_flight:
+                done, in_flight = await asyncio.wait(in_flight)
+                await collect(done)
+        except asyncio.CancelledError:
+            # Cancelled job: leave the previous version of the document as it was
+            if stored_ids:
+                try:
+                    await self.delete_chunks(stored_ids)
+                    await self._update_snapshot(index_snapshots.remove_ids, agent_id, stored_ids)
+                    _corpus_changed(agent_id)
+                except Exception as e:
+                    print(f"CRITICAL: Cleanup of a cancelled ingest failed, {len(stored_ids)} chunks remain: {e}")
+            raise
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        if atomic and stats["failures"] and stored_ids:
+            # All or nothing: remove the batches already written
             try:
-                import io
-                from pypdf import PdfReader
-                if isinstance(content, str):
-                    # Should be bytes for PDF
-                    raise ValueError("PDF content must be bytes")
-                
-                pdf_file = io.BytesIO(content)
-                reader = PdfReader(pdf_file)
-                text_content = ""
-                for page in reader.pages:
-                    text_content += page.extract_text() + "\n"
+                await self.delete_chunks(stored_ids)
+                stats["failures"].append({"chunk_indices": [row["metadata"]["chunk_index"] for row in pending_snapshot], "error": "rolled back"})
+                stored_ids, pending_snapshot[:] = [], []
             except Exception as e:
-                print(f"PDF extraction failed: {e}")
-                # Fallback or re-raise
-                raise e
-        elif isinstance(content, bytes):
-             # Assume text file
-            try:
-                text_content = content.decode("utf-8")
-            except:
-                # If decode fails, maybe ignore or try latin-1
-                print("Failed to decode text file, skipping.")
-                return 
-        else:
-             text_content = content # Assume str
+                print(f"CRITICAL: Rollback of a partial ingest failed, {len(stored_ids)} chunks remain: {e}")
 
-        # 2. Chunking
-        # Simple chunking for MVP (e.g., by paragraphs or fixed size)
-        chunks = [text_content[i:i+1000] for i in range(0, len(text_content), 1000)]
-        
-        for i, chunk in enumerate(chunks):
-            if not chunk.strip(): 
-                continue
-                
-            embedding = self._get_embedding(chunk)
-            
-            doc_data = {
-                "agent_id": agent_id,
-                "user_id": user_id,
-                "filename": filename,
-                "content": chunk,
-                "embedding": embedding,
-                "metadata": {"chunk_index": i},
-                "source_type": source_type,
-                "allowed_modes": allowed_modes or []
-            }
-            
+        await flush_snapshot()
+
+        # Drop chunks the new version no longer has, only once all of its chunks are stored
+        stale.extend(doc_id for ids in reusable.values() for doc_id in ids)
+        if stale and exhausted and not stats["failures"]:
             try:
-                supabase.table("documents").insert(doc_data).execute()
+                await self.delete_chunks(stale)
+                stats["removed"] = len(stale)
+                await self._update_snapshot(index_snapshots.remove_ids, agent_id, stale)
             except Exception as e:
-                print(f"Failed to insert document chunk: {e}")
-                pass
+                print(f"Failed to remove {len(stale)} stale chunks of {filename}: {e}")
+        if stored_ids or stats["removed"]:
+            _corpus_changed(agent_id)
+
+        seconds = time.perf_counter() - started
+        stats["stored"] = len(stored_ids)
+        stats["failed"] = stats["chunks"] - stats["reused"] - stats["stored"]
+        stats["seconds"] = round(seconds, 3)
+        stats["first_stored_seconds"] = round(first_stored, 3) if first_stored is not None else None
+        stats["chunks_per_second"] = round(stats["stored"] / seconds, 1) if seconds > 0 else 0.0
+        stats["chunking"] = chunk_stats.as_dict()
+        print(f"Ingested {filename}: { {k: v for k, v in stats.items() if k != 'failures'} }")
                 
         # Notify
         try:
             from app.services.notification_service import NotificationService
             NotificationService().create(
                 user_id=user_id,
-                title="Knowledge Ingested",
-                message=f"Document '{filename}' has been processed and indexed.",
-                type="info"
+                title="Knowledge Ingested" if not stats["failed"] else "Knowledge Partially Ingested",
+                message=f"Document '{filename}' has been processed and indexed."
+                        if not stats["failed"] else
+                        f"Document '{filename}': {stats['reused'] + stats['stored']} of {stats['chunks']} chunks indexed.",
+                type="info" if not stats["failed"] else "warning"
             )
         except:
             pass
 
+        return stats
+
     async def delete_document(self, agent_id: str, filename: str):
         """
         Delete all chunks for a given file.
@@ -194,22 +451,25 @@ class RAGService:
         try:
             # Delete where agent_id AND filename match
             supabase.table("documents").delete().eq("agent_id", agent_id).eq("filename", filename).execute()
+            await self._update_snapshot(index_snapshots.remove, agent_id, filename)
+            _corpus_changed(agent_id)
         except Exception as e:
             print(f"Failed to delete document {filename}: {e}")
             raise e
 
-    async def ingest_text(self, agent_id: str, user_id: str, title: str, text: str):
+    async def ingest_text(self, agent_id: str, user_id: str, title: str, text: str, **options):
         """
-        Ingest raw text.
+        Ingest raw text. `options` are passed to `ingest_document`.
         """
-        await self.ingest_document(agent_id, user_id, title, text)
+        return await self.ingest_document(agent_id, user_id, title, text, **options)
 
-    async def ingest_url(self, agent_id: str, user_id: str, url: str):
+    async def ingest_url(self, agent_id: str, user_id: str, url: str, **options):
         """
-        Scrape URL and ingest.
+        Scrape URL and ingest. `options` are passed to `ingest_document`.
         """
+        source_url = self.canonical_url(url)
         try:
-            resp = requests.get(url, timeout=10)
+            resp = await asyncio.to_thread(requests.get, url, timeout=10)
             resp.raise_for_status()
             # Naive HTML text extraction. 
             # In production, use BeautifulSoup or specialized scraper.
@@ -222,7 +482,7 @@ class RAGService:
             if title_match:
                 title = title_match.group(1)
             
-            await self.ingest_document(agent_id, user_id, f"WEB: {title}", text)
+            return await self.ingest_document(agent_id, user_id, f"WEB: {title}", text, source_url=source_url, **options)
         except Exception as e:
             print(f"Failed to scrape URL {url}: {e}")
             raise e
@@ -242,15 +502,18 @@ class RAGService:
             
             # NOTE: This query might return duplicates if we don't handle it.
             # For MVP, fetching all and deduping in python.
-            response = supabase.table("documents").select("filename, created_at, metadata").eq("agent_id", agent_id).execute()
+            response = supabase.table("documents").select("filename, source_url, created_at, metadata").eq("agent_id", agent_id).execute()
             
             unique_docs = {}
             for row in response.data:
                 fname = row.get("filename")
-                if fname not in unique_docs:
-                    unique_docs[fname] = {
+                # Web pages sharing a <title> are still different documents
+                key = row.get("source_url") or fname
+                if key not in unique_docs:
+                    unique_docs[key] = {
                         "id": row.get("id", fname), # ID of first chunk
                         "filename": fname,
+                        "source_url": row.get("source_url"),
                         "created_at": row.get("created_at"),
                         "type": "web" if "WEB:" in fname else "file" 
                     }
@@ -260,11 +523,64 @@ class RAGService:
             print(f"Failed to list documents: {e}")
             return []
 
+    async def _update_snapshot(self, update, agent_id: str, *args):
+        # The on-disk index snapshot is an optimization: never fail an ingest/delete over it
+        try:
+            await asyncio.to_thread(update, agent_id, *args)
+        except Exception as e:
+            print(f"Index snapshot update failed for agent {agent_id}: {e}")
+
+    async def count_chunks(self, agent_id: str) -> Optional[int]:
+        """Number of embedded chunks for an agent (used to validate on-disk snapshots)."""
+        supabase = get_supabase_client()
+        try:
+            query = supabase.table("documents").select("id", count="exact").eq("agent_id", agent_id).not_.is_("embedding", "null").limit(1)
+            response = await asyncio.to_thread(query.execute)
+            return response.count
+        except Exception as e:
+            print(f"Chunk count failed: {e}")
+            return None
+
+    async def iter_corpus(self, agent_id: str, modes: Optional[List[str]] = None, page_size: int = 500) -> AsyncGenerator[List[Dict[str, Any]], None]:
+        """
+        Page through an agent's chunks with their embeddings (for in-memory indexes).
+        Embeddings are float32 arrays (None if missing). Mode filtering matches
+        `match_documents`: chunks without allowed_modes are universal.
+        """
+        supabase = get_supabase_client()
+
+        def fetch(offset: int) -> List[Dict[str, Any]]:
+            # Request and parsing (~10 MB of JSON per 500 rows) both stay off the event loop
+            query = supabase.table("documents").select("id, content, embedding, metadata, filename, allowed_modes").eq("agent_id", agent_id)
+            if modes:
+                query = query.or_(f"allowed_modes.is.null,allowed_modes.ov.{{{','.join(modes)}}}")
+            rows = query.order("id").range(offset, offset + page_size - 1).execute().data or []
+            for row in rows:
+                embedding = row.get("embedding")
+                # pgvector columns come back from PostgREST as '[0.1,0.2,...]'
+                if isinstance(embedding, str):
+                    embedding = json.loads(embedding)
+                row["embedding"] = np.asarray(embedding, dtype=np.float32) if embedding else None
+            return rows
+
+        offset = 0
+        while True:
+            rows = await asyncio.to_thread(fetch, offset)
+            if rows:
+                yield rows
+            if len(rows) < page_size:
+                return
+            offset += page_size
+
     async def query_knowledge(self, agent_id: str, query: str, limit: int = 3) -> str:
         """
         Search for relevant context.
         """
-        embedding = self._get_embedding(query)
+        try:
+            embedding = await self.embed_query(query)
+        except EmbeddingError as e:
+            print(f"Vector search failed: {e}")
+            return ""
         supabase = get_supabase_client()
         
         # Call Supabase RPC function for similarity search
@@ -298,7 +614,35 @@ class RAGService:
         """
         Advanced strict search for AgentRuntime.
         """
-        embedding = self._get_embedding(query)
+        try:
+            embedding = await self.embed_query(query)
+        except EmbeddingError as e:
+            print(f"Strict search failed: {e}")
+            return []
+        return await self.search_by_embedding(embedding, agent_id, filters=filters, threshold=threshold)
+
+    async def embed_query(self, query: str, tracker: Optional[LatencyTracker] = None) -> List[float]:
+        """
+        Query embedding (async, so it can overlap other stages). Raises EmbeddingError.
+        Served from the process-wide embedding cache when the query was seen recently.
+        """
+        endpoint = self._embedding_endpoint()
+        if endpoint is None:
+            raise EmbeddingError("No AI API keys configured for embeddings")
+        if tracker:
+            tracker.mark("embedding_start")
+        embedding = await embedding_cache.get_or_compute(endpoint[2], query, lambda: self.get_embedding(query))
+        if tracker:
+            tracker.mark("embedding_complete")
+        return embedding
+
+    async def search_by_embedding(self, embedding: List[float], agent_id: str, filters: Dict[str, Any] = None, threshold: float = 0.75, tracker: Optional[LatencyTracker] = None,
+                                  coarse_dim: Optional[int] = None) -> List[Any]:
+        """
+        The `match_documents` stage of `search`, for callers that already hold the query embedding.
+        With `coarse_dim`, uses the two-stage `match_documents_truncated` RPC instead
+        (truncated-prefix shortlist, full-vector rescoring; see migration 006).
+        """
         supabase = get_supabase_client()
         
         filter_modes = filters.get("modes") if filters else None
@@ -312,14 +656,19 @@ class RAGService:
         }
         
         try:
-             # Need a generic object to hold results, or simple dict
-             class DocResult:
-                 def __init__(self, id, content, score):
-                     self.id = id
-                     self.content = content
-                     self.score = score
-
-             response = supabase.rpc("match_documents", params).execute()
+             response = None
+             if coarse_dim:
+                 try:
+                     # Same shortlist width as the in-memory two-stage search
+                     shortlist_count = params["match_count"] * CognitiveCache.COARSE_RESCORE_FACTOR
+                     truncated_params = {**params, "coarse_dim": coarse_dim, "shortlist_count": shortlist_count}
+                     response = await asyncio.to_thread(supabase.rpc("match_documents_truncated", truncated_params).execute)
+                 except Exception as e:
+                     print(f"Truncated search failed, using full-dimension search: {e}")
+             if response is None:
+                 response = await asyncio.to_thread(supabase.rpc("match_documents", params).execute)
+             if tracker:
+                 tracker.mark("rpc_complete")
              
              results = []
              if response.data:
@@ -0,0 +1,157 @@
+import asyncio
+import re
+import logging
+from difflib import SequenceMatcher
+from typing import Optional, Dict, List
+from app.services.finops_service import finops_service
+
+logger = logging.getLogger(__name__)
+
+class SpeculativeExecutor:
+    """
+    Runs the pre-LLM stages of a turn on interim STT transcripts.
+    While the user is still speaking, the stable prefix of the interim hypothesis
+    is sent through `AgentRuntime.speculate` (QBD + embedding + retrieval, optionally
+    an LLM draft). When the final transcript arrives, the speculation is committed
+    if it matches closely enough and cancelled otherwise.
+    FinOps: every speculation logs the work it actually issued (speculative=True),
+    whether it is committed, discarded or cancelled mid-flight.
+    """
+    def __init__(self, runtime, meeting_id: str, draft: bool = False,
+                 min_words: int = 4, respeculate_words: int = 3, match_threshold: float = 0.85):
+        self.runtime = runtime
+        self.meeting_id = meeting_id
+        self.draft = draft
+        self.min_words = min_words                  # Don't speculate on very short prefixes
+        self.respeculate_words = respeculate_words  # Prefix growth needed to restart speculation
+        self.match_threshold = match_threshold      # Similarity needed to commit retrieval results
+
+        self._last_interim: List[str] = []
+        self._task: Optional[asyncio.Task] = None
+        self._task_query: str = ""
+        self._task_words = 0
+        self._cost_tasks = set()
+
+        # Stats
+        self.launched = 0
+        self.committed = 0
+        self.discarded = 0
+
+    def observe(self, interim_text: str):
+        """
+        Feed an interim transcript. Starts (or restarts) speculation when the
+        stable prefix has grown enough.
+        """
+        words = interim_text.split()
+        stable = self._stable_prefix(self._last_interim, words)
+        self._last_interim = words
+
+        if len(stable) < self.min_words:
+            return
+        if self._task and len(stable) - self._task_words < self.respeculate_words:
+            return
+
+        self._cancel_task()
+        self._task_query = " ".join(stable)
+        self._task_words = len(stable)
+        self._task = asyncio.create_task(self._run(self._task_query))
+        self.launched += 1
+
+    def resolve(self, final_text: str) -> Optional[asyncio.Task]:
+        """
+        Called with the final transcript; never blocks (it runs in the STT loop).
+        Returns a task yielding the speculation to commit (None if it failed),
+        or None if there was no speculation or it did not match. Await it in the
+        turn task: with `draft` it may still be waiting on the LLM. Cancelling
+        it cancels the speculation.
+        """
+        task, query = self._task, self._task_query
+        self._task = None
+        self._task_query = ""
+        self._task_words = 0
+        self._last_interim = []
+
+        if task is None:
+            return None
+
+        similarity = self._similarity(query, final_text)
+        if similarity < self.match_threshold:
+            task.cancel()
+            self.discarded += 1
+            logger.info(f"Speculation discarded ({similarity:.2f}): '{query}' vs '{final_text}'")
+            return None
+
+        commit = asyncio.create_task(self._commit(task, query, final_text, similarity))
+        commit.add_done_callback(lambda t: self._abandon(task) if t.cancelled() else None)
+        return commit
+
+    async def _commit(self, task: asyncio.Task, query: str, final_text: str, similarity: float) -> Optional[Dict]:
+        try:
+            speculation = await task
+        except asyncio.CancelledError:
+            raise  # Turn superseded: counted by _abandon
+        except Exception as e:
+            logger.error(f"Speculation failed: {e}")
+            self.discarded += 1
+            return None
+
+        # An LLM draft is only valid for the exact question
+        if speculation.get("draft") and self._normalize(query) != self._normalize(final_text):
+            speculation = {**speculation, "draft": None}
+
+        self.committed += 1
+        logger.info(f"Speculation committed ({similarity:.2f}) for '{final_text}'")
+        return speculation
+
+    def cancel(self):
+        self._cancel_task()
+        self._last_interim = []
+
+    def _abandon(self, task: asyncio.Task):
+        """The turn waiting on `task` was cancelled (possibly before the commit even started)."""
+        task.cancel()
+        self.discarded += 1
+
+    def _cancel_task(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            self.discarded += 1
+        self._task = None
+
+    async def _run(self, query: str) -> Dict:
+        usage: Dict[str, float] = {}
+        try:
+            return await self.runtime.speculate(query, draft=self.draft, usage=usage)
+        finally:
+            # Also on cancel: the issued requests are billed whether or not the speculation is used
+            cost_task = asyncio.create_task(self._log_costs(usage))
+            self._cost_tasks.add(cost_task)
+            cost_task.add_done_callback(self._cost_tasks.discard)
+
+    async def _log_costs(self, usage: Dict[str, float]):
+        """`usage`: token estimates recorded by AgentRuntime.speculate as each request is issued."""
+        try:
+            for resource_type, key in (("EMBEDDING_TOKEN", "embedding_tokens"),
+                                       ("LLM_TOKEN_INPUT", "llm_input_tokens"),
+                                       ("LLM_TOKEN_OUTPUT", "llm_output_tokens")):
+                if usage.get(key):
+                    await finops_service.log_cost(self.meeting_id, resource_type, usage[key], "OpenAI", speculative=True)
+        except Exception as e:
+            logger.error(f"Speculative FinOps Log Error: {e}")
+
+    @staticmethod
+    def _stable_prefix(previous: List[str], current: List[str]) -> List[str]:
+        """Words that did not change between two consecutive interim hypotheses."""
+        prefix = []
+        for a, b in zip(previous, current):
+            if a.lower() != b.lower():
+                break
+            prefix.append(b)
+        return prefix
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(re.sub(r"[^\w\s]", "", text.lower()).split())
+
+    def _similarity(self, speculative: str, final: str) -> float:
+        return SequenceMatcher(None, self._normalize(speculative), self._normalize(final)).ratio()
@@ -2,7 +2,7 @@ import os
 import json
 import asyncio
 from typing import AsyncGenerator
-from .base import STTService
+from .base import STTService, TranscriptEvent
 # In production, use deepgram-sdk. For scaffold, using raw websockets to demonstrate logic.
 import websockets
 import ssl
@@ -14,6 +14,12 @@ class DeepgramSTTService(STTService):
         self.base_url = "wss://api.deepgram.com/v1/listen?encoding=linear16&sample_rate=16000&channels=1&smart_format=true&interim_results=true"
 
     async def transcribe_stream(self, audio_chunk_iterator: AsyncGenerator[bytes, None]) -> AsyncGenerator[str, None]:
+        async for event in self.transcribe_events(audio_chunk_iterator):
+            # Only yield if it's final or long enough interim
+            if event.text and (event.is_final or len(event.text) > 10):
+                yield event.text
+
+    async def transcribe_events(self, audio_chunk_iterator: AsyncGenerator[bytes, None]) -> AsyncGenerator[TranscriptEvent, None]:
         if not self.api_key:
             # Mock STT Mode for testing without Deepgram
             print("WARNING: Deepgram API Key missing. Using Mock STT loop.")
@@ -23,13 +29,14 @@ class DeepgramSTTService(STTService):
             async for chunk in audio_chunk_iterator:
                 if time.time() - last_transcript > 5.0 and len(chunk) > 0:
                      # Simulate hearing something
-                     yield "Hello, can you hear me?"
+                     yield TranscriptEvent(text="Hello, can you hear me?", is_final=True)
                      last_transcript = time.time()
             return
 
         # Changed to auto-detect (Opus/WebM from browser)
         # We assume the browser sends 'audio/webm' or 'audio/ogg' container which Deepgram detects.
-        self.base_url = "wss://api.deepgram.com/v1/listen?smart_format=true&interim_results=true&model=nova-2"
+        # utterance_end_ms: UtteranceEnd closes utterances whose last segment had no speech_final (noisy audio)
+        self.base_url = "wss://api.deepgram.com/v1/listen?smart_format=true&interim_results=true&model=nova-2&utterance_end_ms=1000"
 
         try:
             ssl_context = ssl.create_default_context(cafile=certifi.where())
@@ -53,14 +60,18 @@ class DeepgramSTTService(STTService):
                     async for msg in ws:
                         try:
                             data = json.loads(msg)
-                            if 'channel' in data:
+                            if data.get("type") == "UtteranceEnd":
+                                yield TranscriptEvent(text="", is_final=True, speech_final=True)
+                            elif 'channel' in data:
                                 alternatives = data['channel']['alternatives']
-                                if alternatives and alternatives[0]['transcript']:
-                                    transcript = alternatives[0]['transcript']
-                                    is_final = data.get("is_final", False)
-                                    # Only yield if it's final or long enough interim
-                                    if is_final or len(transcript) > 10: 
-                                        yield transcript
+                                text = alternatives[0]['transcript'] if alternatives else ""
+                                # An empty speech_final result still ends the utterance
+                                if text or data.get("speech_final"):
+                                    yield TranscriptEvent(
+                                        text=text,
+                                        is_final=data.get("is_final", False),
+                                        speech_final=data.get("speech_final", False)
+                                    )
                         except Exception as e:
                             print(f"STT Receiver Error: {e}")
 
@@ -68,10 +79,10 @@ class DeepgramSTTService(STTService):
                 send_task = asyncio.create_task(sender())
                 
                 try:
-                    async for transcript in receiver():
-                        yield transcript
+                    async for event in receiver():
+                        yield event
                 finally:
                     send_task.cancel()
         except Exception as e:
             print(f"Deepgram Connection Failed: {e}")
-            yield "[System: STT Connection Failed]"
+            yield TranscriptEvent(text="[System: STT Connection Failed]", is_final=True)
@@ -1,19 +1,52 @@
 import os
 import json
 import asyncio
-from typing import AsyncGenerator
+from typing import AsyncGenerator, Dict, List, Optional, Tuple
 import aiohttp
 import ssl
 import certifi
 from .base import TTSService
+from .latency_tracker import LatencyTracker
 from ...services.finops_service import finops_service
 
+class SpeechProgress:
+    """
+    Maps synthesized audio back to text: records the byte offset at which each
+    sentence's audio starts, so the caller can tell how much of an answer was
+    actually delivered when playback is cut off.
+    """
+    def __init__(self):
+        self.segments: List[Tuple[str, int]] = []  # (sentence, first byte offset)
+        self.bytes_out = 0
+
+    def spoken_text(self, bytes_delivered: int) -> str:
+        """Text covered by the first `bytes_delivered` bytes (last sentence pro-rata)."""
+        spoken = []
+        for i, (text, start) in enumerate(self.segments):
+            end = self.segments[i + 1][1] if i + 1 < len(self.segments) else self.bytes_out
+            if bytes_delivered >= end:
+                spoken.append(text)
+            elif bytes_delivered > start:
+                fraction = (bytes_delivered - start) / max(1, end - start)
+                spoken.append(text[:int(len(text) * fraction)])
+                break
+            else:
+                break
+        return "".join(spoken)
+
 class ElevenLabsTTSService(TTSService):
     def __init__(self):
         self.api_key = os.getenv("ELEVENLABS_API_KEY")
         self.base_url = "https://api.elevenlabs.io/v1/text-to-speech/{voice_id}/stream"
 
-    async def speak_stream(self, text_stream: AsyncGenerator[str, None], voice_id: str, output_format: str = "mp3_44100_128") -> AsyncGenerator[bytes, None]:
+    async def speak_stream(self, text_stream: AsyncGenerator[str, None], voice_id: str, output_format: str = "mp3_44100_128",
+                           tracker: Optional[LatencyTracker] = None, progress: Optional[SpeechProgress] = None,
+                           session_id: str = "session_123") -> AsyncGenerator[bytes, None]:
+        """
+        Sentence-chunked streaming synthesis.
+        Closing this generator (barge-in) aborts the in-flight HTTP response and
+        stops further requests; only characters actually sent to ElevenLabs are billed.
+        """
         if not self.api_key:
             print("ElevenLabs API Key Missing")
             return
@@ -42,22 +75,48 @@ class ElevenLabsTTSService(TTSService):
                         "voice_settings": {"stability": 0.5, "similarity_boost": 0.5}
                     }
                     print(f"TTS: Requesting speech ({output_format}) for: {current_sentence[:50]}...")
-                    async with session.post(url, json=payload, headers=headers) as resp:
-                        if resp.status != 200:
-                            print(f"TTS ERROR: ElevenLabs returned {resp.status}: {await resp.text()}")
-                        async for chunk in resp.content.iter_any():
-                            yield chunk
-                    
-                    # FinOps Log
-                    try:
-                        await finops_service.log_cost("session_123", "TTS_CHAR", len(current_sentence), "ElevenLabs")
-                    except Exception as e:
-                        print(f"TTS FinOps Log Error: {e}")
+                    async for chunk in self._synthesize(session, url, headers, payload, tracker, progress, session_id):
+                        yield chunk
                     current_sentence = ""
             
             # Flush remainder
             if current_sentence:
                 payload = { "text": current_sentence, "model_id": "eleven_turbo_v2" }
-                async with session.post(url, json=payload, headers=headers) as resp:
+                async for chunk in self._synthesize(session, url, headers, payload, tracker, progress, session_id):
+                    yield chunk
+
+    async def _synthesize(self, session: aiohttp.ClientSession, url: str, headers: Dict, payload: Dict,
+                          tracker: Optional[LatencyTracker], progress: Optional[SpeechProgress], session_id: str) -> AsyncGenerator[bytes, None]:
+        if tracker:
+            tracker.mark("tts_request_start", once=True)
+        if progress:
+            progress.segments.append((payload["text"], progress.bytes_out))
+
+        started = completed = False
+        try:
+            async with session.post(url, json=payload, headers=headers) as resp:
+                started = True
+                try:
+                    if resp.status != 200:
+                        # The body is an error payload, not audio: never play (or cache) it
+                        print(f"TTS ERROR: ElevenLabs returned {resp.status}: {await resp.text()}")
+                        completed = True
+                        return
                     async for chunk in resp.content.iter_any():
-                         yield chunk
+                        if tracker:
+                            tracker.mark("tts_first_byte", once=True)
+                        if progress:
+                            progress.bytes_out += len(chunk)
+                        yield chunk
+                    completed = True
+                finally:
+                    if not completed:
+                        # Barge-in: drop the connection instead of draining the rest of the audio
+                        resp.close()
+        finally:
+            # FinOps Log: a started request is billed for its full text
+            if started:
+                try:
+                    await finops_service.log_cost(session_id, "TTS_CHAR", len(payload["text"]), "ElevenLabs")
+                except Exception as e:
+                    print(f"TTS FinOps Log Error: {e}")
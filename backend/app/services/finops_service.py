@@ -1,4 +1,5 @@
 from app.db.supabase import get_supabase_service_client
+from app.services.write_behind import write_behind
 from typing import Optional
 
 class FinOpsService:
@@ -9,6 +10,7 @@ class FinOpsService:
     # Pricing Rates (Approximate)
     RATES = {
         "gpt-4-1106-preview": {"input": 10/1000000, "output": 30/1000000}, # $10/$30 per 1M tokens
+        "text-embedding-3-small": 0.02/1000000, # $0.02 per 1M tokens
         "eleven_turbo_v2": 0.30 / 1000, # $0.30 per 1000 chars
         "nova-2": 0.0043 / 60 # $0.0043 per minute (Deepgram)
     }
@@ -18,10 +20,11 @@ class FinOpsService:
     def __init__(self):
         self.supabase = get_supabase_service_client()
 
-    async def log_cost(self, session_id: str, resource_type: str, quantity: float, provider: str, user_id: str = None):
+    async def log_cost(self, session_id: str, resource_type: str, quantity: float, provider: str, user_id: str = None, speculative: bool = False):
         """
         Record a spend event.
         Calculates USD cost based on hardcoded rates (should be DB backed in prod).
+        `speculative` marks work done ahead of a final transcript (see SpeculativeExecutor).
         """
         cost_usd = 0.0
         
@@ -29,6 +32,8 @@ class FinOpsService:
              cost_usd = quantity * self.RATES["gpt-4-1106-preview"]["input"]
         elif resource_type == "LLM_TOKEN_OUTPUT":
              cost_usd = quantity * self.RATES["gpt-4-1106-preview"]["output"]
+        elif resource_type == "EMBEDDING_TOKEN":
+             cost_usd = quantity * self.RATES["text-embedding-3-small"]
         elif resource_type == "TTS_CHAR":
              cost_usd = quantity * self.RATES["eleven_turbo_v2"]
         elif resource_type == "STT_SEC":
@@ -42,13 +47,12 @@ class FinOpsService:
             "resource_type": resource_type,
             "quantity": quantity,
             "cost_usd": cost_usd,
-            "provider": provider
+            "provider": provider,
+            "speculative": speculative
         }
         
-        try:
-            self.supabase.table("cost_ledger").insert(data).execute()
-        except Exception as e:
-            print(f"[FinOps] Failed to log cost: {e}")
+        # Write-behind: cost events are emitted from inside the TTS/LLM streams
+        write_behind.enqueue("cost_ledger", data)
 
     async def check_budget(self, session_id: str) -> bool:
         """
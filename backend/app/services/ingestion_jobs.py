@@ -0,0 +1,318 @@
+import time
+import uuid
+import asyncio
+import datetime
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+from app.db.supabase import get_supabase_service_client
+
+logger = logging.getLogger(__name__)
+
+# progress callback -> ingestion stats
+IngestRunner = Callable[[Callable[[Dict[str, Any]], None]], Awaitable[Dict[str, Any]]]
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+PARTIAL = "partial"  # Finished, but some chunks failed to store
+FINISHED = (SUCCEEDED, PARTIAL, FAILED, CANCELLED)
+
+# Ingestion stats surfaced as job progress
+PROGRESS_KEYS = ("pages", "chunks", "reused", "embedded", "stored", "failed")
+
+class QueueFull(Exception):
+    """More than `max_pending` jobs, or `max_pending_bytes` of uploaded content, are waiting."""
+
+class IngestionJob:
+    def __init__(self, agent_id: str, user_id: str, kind: str, source: str, run: IngestRunner, size: int = 0):
+        self.id = str(uuid.uuid4())
+        self.agent_id = agent_id
+        self.user_id = user_id
+        self.kind = kind          # "file" | "text" | "url"
+        self.source = source      # Filename, title or URL
+        self.size = size          # Bytes of content held in memory until the job finishes
+        self.status = QUEUED
+        self.progress: Dict[str, int] = {key: 0 for key in PROGRESS_KEYS}
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        self.finished_at: Optional[str] = None
+        self._run = run
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        """Jobs with the same key write the same document and must not run concurrently."""
+        return (self.agent_id, self.source)
+
+    def as_row(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "agent_id": self.agent_id,
+            "user_id": self.user_id,
+            "kind": self.kind,
+            "source": self.source,
+            "status": self.status,
+            "progress": self.progress,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+class IngestionJobQueue:
+    """
+    In-process background ingestion: upload endpoints enqueue a job and return
+    202 with its id; `max_workers` workers run jobs in FIFO order.
+    Job state is kept in memory and persisted to `ingestion_jobs` on every status
+    change and at most every `persist_interval` seconds of progress, so status
+    survives across workers and restarts. Uploaded content only lives in memory,
+    at most `max_pending_bytes` of it across unfinished jobs, and is released
+    as soon as a job finishes:
+    jobs still queued or running when a process stops are marked failed, and on
+    startup persisted jobs without an update for `orphan_after` seconds are too.
+    Jobs for the same document (agent, source) run one at a time in submit order:
+    concurrent ingests would each delete the other's chunks as stale.
+    """
+    def __init__(self, max_workers: int = 2, max_pending: int = 100, max_pending_bytes: int = 256 * 1024 * 1024,
+                 persist_interval: float = 1.0, finished_ttl: float = 3600.0, orphan_after: float = 600.0):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_pending_bytes = max_pending_bytes
+        self.persist_interval = persist_interval
+        self.finished_ttl = finished_ttl
+        self.orphan_after = orphan_after
+        # One writer thread keeps a job's persisted updates in order
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ingestion-jobs")
+
+        self._jobs: Dict[str, IngestionJob] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[Tuple[str, str], IngestionJob] = {}
+        self._deferred: Dict[Tuple[str, str], Deque[IngestionJob]] = {}
+        self._pending_bytes = 0  # Content size of unfinished jobs
+
+        # Stats
+        self.succeeded = 0
+        self.partial = 0
+        self.failed = 0
+        self.cancelled = 0
+
+    def submit(self, agent_id: str, user_id: str, kind: str, source: str, run: IngestRunner,
+               size: int = 0) -> IngestionJob:
+        """
+        Queue `run(progress)`; `size` is the content bytes `run` holds on to.
+        Raises QueueFull when `max_pending` jobs are waiting or the content would
+        push unfinished jobs past `max_pending_bytes` (a lone oversized upload is
+        still accepted when nothing else is held).
+        """
+        self._ensure_workers()
+        if self._pending() >= self.max_pending:
+            raise QueueFull(f"{self._pending()} ingestion jobs pending")
+        if self._pending_bytes and self._pending_bytes + size > self.max_pending_bytes:
+            raise QueueFull(f"{self._pending_bytes} bytes of ingestion content pending")
+        job = IngestionJob(agent_id, user_id, kind, source, run, size)
+        self._jobs[job.id] = job
+        self._pending_bytes += size
+        self._queue.put_nowait(job)
+        self._persist(job)
+        self._expire_finished()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Job state: live for this process's jobs, else the persisted row."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.as_row()
+        try:
+            response = await asyncio.to_thread(
+                get_supabase_service_client().table("ingestion_jobs").select("*").eq("id", job_id).limit(1).execute
+            )
+            return response.data[0] if response.data else None
+        except Exception as e:
+            logger.error(f"IngestionJobs: lookup of job {job_id} failed: {e}")
+            return None
+
+    async def list_jobs(self, agent_id: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs of an agent (persisted rows)."""
+        try:
+            response = await asyncio.to_thread(
+                get_supabase_service_client().table("ingestion_jobs").select("*").eq("agent_id", agent_id)
+                .order("created_at", desc=True).limit(limit).execute
+            )
+            rows = {row["id"]: row for row in response.data or []}
+        except Exception as e:
+            logger.error(f"IngestionJobs: listing jobs of agent {agent_id} failed: {e}")
+            rows = {}
+        # Live state wins over the (throttled) persisted progress
+        rows.update({job.id: job.as_row() for job in self._jobs.values() if job.agent_id == agent_id})
+        return sorted(rows.values(), key=lambda row: row["created_at"], reverse=True)[:limit]
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a queued or running job of this process. False if unknown or already finished."""
+        job = self._jobs.get(job_id)
+        if job is None or job.status in FINISHED:
+            return False
+        if job._task is not None:
+            job._task.cancel()  # The worker records the cancellation
+        else:
+            self._finish(job, CANCELLED)  # Skipped when a worker dequeues it
+        return True
+
+    def start(self):
+        self._ensure_workers()
+        asyncio.get_running_loop().create_task(self._fail_orphans())
+
+    async def stop(self):
+        """Shutdown: running jobs are cancelled (their stored chunks are removed), queued ones fail."""
+        running = [job._task for job in self._jobs.values() if job._task is not None]
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self._jobs.values():
+            if job.status not in FINISHED:
+                self._finish(job, FAILED, error="Server shut down before the job finished")
+        await asyncio.to_thread(self._writer.shutdown, wait=True)
+
+    def _ensure_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        self._workers = [worker for worker in self._workers if not worker.done()]
+        while len(self._workers) < self.max_workers:
+            self._workers.append(asyncio.create_task(self._work()))
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            if job.status != QUEUED:
+                # Cancelled while queued; if it had been waiting its turn, hand the turn on
+                if job.key not in self._running:
+                    self._release(job.key)
+                continue
+            if job.key in self._running:
+                self._deferred.setdefault(job.key, deque()).append(job)
+                continue
+            self._running[job.key] = job
+            job.status = RUNNING
+            self._persist(job)
+            last_persist = time.monotonic()
+
+            def on_progress(stats: Dict[str, Any]):
+                nonlocal last_persist
+                job.progress = {key: stats.get(key, 0) for key in PROGRESS_KEYS}
+                if time.monotonic() - last_persist >= self.persist_interval:
+                    last_persist = time.monotonic()
+                    self._persist(job)
+
+            # Own task per job, so cancelling a job does not take the worker down with it
+            job._task = asyncio.create_task(job._run(on_progress))
+            try:
+                result = await asyncio.shield(job._task)
+                job.result = result
+                job.progress = {key: result.get(key, 0) for key in PROGRESS_KEYS}
+                failed = result.get("failed", 0)
+                if not failed:
+                    self._finish(job, SUCCEEDED)
+                elif failed < result.get("chunks", 0):
+                    # The stored chunks are searchable: report what made it instead of failing the job
+                    self._finish(job, PARTIAL, error=f"{failed} of {result['chunks']} chunks failed, "
+                                                     f"{result.get('stored', 0)} stored")
+                else:
+                    self._finish(job, FAILED, error=f"All {failed} chunks failed")
+            except asyncio.CancelledError:
+                if not job._task.cancelled():
+                    job._task.cancel()  # The worker itself is being stopped
+                    raise
+                self._finish(job, CANCELLED)
+            except Exception as e:
+                logger.error(f"IngestionJobs: job {job.id} ({job.source}) failed: {e}")
+                self._finish(job, FAILED, error=str(e))
+            finally:
+                job._task = None
+                self._release(job.key)
+
+    def _release(self, key: Tuple[str, str]):
+        """`key` is free again: requeue the next job deferred behind it."""
+        self._running.pop(key, None)
+        waiting = self._deferred.get(key)
+        while waiting:
+            job = waiting.popleft()
+            if job.status == QUEUED:
+                self._queue.put_nowait(job)
+                break
+        if not waiting:
+            self._deferred.pop(key, None)
+
+    def _pending(self) -> int:
+        queued = self._queue.qsize() if self._queue else 0
+        return queued + sum(len(waiting) for waiting in self._deferred.values())
+
+    def _finish(self, job: IngestionJob, status: str, error: Optional[str] = None):
+        job.status = status
+        job.error = error
+        job.finished_at = datetime.datetime.now(datetime.timezone.utc).isoformat()
+        # Drop the runner (and the content it closes over) now, not when the job expires
+        job._run = None
+        self._pending_bytes -= job.size
+        if status == SUCCEEDED:
+            self.succeeded += 1
+        elif status == PARTIAL:
+            self.partial += 1
+        elif status == FAILED:
+            self.failed += 1
+        else:
+            self.cancelled += 1
+        self._persist(job)
+
+    def _persist(self, job: IngestionJob):
+        # Fire-and-forget: status storage never fails or delays an ingest
+        row = {**job.as_row(), "updated_at": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+        try:
+            self._writer.submit(self._write, row)
+        except RuntimeError:
+            pass  # Writer shut down
+
+    @staticmethod
+    def _write(row: Dict[str, Any]):
+        try:
+            get_supabase_service_client().table("ingestion_jobs").upsert(row).execute()
+        except Exception as e:
+            logger.error(f"IngestionJobs: persisting job {row['id']} failed: {e}")
+
+    async def _fail_orphans(self):
+        """
+        Jobs a crashed process left queued/running can't resume: their content is gone.
+        Only stale rows are touched, so other live processes' jobs are left alone.
+        """
+        now = datetime.datetime.now(datetime.timezone.utc)
+        try:
+            query = get_supabase_service_client().table("ingestion_jobs") \
+                .update({"status": FAILED, "error": "Interrupted by a server restart", "finished_at": now.isoformat()}) \
+                .in_("status", [QUEUED, RUNNING]) \
+                .lt("updated_at", (now - datetime.timedelta(seconds=self.orphan_after)).isoformat())
+            await asyncio.to_thread(query.execute)
+        except Exception as e:
+            logger.error(f"IngestionJobs: marking interrupted jobs failed: {e}")
+
+    def _expire_finished(self):
+        cutoff = (datetime.datetime.now(datetime.timezone.utc) - datetime.timedelta(seconds=self.finished_ttl)).isoformat()
+        for job_id, job in list(self._jobs.items()):
+            if job.status in FINISHED and job.finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "pending": self._pending(),
+            "pending_bytes": self._pending_bytes,
+            "running": sum(job.status == RUNNING for job in self._jobs.values()),
+            "succeeded": self.succeeded,
+            "partial": self.partial,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+        }
+
+ingestion_jobs = IngestionJobQueue()
@@ -1,4 +1,5 @@
 from app.db.supabase import get_supabase_service_client
+from app.services.write_behind import write_behind
 
 class NotificationService:
     def __init__(self):
@@ -16,7 +17,7 @@ class NotificationService:
                 "type": type,
                 "read": False
             }
-            # Fire and forget mostly, but we raise if catastrophic
-            self.supabase.table("notifications").insert(data).execute()
+            # Fire and forget: batched by the write-behind queue
+            write_behind.enqueue("notifications", data)
         except Exception as e:
             print(f"Failed to create notification: {e}")
@@ -48,6 +48,7 @@ class AIOrchestratorAudioTrack(MediaStreamTrack):
         # 2. Return 20ms of audio
         frame = self.fifo.read(960)
         if frame:
+            self.orchestrator.mark_audio_sent()
             frame.pts = self.pts
             frame.time_base = fractions.Fraction(1, 48000)
             self.pts += 960
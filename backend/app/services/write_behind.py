@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional, Tuple
+from app.db.supabase import get_supabase_service_client
+
+logger = logging.getLogger(__name__)
+
+class WriteBehindQueue:
+    """
+    Per-process write-behind buffer for fire-and-forget inserts
+    (transcripts, audit logs, notifications, cost ledger).
+    Callers enqueue rows without blocking; a background worker batches them
+    into multi-row inserts per table, flushes on size or time, retries with
+    backoff and drains on shutdown.
+    """
+
+    # Rows are stamped at enqueue time so batching does not reorder them
+    TIMESTAMP_COLUMNS = {
+        "meeting_transcripts": "timestamp",
+        "agent_audit_logs": "created_at",
+        "notifications": "created_at",
+        "cost_ledger": "created_at",
+        "turn_latency_reports": "created_at",
+    }
+
+    def __init__(self, max_batch_rows: int = 100, flush_interval: float = 0.5,
+                 max_queue_rows: int = 10000, max_retries: int = 4, retry_backoff: float = 0.5):
+        self.max_batch_rows = max_batch_rows
+        self.flush_interval = flush_interval
+        self.max_queue_rows = max_queue_rows
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Stats
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.batches_written = 0
+
+    def enqueue(self, table: str, rows):
+        """
+        Schedule one row (dict) or several rows (list of dicts) for insertion.
+        Never blocks. Outside an event loop the insert is done inline.
+        """
+        if isinstance(rows, dict):
+            rows = [rows]
+
+        stamp_column = self.TIMESTAMP_COLUMNS.get(table)
+        if stamp_column:
+            now = datetime.datetime.now(datetime.timezone.utc).isoformat()
+            rows = [{stamp_column: now, **row} for row in rows]
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            self._insert(table, rows)
+            return
+
+        if self._closing:
+            logger.warning(f"WriteBehind: queue closing, writing {table} inline")
+            self._insert(table, rows)
+            return
+
+        self._ensure_worker()
+        for row in rows:
+            try:
+                self._queue.put_nowait((table, row))
+            except asyncio.QueueFull:
+                self.rows_dropped += 1
+                logger.error(f"WriteBehind: queue full, dropped row for {table}")
+
+    def start(self):
+        self._closing = False
+        self._ensure_worker()
+
+    async def drain(self, timeout: float = 10.0):
+        """
+        Flush everything still queued and stop the worker. Called on shutdown.
+        """
+        if not self._worker:
+            return
+        self._closing = True
+        try:
+            await asyncio.wait_for(self._queue.put(None), timeout=timeout)  # Sentinel: flush and exit
+            await asyncio.wait_for(self._worker, timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"WriteBehind: drain timed out with {self._queue.qsize()} rows pending")
+            self._worker.cancel()
+        self._worker = None
+
+    def _ensure_worker(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_rows)
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            stop = False
+
+            # Collect until the batch is full or the flush interval elapses
+            while len(batch) < self.max_batch_rows:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+            if stop:
+                # Drain whatever arrived after the sentinel
+                leftovers = []
+                while not self._queue.empty():
+                    item = self._queue.get_nowait()
+                    if item is not None:
+                        leftovers.append(item)
+                if leftovers:
+                    await self._flush(leftovers)
+                return
+
+    async def _flush(self, batch: List[Tuple[str, Dict]]):
+        # PostgREST bulk inserts need a uniform column set, so group by (table, columns)
+        groups: Dict[Tuple[str, frozenset], List[Dict]] = {}
+        for table, row in batch:
+            groups.setdefault((table, frozenset(row.keys())), []).append(row)
+
+        for (table, _), rows in groups.items():
+            await self._write_group(table, rows)
+
+    async def _write_group(self, table: str, rows: List[Dict]):
+        """
+        One multi-row insert. Transient errors are retried with backoff; a permanent
+        one (constraint, type or FK violation) bisects the group so only the bad
+        rows are dropped instead of every meeting's rows batched with them.
+        """
+        for attempt in range(self.max_retries + 1):
+            try:
+                await asyncio.to_thread(self._insert_or_raise, table, rows)
+                self.rows_written += len(rows)
+                self.batches_written += 1
+                return
+            except Exception as e:
+                if not self._is_transient(e):
+                    if len(rows) > 1:
+                        middle = len(rows) // 2
+                        await self._write_group(table, rows[:middle])
+                        await self._write_group(table, rows[middle:])
+                    else:
+                        self.rows_dropped += 1
+                        logger.error(f"WriteBehind: dropped row for {table}: {e} ({rows[0]})")
+                    return
+                if attempt == self.max_retries:
+                    self.rows_dropped += len(rows)
+                    logger.error(f"WriteBehind: giving up on {len(rows)} rows for {table}: {e}")
+                    return
+                delay = self.retry_backoff * (2 ** attempt)
+                logger.warning(f"WriteBehind: insert into {table} failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    @staticmethod
+    def _is_transient(error: Exception) -> bool:
+        """Network errors, timeouts, 429/5xx and retryable Postgres errors; not bad data."""
+        code = str(getattr(error, "code", None) or "")
+        if code.isdigit() and len(code) == 3:
+            return int(code) >= 500 or int(code) == 429  # HTTP status
+        if code:
+            # SQLSTATE classes: connection (08), rollback/deadlock (40),
+            # insufficient resources (53), operator intervention (57)
+            return code[:2] in ("08", "40", "53", "57")
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        if status is not None:
+            return status >= 500 or status == 429
+        return True
+
+    def _insert_or_raise(self, table: str, rows: List[Dict]):
+        get_supabase_service_client().table(table).insert(rows).execute()
+
+    def _insert(self, table: str, rows: List[Dict]):
+        try:
+            self._insert_or_raise(table, rows)
+            self.rows_written += len(rows)
+        except Exception as e:
+            self.rows_dropped += len(rows)
+            logger.error(f"WriteBehind: inline insert into {table} failed: {e}")
+
+write_behind = WriteBehindQueue()
@@ -0,0 +1,151 @@
+import sys
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from app.services.ai.cognitive_cache import CognitiveCache
+
+# Recall / latency harness: IVF candidate search vs exact CognitiveCache search (ground truth).
+# Usage:
+#   python bench_ann_recall.py [--sizes 10000 50000] [--nprobe 4 8 16 32]
+#   python bench_ann_recall.py --snapshot $INDEX_CACHE_DIR/<agent_id>/<generation>
+#   python bench_ann_recall.py --storage float16 int8 [--no-rescore]
+#   python bench_ann_recall.py --coarse-dim 256 512 [--storage int8]
+#
+# --storage / --coarse-dim compare variants of the exact scan (opened from a saved
+# snapshot, so rescoring reads the float32 mmap) against full-dimension float32
+# search instead of sweeping nprobe. --coarse-dim is the two-stage search over
+# truncated prefixes; synthetic corpora then get a decaying per-dimension spectrum
+# (see --decay) so that, as with Matryoshka embeddings, leading dimensions carry the most signal.
+#
+# Synthetic corpora are clustered (chunks of one document share a topic direction),
+# with queries drawn near a topic. The default spreads put the top hits around the
+# 0.75 runtime threshold; raise them for a harder, less clustered corpus.
+
+def unit(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+def spectrum(dim, decay):
+    """Per-dimension scale (d + 1) ** -decay; decay 0 = isotropic."""
+    return (np.arange(1, dim + 1, dtype=np.float32) ** -decay)
+
+def synthetic_corpus(rng, n, dim, chunks_per_topic=40, spread=0.5, decay=0.0):
+    weights = spectrum(dim, decay)
+    topics = unit(rng.standard_normal((max(1, n // chunks_per_topic), dim)).astype(np.float32) * weights)
+    labels = rng.integers(0, len(topics), n)
+    noise = unit(rng.standard_normal((n, dim)).astype(np.float32) * weights)
+    return unit(topics[labels] + spread * noise), topics
+
+def synthetic_queries(rng, topics, count, spread=0.4, decay=0.0):
+    picked = topics[rng.integers(0, len(topics), count)]
+    noise = unit(rng.standard_normal(picked.shape).astype(np.float32) * spectrum(topics.shape[1], decay))
+    return unit(picked + spread * noise)
+
+def build(vectors, index, nprobe=None):
+    cache = CognitiveCache(index=index, nprobe=nprobe)
+    for i, v in enumerate(vectors):
+        cache.add_document(str(i), "", v, {})
+    cache.freeze()
+    return cache
+
+def open_snapshot(exact, **options):
+    path = tempfile.mkdtemp(prefix="bench-variant-")
+    exact.save(path)
+    return CognitiveCache.open(path, index="exact", **options)
+
+def evaluate(exact, ann, queries, k, threshold):
+    truth, found, truth_t, found_t = 0, 0, 0, 0
+    exact_ms = ann_ms = 0.0
+    for q in queries:
+        start = time.perf_counter()
+        expected = exact.search(q, limit=k, threshold=-1.0)
+        exact_ms += time.perf_counter() - start
+        start = time.perf_counter()
+        got = ann.search(q, limit=k, threshold=-1.0)
+        ann_ms += time.perf_counter() - start
+
+        got_ids = {r.id for r in got}
+        truth += len(expected)
+        found += sum(r.id in got_ids for r in expected)
+        # Recall restricted to hits that would pass the runtime threshold
+        above = [r for r in expected if r.score >= threshold]
+        truth_t += len(above)
+        found_t += sum(r.id in got_ids for r in above)
+
+    n = len(queries)
+    return {
+        "recall": found / truth if truth else 1.0,
+        "recall_at_threshold": found_t / truth_t if truth_t else float("nan"),
+        "exact_ms": exact_ms * 1000 / n,
+        "ann_ms": ann_ms * 1000 / n,
+    }
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 50000])
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[2, 4, 8, 16, 32])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.75)
+    parser.add_argument("--spread", type=float, default=0.5, help="Chunk noise around its topic (higher = harder)")
+    parser.add_argument("--query-spread", type=float, default=0.4)
+    parser.add_argument("--snapshot", help="Evaluate on a real agent snapshot directory instead")
+    parser.add_argument("--storage", nargs="+", choices=["float32", "float16", "int8"], help="Compare vector storage instead of nprobe")
+    parser.add_argument("--no-rescore", action="store_true", help="Rank by the compact scores only")
+    parser.add_argument("--coarse-dim", type=int, nargs="+", help="Compare two-stage search over truncated prefixes")
+    parser.add_argument("--decay", type=float, help="Synthetic spectrum decay (default 0, or 0.5 with --coarse-dim)")
+    args = parser.parse_args()
+    if args.decay is None:
+        args.decay = 0.5 if args.coarse_dim else 0.0
+
+    rng = np.random.default_rng(0)
+    corpora = []
+    if args.snapshot:
+        exact = CognitiveCache.open(args.snapshot, index="exact")
+        vectors = np.asarray(exact._matrix)
+        # Real queries are unavailable offline: perturbed chunks stand in for paraphrases
+        picked = vectors[rng.integers(0, len(vectors), args.queries)]
+        queries = unit(picked + 0.5 * unit(rng.standard_normal(picked.shape).astype(np.float32)))
+        corpora.append((len(vectors), vectors, queries))
+    else:
+        for n in args.sizes:
+            vectors, topics = synthetic_corpus(rng, n, args.dim, spread=args.spread, decay=args.decay)
+            queries = synthetic_queries(rng, topics, args.queries, spread=args.query_spread, decay=args.decay)
+            corpora.append((n, vectors, queries))
+
+    print(f"k={args.k} threshold={args.threshold} queries={args.queries}")
+    if args.storage or args.coarse_dim:
+        variants = [
+            {"storage": storage, "coarse_dim": coarse_dim, "rescore": not args.no_rescore}
+            for storage in (args.storage or ["float32"])
+            for coarse_dim in (args.coarse_dim or [None])
+        ]
+        print(f"{'chunks':>8} {'storage':>8} {'coarse':>6} {'MB':>8} {'ratio':>6} {'recall':>7} {'recall@thr':>10} {'f32_ms':>7} {'ms':>7} {'speedup':>8}")
+        for n, vectors, queries in corpora:
+            exact = build(vectors, "exact")
+            for options in variants:
+                cache = open_snapshot(exact, **options)
+                r = evaluate(exact, cache, queries, args.k, args.threshold)
+                mb = cache.memory_bytes() or np.asarray(cache._full_matrix()).nbytes  # float32 snapshot: mmapped rows
+                print(f"{n:>8} {options['storage']:>8} {options['coarse_dim'] or '-':>6} {mb / 2**20:>8.1f} {exact.memory_bytes() / mb:>5.1f}x "
+                      f"{r['recall']:>7.3f} {r['recall_at_threshold']:>10.3f} {r['exact_ms']:>7.2f} {r['ann_ms']:>7.2f} "
+                      f"{r['exact_ms'] / r['ann_ms']:>7.1f}x")
+                sys.stdout.flush()
+        return
+
+    print(f"{'chunks':>8} {'nlist':>6} {'nprobe':>6} {'build_s':>8} {'recall':>7} {'recall@thr':>10} {'exact_ms':>9} {'ivf_ms':>7} {'speedup':>8}")
+    for n, vectors, queries in corpora:
+        exact = build(vectors, "exact")
+        for nprobe in args.nprobe:
+            start = time.perf_counter()
+            ann = build(vectors, "ivf", nprobe=nprobe)
+            build_s = time.perf_counter() - start
+            r = evaluate(exact, ann, queries, args.k, args.threshold)
+            print(f"{n:>8} {ann._ann.nlist:>6} {nprobe:>6} {build_s:>8.1f} {r['recall']:>7.3f} {r['recall_at_threshold']:>10.3f} "
+                  f"{r['exact_ms']:>9.2f} {r['ann_ms']:>7.2f} {r['exact_ms'] / r['ann_ms']:>7.1f}x")
+            sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
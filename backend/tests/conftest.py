@@ -0,0 +1,14 @@
+import sys
+import types
+
+# Unit tests never talk to Supabase: modules under test get a fake client via
+# monkeypatch. Without the SDK installed, app.db.supabase still has to import.
+try:
+    import supabase  # noqa: F401
+except ImportError:
+    stub = types.ModuleType("supabase")
+    stub.Client = object
+    def create_client(url, key):
+        raise RuntimeError("supabase is not installed")
+    stub.create_client = create_client
+    sys.modules["supabase"] = stub
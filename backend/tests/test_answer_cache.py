@@ -0,0 +1,86 @@
+import numpy as np
+from app.services.ai.answer_cache import AnswerCache, CachedAnswer
+
+DIM = 64
+rng = np.random.default_rng(7)
+
+def vector() -> list:
+    return rng.normal(size=DIM).tolist()
+
+def answer(embedding: list, text: str = "answer", loop_used: str = "DEEP") -> CachedAnswer:
+    return CachedAnswer(query=text, embedding=list(embedding), text=text, loop_used=loop_used)
+
+def test_hit_on_near_duplicate_and_miss_otherwise():
+    cache = AnswerCache(threshold=0.95)
+    stored = vector()
+    cache.put("agent", "interview", answer(stored, "cached"), generation=0)
+
+    near = (np.asarray(stored) + 0.01 * rng.normal(size=DIM)).tolist()
+    assert cache.get("agent", "interview", near, generation=0).text == "cached"
+    assert cache.get("agent", "interview", vector(), generation=0) is None
+    assert cache.get("agent", "standup", stored, generation=0) is None
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_loop_filter():
+    cache = AnswerCache()
+    stored = vector()
+    cache.put("agent", "interview", answer(stored, loop_used="FAST"), generation=0)
+
+    assert cache.get("agent", "interview", stored, generation=0, loop_used="DEEP") is None
+    assert cache.get("agent", "interview", stored, generation=0, loop_used="FAST") is not None
+
+def test_partition_grows_lazily_and_evicts_lru():
+    cache = AnswerCache(max_entries=20)
+    vectors = [vector() for _ in range(21)]
+    cache.put("agent", "interview", answer(vectors[0], "0"), generation=0)
+    partition = cache._partitions[("agent", "interview")]
+    assert len(partition.matrix) < 20
+
+    for n, v in enumerate(vectors[1:20], start=1):
+        cache.put("agent", "interview", answer(v, str(n)), generation=0)
+    assert partition.matrix.shape == (20, DIM)
+
+    cache.get("agent", "interview", vectors[0], generation=0)  # 0 is now recent; 1 is LRU
+    cache.put("agent", "interview", answer(vectors[20], "20"), generation=0)
+    assert partition.matrix.shape == (20, DIM)
+    assert cache.get("agent", "interview", vectors[1], generation=0) is None
+    assert cache.get("agent", "interview", vectors[0], generation=0).text == "0"
+    assert cache.evictions == 1
+
+def test_byte_cap_evicts_least_recent_partitions():
+    cache = AnswerCache(max_entries=8, max_bytes=3 * 8 * DIM * 4)
+    for agent in ("a", "b", "c", "d"):
+        for _ in range(8):
+            cache.put(agent, "interview", answer(vector()), generation=0)
+
+    assert [key[0] for key in cache._partitions] == ["c", "d"]
+    assert cache.metrics()["bytes"] == sum(p.nbytes for p in cache._partitions.values())
+    assert cache.metrics()["bytes"] <= cache.max_bytes
+
+def test_invalidate_bumps_generation_and_bypasses_stale_runtimes():
+    cache = AnswerCache()
+    stored = vector()
+    cache.put("agent", "interview", answer(stored), generation=0)
+    cache.invalidate("agent")
+
+    assert cache.generation("agent") == 1
+    assert cache.get("agent", "interview", stored, generation=0) is None
+    assert cache.stale == 1
+    cache.put("agent", "interview", answer(stored), generation=0)  # Stale writer: ignored
+    assert cache.get("agent", "interview", stored, generation=1) is None
+    assert cache.metrics()["bytes"] == 0
+
+def test_identity_invalidation():
+    cache = AnswerCache()
+    cache.invalidate("agent", identity=True)
+    assert cache.identity_generation("agent") == 1
+    assert cache.generation("agent") == 1
+
+def test_dimension_change_replaces_partition():
+    cache = AnswerCache()
+    cache.put("agent", "interview", answer(vector()), generation=0)
+    wide = rng.normal(size=2 * DIM).tolist()
+    cache.put("agent", "interview", answer(wide, "wide"), generation=0)
+
+    assert cache.get("agent", "interview", wide, generation=0).text == "wide"
+    assert cache.metrics()["entries"] == 1
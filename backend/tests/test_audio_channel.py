@@ -0,0 +1,85 @@
+import asyncio
+import pytest
+from app.services.ai.audio_channel import AudioChannel
+
+def test_drop_oldest_keeps_newest_audio_aligned():
+    channel = AudioChannel(capacity_ms=10, bytes_per_ms=2, overflow=AudioChannel.DROP_OLDEST, align=2)
+    channel.put_nowait(bytes(range(16)))
+    channel.put_nowait(bytes(range(16, 24)))
+
+    assert channel.qsize() == 20
+    assert channel.dropped_bytes == 4
+    assert channel.get_nowait() == bytes(range(4, 24))
+
+def test_drop_oldest_with_oversized_write():
+    channel = AudioChannel(capacity_ms=4, bytes_per_ms=2, overflow=AudioChannel.DROP_OLDEST)
+    channel.put_nowait(b"ab")
+    channel.put_nowait(bytes(range(20)))
+
+    assert channel.get_nowait() == bytes(range(12, 20))
+    assert channel.dropped_bytes == 14
+
+def test_drop_chunk_discards_whole_puts():
+    channel = AudioChannel(capacity_ms=10, bytes_per_ms=1, overflow=AudioChannel.DROP_CHUNK)
+    channel.put_nowait(b"1234567")
+    channel.put_nowait(b"abcd")  # Does not fit: dropped whole, never split
+    channel.put_nowait(b"xyz")
+
+    assert channel.get_nowait() == b"1234567xyz"
+    assert channel.dropped_chunks == 1
+    assert channel.dropped_bytes == 4
+
+def test_reads_wrap_around_and_respect_max_read():
+    channel = AudioChannel(capacity_ms=8, bytes_per_ms=1, max_read_ms=3)
+    channel.put_nowait(b"abcdef")
+    assert channel.get_nowait() == b"abc"
+    channel.put_nowait(b"ghijk")  # Wraps past the end of the ring
+
+    chunks = []
+    while not channel.empty():
+        chunks.append(channel.get_nowait())
+    assert chunks == [b"def", b"ghi", b"jk"]
+
+def test_block_policy_backpressures_writer():
+    async def run():
+        channel = AudioChannel(capacity_ms=4, bytes_per_ms=1)
+        writer = asyncio.create_task(channel.put(b"abcdefgh"))
+        await asyncio.sleep(0)
+        assert not writer.done()
+        assert channel.blocked_puts == 1
+        first = await channel.get()
+        await writer
+        return first, await channel.get()
+
+    assert asyncio.run(run()) == (b"abcd", b"efgh")
+
+def test_flush_discards_and_wakes_writer():
+    async def run():
+        channel = AudioChannel(capacity_ms=4, bytes_per_ms=1)
+        writer = asyncio.create_task(channel.put(b"abcdef"))
+        await asyncio.sleep(0)
+        assert channel.flush() == 4
+        await writer
+        return channel
+
+    channel = asyncio.run(run())
+    assert channel.get_nowait() == b"ef"
+    assert channel.flushes == 1
+
+def test_put_nowait_raises_when_full_in_block_mode():
+    channel = AudioChannel(capacity_ms=4, bytes_per_ms=1)
+    channel.put_nowait(b"abc")
+    with pytest.raises(asyncio.QueueFull):
+        channel.put_nowait(b"de")
+
+def test_reconfigure_requires_empty_channel():
+    channel = AudioChannel(capacity_ms=10, bytes_per_ms=1)
+    channel.put_nowait(b"a")
+    with pytest.raises(RuntimeError):
+        channel.reconfigure(2.0)
+
+@pytest.mark.parametrize("output_format, rate", [
+    ("pcm_16000", 32.0), ("pcm_44100", 88.2), ("ulaw_8000", 8.0), ("mp3_44100_128", 16.0),
+])
+def test_format_bytes_per_ms(output_format, rate):
+    assert AudioChannel.format_bytes_per_ms(output_format) == pytest.approx(rate)
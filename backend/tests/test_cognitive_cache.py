@@ -0,0 +1,116 @@
+import numpy as np
+import pytest
+from app.services.ai.ann_index import IVFIndex
+from app.services.ai.cognitive_cache import CognitiveCache
+
+DIM = 32
+
+@pytest.fixture(scope="module")
+def corpus():
+    """Clustered unit vectors, so IVF lists are meaningful."""
+    rng = np.random.default_rng(3)
+    centers = rng.normal(size=(16, DIM))
+    rows = centers[rng.integers(0, 16, size=800)] + 0.3 * rng.normal(size=(800, DIM))
+    queries = rows[rng.choice(800, 20, replace=False)] + 0.05 * rng.normal(size=(20, DIM))
+    return rows.astype(np.float32), queries.astype(np.float32)
+
+def build(rows: np.ndarray, **options) -> CognitiveCache:
+    cache = CognitiveCache(**options)
+    modes = [["interview"], ["standup"], None, ["interview", "standup"]]
+    cache.add_documents(
+        [f"id{i}" for i in range(len(rows))], [f"chunk {i}" for i in range(len(rows))],
+        rows.copy(), [{"allowed_modes": modes[i % 4]} for i in range(len(rows))],
+    )
+    cache.freeze()
+    return cache
+
+def top_ids(cache: CognitiveCache, query: np.ndarray, limit: int = 5):
+    return [hit.id for hit in cache.search(query.tolist(), limit=limit, threshold=-1.0)]
+
+def test_ivf_lists_partition_every_row(corpus):
+    rows, _ = corpus
+    unit = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    index = IVFIndex(nlist=16)
+    index.build(unit)
+
+    assert index.offsets[-1] == len(rows)
+    assert sorted(index.order.tolist()) == list(range(len(rows)))
+    assert np.array_equal(index.candidates(unit[0], nprobe=16), np.arange(len(rows)))
+
+def test_ivf_with_every_list_probed_matches_exact(corpus):
+    rows, queries = corpus
+    exact = build(rows, index="exact")
+    ivf = build(rows, index="ivf", nprobe=10_000)
+
+    assert ivf.index_name == "ivf"
+    for query in queries:
+        assert top_ids(ivf, query) == top_ids(exact, query)
+
+def test_ivf_recall_with_few_probes(corpus):
+    rows, queries = corpus
+    exact = build(rows, index="exact")
+    ivf = build(rows, index="ivf", nprobe=4)
+
+    recall = np.mean([top_ids(exact, q, 1)[0] in top_ids(ivf, q, 5) for q in queries])
+    assert recall >= 0.9
+
+def test_auto_index_threshold(corpus):
+    rows, _ = corpus
+    assert build(rows, ann_min_rows=10_000).index_name == "exact"
+    assert build(rows, ann_min_rows=100).index_name == "ivf"
+
+def test_int8_is_four_times_smaller_and_keeps_ranking(corpus):
+    rows, queries = corpus
+    exact = build(rows, index="exact")
+    int8 = build(rows, index="exact", storage="int8")
+
+    assert int8.memory_bytes() * 4 <= exact.memory_bytes() + 4 * DIM * 4
+    for query in queries:
+        assert top_ids(int8, query, 1) == top_ids(exact, query, 1)
+        expected = exact.search(query.tolist(), limit=1, threshold=-1.0)[0].score
+        assert int8.search(query.tolist(), limit=1, threshold=-1.0)[0].score == pytest.approx(expected, abs=0.02)
+
+def test_int8_snapshot_rescores_in_full_precision(corpus, tmp_path):
+    rows, queries = corpus
+    exact = build(rows, index="exact")
+    exact.save(str(tmp_path))
+    int8 = CognitiveCache.open(str(tmp_path), index="exact", storage="int8")
+
+    for query in queries:
+        expected = exact.search(query.tolist(), limit=3, threshold=-1.0)
+        found = int8.search(query.tolist(), limit=3, threshold=-1.0)
+        assert [hit.id for hit in found] == [hit.id for hit in expected]
+        # Shortlist scores come from the float32 mmap, not the quantized rows
+        assert [hit.score for hit in found] == pytest.approx([hit.score for hit in expected], abs=1e-6)
+
+def test_snapshot_round_trip_keeps_ivf_and_content(corpus, tmp_path):
+    rows, queries = corpus
+    ivf = build(rows, index="ivf", nprobe=4)
+    ivf.save(str(tmp_path))
+    opened = CognitiveCache.open(str(tmp_path), index="ivf", nprobe=4)
+
+    assert opened.index_name == "ivf"
+    assert np.array_equal(opened._ann.order, ivf._ann.order)
+    hit = opened.search(queries[0].tolist(), limit=1, threshold=-1.0)[0]
+    assert hit.content == f"chunk {hit.id[2:]}"
+    assert top_ids(opened, queries[0]) == top_ids(ivf, queries[0])
+
+def test_modes_and_exclusions_mask_rows(corpus, tmp_path):
+    rows, queries = corpus
+    build(rows, index="exact").save(str(tmp_path))
+    cache = CognitiveCache.open(str(tmp_path), modes=["interview"], index="exact")
+    cache.exclude(["id3"])
+
+    hits = cache.search(queries[0].tolist(), limit=len(rows), threshold=-1.0)
+    # Rows 1, 5, 9, ... are standup-only; id3 was deleted
+    assert {int(hit.id[2:]) % 4 for hit in hits} == {0, 2, 3}
+    assert "id3" not in {hit.id for hit in hits}
+    assert len(hits) == len(rows) * 3 // 4 - 1
+
+def test_coarse_prefix_search(corpus):
+    rows, queries = corpus
+    exact = build(rows, index="exact")
+    coarse = build(rows, index="exact", coarse_dim=16)
+
+    for query in queries:
+        assert top_ids(coarse, query, 1) == top_ids(exact, query, 1)
@@ -0,0 +1,133 @@
+import pytest
+from app.services.ai.document_pipeline import (
+    ChunkStats, StructuredChunker, check_text, estimate_tokens, iter_batches, iter_pages, normalize_text,
+    strip_boilerplate,
+)
+
+def paragraph(n: int, sentences: int = 6) -> str:
+    return " ".join(f"Paragraph {n} sentence {i} explains one more detail of the product." for i in range(sentences))
+
+def page(n: int, body: str) -> str:
+    return f"ACME Corp Confidential\n\n{body}\n\nPage {n} of 9"
+
+# --- strip_boilerplate ---
+
+def test_recurring_edge_lines_are_removed():
+    stats = ChunkStats()
+    topics = ["Pricing", "Support", "Security", "Billing", "Onboarding", "Roadmap", "Contracts"]
+    pages = [page(n, f"{topic} overview.\n{topic} details.\n{topic} summary.") for n, topic in enumerate(topics, start=1)]
+    cleaned = list(strip_boilerplate(pages, stats))
+
+    assert len(cleaned) == 7
+    for text, topic in zip(cleaned, topics):
+        assert "ACME Corp" not in text and "Page" not in text
+        assert text.split() == [f"{topic}", "overview.", f"{topic}", "details.", f"{topic}", "summary."]
+    assert stats.boilerplate_lines == 14
+
+def test_body_lines_matching_an_edge_line_are_kept():
+    pages = [page(n, f"Intro {n}.\nACME Corp Confidential\nDetails {n}.\nOutro {n}.") for n in range(1, 8)]
+    cleaned = list(strip_boilerplate(pages))
+
+    for text in cleaned:
+        assert text.count("ACME Corp Confidential") == 1
+        assert not text.startswith("ACME")
+
+def test_short_pages_are_left_alone():
+    pages = [f"Header\nShort page {n}" for n in range(1, 8)]
+    assert list(strip_boilerplate(pages)) == pages
+
+def test_too_few_pages_are_left_alone():
+    pages = [page(n, f"Body {n}.\nMore {n}.\nEnd {n}.") for n in range(1, 3)]
+    assert list(strip_boilerplate(pages)) == pages
+
+# --- StructuredChunker ---
+
+def test_chunks_respect_the_token_budget_and_keep_order():
+    chunker = StructuredChunker(max_tokens=100, overlap_tokens=0, min_tokens=10)
+    text = "\n\n".join(paragraph(n) for n in range(20))
+    chunks = list(chunker.chunks([text]))
+
+    assert [index for index, _ in chunks] == list(range(len(chunks)))
+    assert all(estimate_tokens(chunk) <= 100 + 5 for _, chunk in chunks)
+    joined = " ".join(chunk for _, chunk in chunks)
+    assert joined.index("Paragraph 3 sentence 0") < joined.index("Paragraph 15 sentence 0")
+    assert all(f"Paragraph {n} sentence 5" in joined for n in range(20))
+
+def test_headings_start_chunks_and_prefix_continuations():
+    chunker = StructuredChunker(max_tokens=60, overlap_tokens=0, min_tokens=5)
+    text = "Pricing Plans\n" + paragraph(1, 8) + "\n\nSupport Hours\n" + paragraph(2, 2)
+    chunks = [chunk for _, chunk in chunker.chunks([text])]
+
+    pricing = [chunk for chunk in chunks if "Paragraph 1" in chunk]
+    assert len(pricing) > 1
+    assert all(chunk.startswith("Pricing Plans\n") for chunk in pricing)
+    support = [chunk for chunk in chunks if "Paragraph 2" in chunk]
+    assert support and all(chunk.startswith("Support Hours\n") and "Paragraph 1" not in chunk for chunk in support)
+
+def test_overlap_repeats_trailing_sentences():
+    chunker = StructuredChunker(max_tokens=60, overlap_tokens=20, min_tokens=5)
+    chunks = [chunk for _, chunk in chunker.chunks([paragraph(1, 12)])]
+
+    assert len(chunks) > 1
+    last_sentence = chunks[0].rsplit("Paragraph", 1)[1]
+    assert last_sentence in chunks[1]
+
+def test_small_fragments_are_merged():
+    stats = ChunkStats()
+    chunker = StructuredChunker(max_tokens=200, overlap_tokens=0, min_tokens=30)
+    chunks = list(chunker.chunks(["Intro\nTiny.\n\nDetails\n" + paragraph(1, 3)], stats))
+
+    assert len(chunks) == 1
+    assert stats.merged_fragments == 1
+
+def test_duplicate_chunks_are_dropped_within_the_window(monkeypatch):
+    stats = ChunkStats()
+    chunker = StructuredChunker(max_tokens=40, overlap_tokens=0, min_tokens=1)
+    repeated = "Legal Notice\nAll rights reserved by the company and its affiliates worldwide."
+    text = "\n\n".join([repeated, "Alpha\n" + paragraph(1, 1), repeated, "Beta\n" + paragraph(2, 1), repeated])
+    chunks = [chunk for _, chunk in chunker.chunks([text], stats)]
+
+    assert sum(chunk.startswith("Legal Notice") for chunk in chunks) == 1
+    assert stats.duplicates == 2
+
+    # Past the window a repeat is kept again: the fingerprint set stays bounded
+    monkeypatch.setattr(StructuredChunker, "DEDUPE_WINDOW", 1)
+    chunks = [chunk for _, chunk in chunker.chunks([text])]
+    assert sum(chunk.startswith("Legal Notice") for chunk in chunks) == 3
+
+def test_chunks_stream_across_blocks():
+    chunker = StructuredChunker(max_tokens=100, overlap_tokens=0, min_tokens=10)
+    text = "\n\n".join(paragraph(n) for n in range(10))
+    blocks = [text[i:i + 97] for i in range(0, len(text), 97)]
+
+    assert list(chunker.chunks(blocks)) == list(chunker.chunks([text]))
+
+def test_content_defined_boundaries_survive_an_edit():
+    chunker = StructuredChunker(max_tokens=100, overlap_tokens=0, min_tokens=10)
+    paragraphs = [paragraph(n) for n in range(30)]
+    before = {chunk for _, chunk in chunker.chunks(["\n\n".join(paragraphs)])}
+    paragraphs[2] = paragraphs[2].replace("detail", "aspect")
+    after = {chunk for _, chunk in chunker.chunks(["\n\n".join(paragraphs)])}
+
+    assert len(before & after) >= len(before) - 3
+
+# --- Text helpers ---
+
+def test_iter_pages_decodes_split_multibyte_characters(monkeypatch):
+    from app.services.ai import document_pipeline
+    monkeypatch.setattr(document_pipeline, "TEXT_BLOCK_CHARS", 5)
+    text = "héllo wörld ünïcode"
+    assert "".join(iter_pages("notes.txt", text.encode("utf-8"))) == text
+
+def test_check_text_rejects_non_utf8():
+    with pytest.raises(ValueError):
+        check_text("notes.txt", b"caf\xe9")
+    check_text("notes.txt", "café".encode("utf-8"))
+
+def test_normalize_text():
+    assert normalize_text("a\r\nb\t\t c\x00\n\n\n\nd") == "a\nb c\n\nd"
+
+def test_iter_batches_bounds_inputs_and_tokens():
+    chunks = [(i, "x" * 40) for i in range(10)]  # 11 estimated tokens each
+    assert [len(batch) for batch in iter_batches(chunks, max_inputs=4, max_tokens=1000)] == [4, 4, 2]
+    assert [len(batch) for batch in iter_batches(chunks, max_inputs=100, max_tokens=30)] == [2, 2, 2, 2, 2]
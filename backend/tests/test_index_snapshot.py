@@ -0,0 +1,110 @@
+import os
+import numpy as np
+import pytest
+from app.services.ai.index_snapshot import IndexSnapshotStore, SegmentedCache
+from app.services.ai.cognitive_cache import CognitiveCache
+
+DIM = 16
+rng = np.random.default_rng(11)
+
+def row(n: int, filename: str = "a.pdf", modes=None) -> dict:
+    return {"id": f"r{n}", "content": f"chunk {n}", "embedding": rng.normal(size=DIM).astype(np.float32),
+            "metadata": {"chunk_index": n}, "filename": filename, "allowed_modes": modes}
+
+def ids(cache) -> set:
+    return {doc_id for doc_id, _, _, _ in cache.rows()}
+
+def generations(store: IndexSnapshotStore, agent_id: str) -> list:
+    return sorted(name for name in os.listdir(os.path.join(store.root, agent_id)) if not name.startswith("CURRENT"))
+
+@pytest.fixture
+def store(tmp_path):
+    store = IndexSnapshotStore(str(tmp_path))
+    yield store
+    store._compactor.shutdown(wait=True)
+
+def test_no_snapshot_until_written(store):
+    assert store.open("agent") is None
+    store.append("agent", [row(0)])  # Nothing to update yet
+    assert store.open("agent") is None
+
+def test_write_and_reopen(store):
+    rows = [row(n) for n in range(10)]
+    store.write_rows("agent", rows)
+    cache = store.open("agent")
+
+    assert isinstance(cache, CognitiveCache)
+    assert len(cache) == 10
+    hit = cache.search(rows[3]["embedding"].tolist(), limit=1, threshold=0.0)[0]
+    assert (hit.id, hit.content) == ("r3", "chunk 3")
+
+def test_rebuilds_keep_current_and_replaced_generation(store):
+    for n in range(4):
+        store.write_rows("agent", [row(n)])
+    assert len(generations(store, "agent")) == 2
+    assert ids(store.open("agent")) == {"r3"}
+
+def test_appends_are_segments_and_skip_known_ids(store):
+    base = [row(n) for n in range(10)]
+    store.write_rows("agent", base)
+    added = [row(n, "b.pdf") for n in range(10, 13)]
+    store.append("agent", added)
+    store.append("agent", [base[0], added[0]])  # Already in the snapshot: no new segment
+
+    cache = store.open("agent")
+    assert isinstance(cache, SegmentedCache)
+    assert len(cache) == 13
+    assert store.segments_written == 1
+    hit = cache.search(added[1]["embedding"].tolist(), limit=1, threshold=0.0)[0]
+    assert hit.id == "r11"
+
+def test_removals_are_tombstones(store):
+    store.write_rows("agent", [row(n) for n in range(5)] + [row(n, "b.pdf") for n in range(5, 8)])
+    store.append("agent", [row(n, "b.pdf") for n in range(8, 10)])
+    store.remove("agent", "b.pdf")
+    store.remove_ids("agent", ["r0"])
+
+    cache = store.open("agent")
+    assert ids(cache) == {"r1", "r2", "r3", "r4"}
+    assert len(cache) == 4
+    assert store.tombstones_written == 2
+    found = {hit.id for hit in cache.search(rng.normal(size=DIM).tolist(), limit=20, threshold=-1.0)}
+    assert found == {"r1", "r2", "r3", "r4"}
+
+def test_modes_apply_to_segments(store):
+    store.write_rows("agent", [row(0, modes=["interview"]), row(1, modes=["standup"])])
+    store.append("agent", [row(2, modes=["standup"]), row(3)])
+
+    cache = store.open("agent", modes=["interview"])
+    found = {hit.id for hit in cache.search(rng.normal(size=DIM).tolist(), limit=10, threshold=-1.0)}
+    assert found == {"r0", "r3"}
+
+def test_compaction_folds_deltas_into_a_new_generation(store):
+    store.write_rows("agent", [row(n) for n in range(20)])
+    store.append("agent", [row(n, "b.pdf") for n in range(20, 25)])
+    store.remove_ids("agent", ["r0", "r21"])
+    before = store.current_path("agent")
+
+    store.compact("agent")
+
+    after = store.current_path("agent")
+    assert after != before
+    cache = store.open("agent")
+    assert isinstance(cache, CognitiveCache)  # No deltas left
+    assert ids(cache) == {f"r{n}" for n in range(1, 25)} - {"r21"}
+    assert store.compactions == 1
+
+def test_compaction_is_scheduled_past_the_delta_threshold(store):
+    store.COMPACT_MIN_ROWS = 5
+    store.write_rows("agent", [row(n) for n in range(4)])
+    store.append("agent", [row(n) for n in range(4, 10)])
+    store._compactor.shutdown(wait=True)  # Wait for the background compaction
+
+    assert store.compactions == 1
+    assert isinstance(store.open("agent"), CognitiveCache)
+    assert len(store.open("agent")) == 10
+
+def test_corrupt_snapshot_is_ignored(store):
+    store.write_rows("agent", [row(0)])
+    os.remove(os.path.join(store.current_path("agent"), CognitiveCache.ROWS_FILE))
+    assert store.open("agent") is None
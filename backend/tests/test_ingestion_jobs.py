@@ -0,0 +1,182 @@
+import asyncio
+from typing import Dict, List
+import pytest
+from app.services import ingestion_jobs as ingestion_jobs_module
+from app.services.ingestion_jobs import (
+    CANCELLED, FAILED, PARTIAL, QUEUED, RUNNING, SUCCEEDED, IngestionJobQueue, QueueFull,
+)
+
+class FakeTable:
+    def __init__(self, writes: List[Dict]):
+        self.writes = writes
+        self.row = None
+
+    def upsert(self, row: Dict) -> "FakeTable":
+        self.row = row
+        return self
+
+    def execute(self):
+        self.writes.append(self.row)
+
+class FakeClient:
+    def __init__(self):
+        self.writes: List[Dict] = []
+
+    def table(self, name: str) -> FakeTable:
+        return FakeTable(self.writes)
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(ingestion_jobs_module, "get_supabase_service_client", lambda: fake)
+    return fake
+
+def stats(chunks: int = 4, failed: int = 0) -> Dict:
+    return {"pages": 1, "chunks": chunks, "reused": 0, "embedded": chunks, "stored": chunks - failed, "failed": failed}
+
+def runner(result: Dict, gate: asyncio.Event = None, log: List[str] = None, name: str = ""):
+    async def run(progress):
+        if log is not None:
+            log.append(f"start {name}")
+        progress({**result, "stored": 0})
+        if gate is not None:
+            await gate.wait()
+        if log is not None:
+            log.append(f"end {name}")
+        return result
+    return run
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+def test_success_partial_and_failure(client):
+    async def run():
+        queue = IngestionJobQueue(max_workers=3)
+        ok = queue.submit("agent", "user", "file", "a.pdf", runner(stats()))
+        partial = queue.submit("agent", "user", "file", "b.pdf", runner(stats(failed=1)))
+        failed = queue.submit("agent", "user", "file", "c.pdf", runner(stats(failed=4)))
+        await settle()
+        await queue.stop()
+        return queue, ok, partial, failed
+
+    queue, ok, partial, failed = asyncio.run(run())
+    assert ok.status == SUCCEEDED and ok.error is None
+    assert ok.progress["stored"] == 4
+    assert partial.status == PARTIAL
+    assert partial.error == "1 of 4 chunks failed, 3 stored"
+    assert partial.result["stored"] == 3
+    assert failed.status == FAILED
+    assert queue.metrics()["succeeded"] == 1 and queue.metrics()["partial"] == 1 and queue.metrics()["failed"] == 1
+    # Every status change is persisted, in order
+    assert [row["status"] for row in client.writes if row["id"] == ok.id] == [QUEUED, RUNNING, SUCCEEDED]
+
+def test_exception_fails_the_job(client):
+    async def boom(progress):
+        raise RuntimeError("parser crashed")
+
+    async def run():
+        queue = IngestionJobQueue()
+        job = queue.submit("agent", "user", "file", "a.pdf", boom)
+        await settle()
+        await queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert (job.status, job.error) == (FAILED, "parser crashed")
+
+def test_cancel_queued_and_running_jobs(client):
+    async def run():
+        queue = IngestionJobQueue(max_workers=1)
+        gate = asyncio.Event()
+        running = queue.submit("agent", "user", "file", "a.pdf", runner(stats(), gate))
+        queued = queue.submit("agent", "user", "file", "b.pdf", runner(stats()))
+        await settle()
+        assert running.status == RUNNING
+        assert queue.cancel(queued.id)
+        assert queue.cancel(running.id)
+        await settle()
+        assert not queue.cancel(running.id)  # Already finished
+        await queue.stop()
+        return queue, running, queued
+
+    queue, running, queued = asyncio.run(run())
+    assert running.status == CANCELLED and queued.status == CANCELLED
+    assert queue.metrics()["cancelled"] == 2
+
+def test_same_document_jobs_run_one_at_a_time_in_order(client):
+    async def run():
+        queue = IngestionJobQueue(max_workers=2)
+        log: List[str] = []
+        gate = asyncio.Event()
+        first = queue.submit("agent", "user", "file", "a.pdf", runner(stats(), gate, log, "1"))
+        second = queue.submit("agent", "user", "file", "a.pdf", runner(stats(), None, log, "2"))
+        other = queue.submit("agent", "user", "file", "b.pdf", runner(stats(), None, log, "other"))
+        await settle()
+        assert second.status == QUEUED
+        assert other.status == SUCCEEDED  # A different document is not held up
+        gate.set()
+        await settle()
+        await queue.stop()
+        return log, first, second
+
+    log, first, second = asyncio.run(run())
+    assert log.index("end 1") < log.index("start 2")
+    assert first.status == SUCCEEDED and second.status == SUCCEEDED
+
+def test_pending_limits(client):
+    async def run():
+        queue = IngestionJobQueue(max_workers=1, max_pending=2, max_pending_bytes=100)
+        gate = asyncio.Event()
+        queue.submit("agent", "user", "file", "a.pdf", runner(stats(), gate), size=60)
+        await settle()  # a.pdf is running; its content still counts
+        with pytest.raises(QueueFull):
+            queue.submit("agent", "user", "file", "b.pdf", runner(stats()), size=50)
+        queue.submit("agent", "user", "file", "c.pdf", runner(stats()), size=40)
+        queue.submit("agent", "user", "file", "d.pdf", runner(stats()))
+        with pytest.raises(QueueFull):
+            queue.submit("agent", "user", "file", "e.pdf", runner(stats()))  # 2 jobs waiting
+        assert queue.metrics()["pending_bytes"] == 100
+        gate.set()
+        await settle()
+        pending_bytes = queue.metrics()["pending_bytes"]
+        await queue.stop()
+        return pending_bytes
+
+    assert asyncio.run(run()) == 0
+
+def test_lone_oversized_upload_is_accepted(client):
+    async def run():
+        queue = IngestionJobQueue(max_pending_bytes=10)
+        job = queue.submit("agent", "user", "file", "big.pdf", runner(stats()), size=1000)
+        await settle()
+        await queue.stop()
+        return job
+
+    assert asyncio.run(run()).status == SUCCEEDED
+
+def test_finished_jobs_release_their_content(client):
+    async def run():
+        queue = IngestionJobQueue()
+        job = queue.submit("agent", "user", "file", "a.pdf", runner(stats()), size=10)
+        await settle()
+        await queue.stop()
+        return job
+
+    job = asyncio.run(run())
+    assert job._run is None
+
+def test_stop_fails_queued_jobs(client):
+    async def run():
+        queue = IngestionJobQueue(max_workers=1)
+        gate = asyncio.Event()
+        running = queue.submit("agent", "user", "file", "a.pdf", runner(stats(), gate))
+        queued = queue.submit("agent", "user", "file", "b.pdf", runner(stats()))
+        await settle()
+        await queue.stop()
+        return running, queued
+
+    running, queued = asyncio.run(run())
+    assert running.status == CANCELLED
+    assert queued.status == FAILED
+    assert queued.error == "Server shut down before the job finished"
@@ -0,0 +1,105 @@
+import asyncio
+from typing import Dict, List
+import pytest
+from app.services import write_behind as write_behind_module
+from app.services.write_behind import WriteBehindQueue
+
+class DataError(Exception):
+    """A permanent PostgREST error (SQLSTATE class 23: integrity constraint violation)."""
+    code = "23505"
+
+class Timeout(Exception):
+    """No code / response: treated as transient."""
+
+class FakeTable:
+    def __init__(self, client: "FakeClient", name: str):
+        self.client = client
+        self.name = name
+        self.rows: List[Dict] = []
+
+    def insert(self, rows: List[Dict]) -> "FakeTable":
+        self.rows = rows
+        return self
+
+    def execute(self):
+        self.client.requests.append((self.name, [row["n"] for row in self.rows]))
+        if self.client.transient_failures:
+            self.client.transient_failures -= 1
+            raise Timeout("read timed out")
+        if any(row.get("bad") for row in self.rows):
+            raise DataError("duplicate key value")
+        self.client.stored.extend(self.rows)
+
+class FakeClient:
+    def __init__(self, transient_failures: int = 0):
+        self.transient_failures = transient_failures
+        self.requests = []
+        self.stored: List[Dict] = []
+
+    def table(self, name: str) -> FakeTable:
+        return FakeTable(self, name)
+
+@pytest.fixture
+def client(monkeypatch):
+    fake = FakeClient()
+    monkeypatch.setattr(write_behind_module, "get_supabase_service_client", lambda: fake)
+    return fake
+
+def write(queue: WriteBehindQueue, rows: List[Dict]):
+    asyncio.run(queue._write_group("meeting_transcripts", rows))
+
+def test_bad_row_is_bisected_out(client):
+    queue = WriteBehindQueue(retry_backoff=0)
+    rows = [{"n": n, "bad": n == 5} for n in range(8)]
+
+    write(queue, rows)
+
+    assert sorted(row["n"] for row in client.stored) == [0, 1, 2, 3, 4, 6, 7]
+    assert queue.rows_written == 7
+    assert queue.rows_dropped == 1
+    # Halves without the bad row are written in one request each
+    assert ("meeting_transcripts", [0, 1, 2, 3]) in client.requests
+    assert ("meeting_transcripts", [5]) in client.requests
+
+def test_transient_errors_are_retried(client):
+    client.transient_failures = 2
+    queue = WriteBehindQueue(retry_backoff=0)
+
+    write(queue, [{"n": 0}, {"n": 1}])
+
+    assert len(client.requests) == 3
+    assert queue.rows_written == 2
+    assert queue.rows_dropped == 0
+
+def test_retries_are_bounded(client):
+    client.transient_failures = 10
+    queue = WriteBehindQueue(max_retries=2, retry_backoff=0)
+
+    write(queue, [{"n": 0}, {"n": 1}])
+
+    assert len(client.requests) == 3
+    assert queue.rows_written == 0
+    assert queue.rows_dropped == 2
+
+@pytest.mark.parametrize("code, transient", [
+    ("503", True), ("429", True), ("400", False),
+    ("08006", True), ("40P01", True), ("23505", False), ("22P02", False),
+])
+def test_transient_classification(code, transient):
+    error = Exception("boom")
+    error.code = code
+    assert WriteBehindQueue._is_transient(error) is transient
+
+def test_rows_are_batched_and_drained(client):
+    queue = WriteBehindQueue(max_batch_rows=3, flush_interval=0.05)
+
+    async def run():
+        for n in range(7):
+            queue.enqueue("meeting_transcripts", {"n": n, "meeting_id": "m"})
+        await queue.drain()
+
+    asyncio.run(run())
+
+    assert [row["n"] for row in client.stored] == list(range(7))
+    assert all("timestamp" in row for row in client.stored)
+    assert [len(numbers) for _, numbers in client.requests] == [3, 3, 1]
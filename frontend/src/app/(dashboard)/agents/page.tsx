@@ -40,7 +40,7 @@ export default function AgentsPage() {
                 body: formData
             });
 
-            alert("Knowledge Ingested Successfully!");
+            alert("Knowledge uploaded! Indexing continues in the background.");
             setKnowledgeAgent(null);
         } catch (error) {
             console.error("Upload failed", error);
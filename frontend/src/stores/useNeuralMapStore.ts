@@ -48,6 +48,24 @@ interface KnowledgeCortexState {
     ingestText: (agentId: string, title: string, content: string, token: string) => Promise<void>;
 }
 
+// Ingestion runs as a background job on the backend (202 + job_id): poll until it finishes
+const waitForIngestionJob = async (API_URL: string, agentId: string, res: Response, token: string) => {
+    if (res.status !== 202) return;
+    const { job_id } = await res.json();
+    while (true) {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const statusRes = await fetch(`${API_URL}/agents/${agentId}/knowledge/jobs/${job_id}`, {
+            headers: { 'Authorization': `Bearer ${token}` }
+        });
+        if (!statusRes.ok) return;
+        const job = await statusRes.json();
+        if (['succeeded', 'failed', 'cancelled'].includes(job.status)) {
+            if (job.status !== 'succeeded') console.error(`Ingestion job ${job_id} ${job.status}`, job.error);
+            return;
+        }
+    }
+};
+
 export const useNeuralMapStore = create<KnowledgeCortexState>((set, get) => ({
     isKnowledgeModalOpen: false,
     openKnowledgeModal: () => set({ isKnowledgeModalOpen: true }),
@@ -104,13 +122,14 @@ export const useNeuralMapStore = create<KnowledgeCortexState>((set, get) => ({
 
             try {
                 // Use the new RAG endpoint
-                await fetch(`${API_URL}/agents/${agentId}/knowledge`, {
+                const res = await fetch(`${API_URL}/agents/${agentId}/knowledge`, {
                     method: 'POST',
                     headers: {
                         'Authorization': `Bearer ${token}`
                     },
                     body: formData
                 });
+                await waitForIngestionJob(API_URL, agentId, res, token);
 
                 currentProgress += progressStep;
                 set({ ingestionProgress: currentProgress });
@@ -201,7 +220,7 @@ export const useNeuralMapStore = create<KnowledgeCortexState>((set, get) => ({
         const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
         set({ ingestionState: 'processing' });
         try {
-            await fetch(`${API_URL}/agents/${agentId}/knowledge/url`, {
+            const res = await fetch(`${API_URL}/agents/${agentId}/knowledge/url`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -209,6 +228,7 @@ export const useNeuralMapStore = create<KnowledgeCortexState>((set, get) => ({
                 },
                 body: JSON.stringify({ url })
             });
+            await waitForIngestionJob(API_URL, agentId, res, token);
             await get().fetchNodes(agentId, token);
             set({ ingestionState: 'synced' });
         } catch (e) {
@@ -221,7 +241,7 @@ export const useNeuralMapStore = create<KnowledgeCortexState>((set, get) => ({
         const API_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api/v1';
         set({ ingestionState: 'processing' });
         try {
-            await fetch(`${API_URL}/agents/${agentId}/knowledge/text`, {
+            const res = await fetch(`${API_URL}/agents/${agentId}/knowledge/text`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
@@ -229,6 +249,7 @@ export const useNeuralMapStore = create<KnowledgeCortexState>((set, get) => ({
                 },
                 body: JSON.stringify({ title, content })
             });
+            await waitForIngestionJob(API_URL, agentId, res, token);
             await get().fetchNodes(agentId, token);
             set({ ingestionState: 'synced' });
         } catch (e) {